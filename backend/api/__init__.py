@@ -1,20 +1,22 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from ..db import get_db
-from ..utils.utils import verify_token
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db import get_async_db
+from ..utils.utils import verify_token_async
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # 获取当前用户函数
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=401,
         detail="无效的认证凭据",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    user = verify_token(token, credentials_exception, db)
+    user = await verify_token_async(token, credentials_exception, db)
     if user is None:
         raise credentials_exception
-    return user 
\ No newline at end of file
+    return user
+
+from .permissions import TaskAccess, get_task_access, resolve_task_access, resolve_image_access
@@ -0,0 +1,127 @@
+"""
+任务访问权限的统一解析
+路由通过 get_task_access 依赖（或 resolve_image_access）获取当前用户对任务的权限：
+任务、创建者和当前用户的授权记录在一次查询中取出，结果在同一请求内复用（request.state），
+授权记录可在短时间内跨请求缓存（见 backend/utils/acl_cache.py）；命中缓存时仍按主键确认任务存在且未被删除。
+"""
+
+from typing import Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+
+from ..db import crud, get_db
+from ..models import models
+from ..utils import acl_cache
+from . import get_current_user
+
+class TaskAccess:
+    """当前用户对任务的访问权限
+
+    task 为任务对象；
+    permission 为当前用户在该任务上的授权记录字段，没有授权时为None。
+    """
+
+    def __init__(self, task_id: int, user: models.User, owner_id: int, permission: Optional[dict], task: Optional[models.Task] = None):
+        self.task_id = task_id
+        self.user = user
+        self.owner_id = owner_id
+        self.permission = permission
+        self.task = task
+
+    @property
+    def is_owner(self) -> bool:
+        return self.owner_id == self.user.id
+
+    @property
+    def is_system_admin(self) -> bool:
+        return bool(self.user.is_admin)
+
+    @property
+    def has_permission(self) -> bool:
+        return self.permission is not None
+
+    @property
+    def permission_type(self) -> Optional[str]:
+        return self.permission["permission_type"] if self.permission else None
+
+    @property
+    def is_task_admin(self) -> bool:
+        return self.permission_type == "admin"
+
+    @property
+    def can_view(self) -> bool:
+        """任务创建者、被授权用户和系统管理员可以查看任务"""
+        return self.is_owner or self.has_permission or self.is_system_admin
+
+    @property
+    def can_upload(self) -> bool:
+        """授权记录中的上传权限（不含任务创建者）"""
+        return bool(self.permission and self.permission["can_upload"])
+
+    @property
+    def can_edit(self) -> bool:
+        """授权记录中的编辑权限（不含任务创建者）"""
+        return bool(self.permission and self.permission["can_edit"])
+
+    @property
+    def can_manage(self) -> bool:
+        """授权记录中的管理权限（不含任务创建者）"""
+        return bool(self.permission and self.permission["can_manage"])
+
+def _permission_fields(permission: Optional[models.TaskPermission]) -> Optional[dict]:
+    if permission is None:
+        return None
+    return {field: getattr(permission, field) for field in acl_cache.PERMISSION_FIELDS}
+
+def _memo(request: Request) -> dict:
+    memo = getattr(request.state, "task_access", None)
+    if memo is None:
+        memo = request.state.task_access = {}
+    return memo
+
+def resolve_task_access(request: Request, db: Session, user: models.User, task_id: int) -> TaskAccess:
+    """解析当前用户对任务的权限，任务不存在时返回404"""
+    memo = _memo(request)
+    if task_id in memo:
+        return memo[task_id]
+
+    cached = acl_cache.get(task_id, user.id)
+    if cached is not None:
+        # 其他worker删除任务时不会失效当前进程的缓存，命中缓存时确认任务仍然存在
+        task = crud.get_task(db, task_id=task_id)
+        if task is None:
+            acl_cache.invalidate(task_id)
+            raise HTTPException(status_code=404, detail="任务不存在")
+        owner_id, permission = cached
+        access = TaskAccess(task_id, user, owner_id, permission, task)
+    else:
+        row = crud.get_task_with_permission(db, task_id=task_id, user_id=user.id)
+        if row is None:
+            raise HTTPException(status_code=404, detail="任务不存在")
+        task, permission = row
+        access = TaskAccess(task_id, user, task.owner_id, _permission_fields(permission), task)
+        acl_cache.put(task_id, user.id, task.owner_id, access.permission)
+
+    memo[task_id] = access
+    return access
+
+def resolve_image_access(request: Request, db: Session, user: models.User, image_id: int) -> Tuple[models.Image, TaskAccess]:
+    """一次查询获取图片及当前用户对其所属任务的权限，图片不存在时返回404"""
+    row = crud.get_image_with_permission(db, image_id=image_id, user_id=user.id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="图片不存在")
+    image, task, permission = row
+    access = TaskAccess(task.id, user, task.owner_id, _permission_fields(permission), task)
+    acl_cache.put(task.id, user.id, task.owner_id, access.permission)
+    _memo(request)[task.id] = access
+    return image, access
+
+def get_task_access(
+    task_id: int,
+    request: Request,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> TaskAccess:
+    """路由依赖：解析路径参数task_id对应任务的访问权限"""
+    return resolve_task_access(request, db, current_user, task_id)
@@ -1,12 +1,12 @@
 # Import database components
-from .database import engine, SessionLocal, get_db, Base
+from .database import engine, SessionLocal, get_db, async_engine, AsyncSessionLocal, get_async_db, Base
 
 # Import CRUD functions
 from .crud import (
     get_user,
     get_user_by_username,
     create_user,
-    get_tasks_by_user,
+    get_task_summaries_by_user,
     create_task,
     get_task,
     create_task_permission,
@@ -14,5 +14,6 @@ from .crud import (
     create_image,
     update_image,
     get_images_by_task,
+    get_task_images_page,
     get_image
 ) 
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+同步/异步会话的并发吞吐量对比
+在一个事件循环（相当于一个worker）中并发执行 get_current_user 的用户查询，分别使用：
+    sync  —— 在协程中直接使用同步Session（迁移到AsyncSession之前 async def 路由的做法，查询阻塞事件循环）
+    async —— 使用AsyncSession（async_crud）
+输出每种方式的吞吐量（请求/秒）和延迟（中位数、P95）：
+
+    python backend/db/async_benchmark.py --requests 500 --concurrency 20
+    python backend/db/async_benchmark.py --delay 0.05    # 每个请求额外执行 SELECT SLEEP(0.05)，模拟慢查询
+
+查询的用户默认为数据库中第一个用户，可用 --username 指定。
+结果只反映运行时所连接的数据库，项目中没有记录基准结果。
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+
+# 作为脚本运行时，添加项目根目录到Python路径
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from backend.db import async_crud, crud
+
+MODES = ["sync", "async"]
+
+def _sleep_statement(seconds: float):
+    return text("SELECT SLEEP(:seconds)").bindparams(seconds=seconds)
+
+async def _sync_request(username: str, delay: float):
+    from backend.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if delay:
+            db.execute(_sleep_statement(delay))
+        crud.get_user_by_username(db, username=username)
+    finally:
+        db.close()
+
+async def _async_request(username: str, delay: float):
+    from backend.db.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as db:
+        if delay:
+            await db.execute(_sleep_statement(delay))
+        await async_crud.get_user_by_username(db, username=username)
+
+async def measure(mode: str, username: str, requests: int, concurrency: int, delay: float = 0.0) -> dict:
+    """以concurrency个并发执行requests次查询，返回吞吐量和延迟（毫秒）"""
+    request = _sync_request if mode == "sync" else _async_request
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def run_one():
+        async with semaphore:
+            start = time.perf_counter()
+            await request(username, delay)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "throughput": requests / elapsed,
+        "median_ms": statistics.median(latencies),
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    }
+
+def _default_username() -> str:
+    from backend.db.database import SessionLocal
+    from backend.models.models import User
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).order_by(User.id).first()
+    finally:
+        db.close()
+    if user is None:
+        raise SystemExit("数据库中没有用户，请先创建用户或使用 --username 指定")
+    return user.username
+
+async def run(username: str, requests: int, concurrency: int, delay: float, modes=MODES):
+    from backend.db.database import async_engine, engine
+
+    if delay and engine.dialect.name != "mysql":
+        raise SystemExit("--delay 使用 SELECT SLEEP，仅支持MySQL")
+    try:
+        for mode in modes:
+            # 预热：建立连接池中的连接，不计入结果
+            await measure(mode, username, concurrency, concurrency)
+            result = await measure(mode, username, requests, concurrency, delay)
+            print(f"{mode:>5}: {result['throughput']:.1f} 请求/秒, "
+                  f"中位数 {result['median_ms']:.2f} ms, P95 {result['p95_ms']:.2f} ms")
+    finally:
+        await async_engine.dispose()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="同步/异步会话的并发吞吐量对比")
+    parser.add_argument("--requests", type=int, default=500, help="每种方式执行的请求数")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发数（不应超过连接池大小加溢出连接数）")
+    parser.add_argument("--delay", type=float, default=0.0, help="每个请求额外的数据库等待时间（秒），模拟慢查询")
+    parser.add_argument("--username", help="查询的用户名，默认为数据库中第一个用户")
+    parser.add_argument("--mode", choices=MODES, help="只测试一种方式")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.username or _default_username(), args.requests, args.concurrency, args.delay,
+                    [args.mode] if args.mode else MODES))
@@ -0,0 +1,39 @@
+"""
+crud 的异步版本（AsyncSession），供 async def 路由使用
+同步的 crud.py 继续用于普通 def 路由、后台进程和命令行脚本。
+"""
+
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import User
+
+async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    return await db.get(User, user_id)
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+async def get_users(db: AsyncSession) -> List[User]:
+    result = await db.execute(select(User))
+    return list(result.scalars().all())
+
+async def get_pending_users(db: AsyncSession) -> List[User]:
+    """获取待审核的用户"""
+    result = await db.execute(select(User).where(User.is_approved == False))
+    return list(result.scalars().all())
+
+async def update_user_flags(db: AsyncSession, user: User, **flags) -> User:
+    """更新用户的状态字段（is_approved、is_admin、is_active）并提交"""
+    for key, value in flags.items():
+        setattr(user, key, value)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+async def delete_user(db: AsyncSession, user: User):
+    await db.delete(user)
+    await db.commit()
@@ -1,11 +1,11 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from ..models.models import User, Task, TaskPermission, Image, PersonInvolved
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import and_, func, or_, insert, update, text
+from ..models.models import User, Task, TaskPermission, Image, PersonInvolved, ReportArtifact, TrackPoint, get_now_shanghai
 from ..models.schemas import UserCreate, TaskCreate, TaskUpdate, TaskPermissionCreate, ImageCreate
-from typing import List, Optional
+from ..utils import upload_index
+from typing import List, Optional, Tuple
+from datetime import datetime
 from fastapi import HTTPException
-import os
-import shutil
 
 def get_user(db: Session, user_id: int):
     return db.query(User).filter(User.id == user_id).first()
@@ -29,29 +29,44 @@ def create_user(db: Session, user: UserCreate):
     db.refresh(db_user)
     return db_user
 
-def get_tasks_by_user(db: Session, user_id: int):
-    # 查询用户自己创建的任务
-    own_tasks = db.query(Task).filter(Task.owner_id == user_id).all()
-    
-    # 查询分享给用户的任务
-    shared_task_ids = db.query(TaskPermission.task_id).filter(TaskPermission.user_id == user_id).all()
-    shared_task_ids = [task_id[0] for task_id in shared_task_ids]  # 解包结果元组
-    
-    shared_tasks = []
-    if shared_task_ids:
-        shared_tasks = db.query(Task).filter(Task.id.in_(shared_task_ids)).all()
-    
-    # 合并任务列表并按创建时间排序
-    all_tasks = own_tasks + shared_tasks
-    
-    # 按创建时间排序
-    all_tasks.sort(key=lambda x: x.created_at, reverse=True)
-    
-    # 为每个任务加载owner信息
-    for task in all_tasks:
-        task.owner = db.query(User).filter(User.id == task.owner_id).first()
-    
-    return all_tasks
+def get_task_summaries_by_user(db: Session, user_id: int, limit: int = 100, before_id: Optional[int] = None):
+    """获取用户可见任务的摘要列表（按任务ID倒序的键集分页）
+
+    图片数量、首末图片时间和首张图片路径均由与任务行关联的子查询计算，不加载图片明细；
+    子查询只针对返回的任务执行，各自使用 (task_id, time) 索引，不扫描其他任务的图片。
+    """
+    def image_stat(column):
+        return db.query(column).filter(Image.task_id == Task.id).correlate(Task).scalar_subquery()
+
+    # 按时间排序的第一张图片作为缩略图
+    first_image_path = db.query(Image.file_path).filter(
+        Image.task_id == Task.id
+    ).order_by(Image.time, Image.id).limit(1).correlate(Task).scalar_subquery()
+
+    shared_task_ids = db.query(TaskPermission.task_id).filter(TaskPermission.user_id == user_id)
+
+    query = db.query(
+        Task.id,
+        Task.title,
+        Task.description,
+        Task.created_at,
+        Task.owner_id,
+        User.username.label("owner_username"),
+        image_stat(func.count(Image.id)).label("image_count"),
+        image_stat(func.min(Image.time)).label("first_image_time"),
+        image_stat(func.max(Image.time)).label("last_image_time"),
+        first_image_path.label("thumbnail_path")
+    ).outerjoin(
+        User, User.id == Task.owner_id
+    ).filter(
+        or_(Task.owner_id == user_id, Task.id.in_(shared_task_ids)),
+        Task.deleted_at.is_(None)
+    )
+
+    if before_id is not None:
+        query = query.filter(Task.id < before_id)
+
+    return query.order_by(Task.id.desc()).limit(limit).all()
 
 def create_task(db: Session, task: TaskCreate, user_id: int):
     db_task = Task(**task.dict(), owner_id=user_id)
@@ -61,10 +76,10 @@ def create_task(db: Session, task: TaskCreate, user_id: int):
     return db_task
 
 def get_task(db: Session, task_id: int):
-    return db.query(Task).filter(Task.id == task_id).first()
+    return db.query(Task).filter(Task.id == task_id, Task.deleted_at.is_(None)).first()
 
 def update_task(db: Session, task_id: int, task_update: TaskUpdate):
-    db_task = db.query(Task).filter(Task.id == task_id).first()
+    db_task = get_task(db, task_id)
     if not db_task:
         raise HTTPException(status_code=404, detail="任务不存在")
     
@@ -76,41 +91,100 @@ def update_task(db: Session, task_id: int, task_update: TaskUpdate):
     db.refresh(db_task)
     return db_task
 
-def delete_task(db: Session, task_id: int):
-    """删除任务及其相关的所有数据"""
-    try:
-        # 1. 删除任务相关的所有图片文件
-        images = db.query(Image).filter(Image.task_id == task_id).all()
-        for image in images:
-            file_path = f"uploads/{image.file_path}"
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        
-        # 2. 删除任务目录
-        task_dir = f"uploads/task_{task_id}"
-        if os.path.exists(task_dir):
-            shutil.rmtree(task_dir)
-        
-        # 3. 删除数据库中的相关记录
-        # 先删除与图片相关的人员信息
-        for image in images:
-            db.query(PersonInvolved).filter(PersonInvolved.image_id == image.id).delete()
-            
-        # 删除图片记录
-        db.query(Image).filter(Image.task_id == task_id).delete()
-        
-        # 删除任务权限记录
-        db.query(TaskPermission).filter(TaskPermission.task_id == task_id).delete()
-        
-        # 最后删除任务本身
-        db.query(Task).filter(Task.id == task_id).delete()
-        
+def soft_delete_task(db: Session, task_id: int) -> bool:
+    """软删除任务：一条UPDATE标记删除时间，任务立即对所有查询不可见
+
+    数据库记录和文件由后台清理（见 backend/utils/task_purge.py），任务不存在或已删除时返回False。
+    """
+    result = db.execute(
+        update(Task).where(
+            Task.id == task_id, Task.deleted_at.is_(None)
+        ).values(deleted_at=get_now_shanghai())
+    )
+    db.commit()
+    return result.rowcount > 0
+
+def get_deleted_task_ids(db: Session, claim_stale_before: Optional[datetime] = None) -> List[int]:
+    """已软删除、等待清理的任务ID
+
+    指定claim_stale_before时只返回可以认领的任务（未被认领，或认领时间早于该时间）。
+    """
+    query = db.query(Task.id).filter(Task.deleted_at.isnot(None))
+    if claim_stale_before is not None:
+        query = query.filter(_purge_claimable(claim_stale_before))
+    return [task_id for (task_id,) in query.all()]
+
+def get_task_purge_state(db: Session, task_id: int):
+    """任务的 (owner_id, deleted_at, purge_started_at)，任务记录不存在（已清理完成）时返回None"""
+    return db.query(Task.owner_id, Task.deleted_at, Task.purge_started_at).filter(Task.id == task_id).first()
+
+def _purge_claimable(stale_before: datetime):
+    return or_(Task.purge_started_at.is_(None), Task.purge_started_at < stale_before)
+
+def claim_task_purge(db: Session, task_id: int, stale_before: datetime) -> bool:
+    """认领已软删除任务的清理：一条条件UPDATE设置认领时间，多个worker同时认领时只有一个成功
+
+    认领时间早于stale_before的任务视为认领的进程已异常退出，可以重新认领。
+    """
+    result = db.execute(
+        update(Task).where(
+            Task.id == task_id, Task.deleted_at.isnot(None), _purge_claimable(stale_before)
+        ).values(purge_started_at=get_now_shanghai())
+    )
+    db.commit()
+    return result.rowcount > 0
+
+def release_task_purge(db: Session, task_ids: List[int]):
+    """释放清理认领（清理失败或进程退出时），下次启动时由任一worker重新认领"""
+    db.execute(
+        update(Task).where(Task.id.in_(task_ids), Task.deleted_at.isnot(None)).values(purge_started_at=None)
+    )
+    db.commit()
+
+def count_task_images(db: Session, task_id: int) -> int:
+    return db.query(func.count(Image.id)).filter(Image.task_id == task_id).scalar()
+
+def purge_task_rows(db: Session, task_id: int, batch_size: int = 1000):
+    """分批删除已软删除任务的图片和人员记录，每批单独提交，不长时间持有表锁
+
+    每批按task_id取一批图片ID，再按ID集合删除人员和图片记录；之后同样分批删除导入的轨迹点。
+    逐批生成本批删除的 (图片数, 图片文件路径列表)，供调用方报告进度和删除文件。
+    """
+    while True:
+        rows = db.query(Image.id, Image.file_path).filter(
+            Image.task_id == task_id
+        ).order_by(Image.id).limit(batch_size).all()
+        if not rows:
+            break
+        image_ids = [row.id for row in rows]
+        db.query(PersonInvolved).filter(PersonInvolved.image_id.in_(image_ids)).delete(synchronize_session=False)
+        db.query(Image).filter(Image.id.in_(image_ids)).delete(synchronize_session=False)
         db.commit()
-        return True
-    except Exception as e:
-        db.rollback()
-        print(f"删除任务出错: {str(e)}")
-        return False
+        yield len(image_ids), [row.file_path for row in rows if row.file_path]
+
+    # 导入的轨迹点（单个任务可能有十几万个点，同样分批删除）
+    while True:
+        point_ids = [row.id for row in db.query(TrackPoint.id).filter(
+            TrackPoint.task_id == task_id
+        ).limit(batch_size).all()]
+        if not point_ids:
+            break
+        db.query(TrackPoint).filter(TrackPoint.id.in_(point_ids)).delete(synchronize_session=False)
+        db.commit()
+
+    # 上传文件索引、报告文件登记和权限记录
+    upload_index.unregister_task(db, task_id)
+    db.query(ReportArtifact).filter(ReportArtifact.task_id == task_id).delete(synchronize_session=False)
+    db.query(TaskPermission).filter(TaskPermission.task_id == task_id).delete(synchronize_session=False)
+    db.commit()
+
+def remove_deleted_task(db: Session, task_id: int) -> bool:
+    """删除已软删除且清理完成的任务记录"""
+    deleted = db.query(Task).filter(
+        Task.id == task_id, Task.deleted_at.isnot(None)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted > 0
 
 def create_task_permission(db: Session, permission: TaskPermissionCreate, task_id: int, shared_by_id: int):
     # 通过用户名获取用户ID
@@ -169,6 +243,22 @@ def create_task_permission(db: Session, permission: TaskPermissionCreate, task_i
     db.refresh(db_permission)
     return db_permission
 
+def get_task_with_permission(db: Session, task_id: int, user_id: int) -> Optional[Tuple[Task, Optional[TaskPermission]]]:
+    """一次查询获取任务（含创建者）及用户在该任务上的授权记录，任务不存在时返回None"""
+    return db.query(Task, TaskPermission).options(joinedload(Task.owner)).outerjoin(
+        TaskPermission,
+        and_(TaskPermission.task_id == Task.id, TaskPermission.user_id == user_id)
+    ).filter(Task.id == task_id, Task.deleted_at.is_(None)).first()
+
+def get_image_with_permission(db: Session, image_id: int, user_id: int) -> Optional[Tuple[Image, Task, Optional[TaskPermission]]]:
+    """一次查询获取图片、所属任务及用户在该任务上的授权记录，图片不存在时返回None"""
+    return db.query(Image, Task, TaskPermission).join(
+        Task, Task.id == Image.task_id
+    ).outerjoin(
+        TaskPermission,
+        and_(TaskPermission.task_id == Task.id, TaskPermission.user_id == user_id)
+    ).filter(Image.id == image_id, Task.deleted_at.is_(None)).first()
+
 def get_user_task_permission(db: Session, task_id: int, user_id: int):
     return db.query(TaskPermission).filter(
         TaskPermission.task_id == task_id,
@@ -185,13 +275,32 @@ def delete_task_permission(db: Session, task_id: int, user_id: int):
     db.commit()
     return True
 
-def create_image(db: Session, image: ImageCreate, file_path: str):
-    # 获取当前任务下最大的序号
-    max_seq = db.query(Image).filter(
-        Image.task_id == image.task_id
-    ).order_by(desc(Image.sequence_number)).first()
+def allocate_sequence_numbers(db: Session, task_id: int, count: int = 1) -> int:
+    """为任务原子地预留count个连续的图片序号，返回第一个序号
+
+    MySQL使用 UPDATE ... SET image_seq = LAST_INSERT_ID(image_seq + n)，一条语句完成递增并取回新值；
+    其他数据库使用 UPDATE ... RETURNING。行锁持有到事务提交，并发上传不会得到重复序号。
+    """
+    if db.get_bind().dialect.name == "mysql":
+        result = db.execute(
+            text("UPDATE tasks SET image_seq = LAST_INSERT_ID(image_seq + :count) WHERE id = :task_id AND deleted_at IS NULL"),
+            {"count": count, "task_id": task_id}
+        )
+        last_seq = result.lastrowid if result.rowcount else None
+    else:
+        last_seq = db.execute(
+            update(Task).where(
+                Task.id == task_id, Task.deleted_at.is_(None)
+            ).values(image_seq=Task.image_seq + count).returning(Task.image_seq)
+        ).scalar_one_or_none()
     
-    sequence_number = (max_seq.sequence_number + 1) if max_seq else 1
+    if last_seq is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return last_seq - count + 1
+
+def create_image(db: Session, image: ImageCreate, file_path: str, file_size: Optional[int] = None, checksum: Optional[str] = None):
+    # 原子分配序号
+    sequence_number = allocate_sequence_numbers(db, image.task_id)
     
     # 创建图片记录，只存储文件名而不是完整路径
     db_image = Image(
@@ -204,6 +313,8 @@ def create_image(db: Session, image: ImageCreate, file_path: str):
         gps_longitude=image.gps_longitude,
         transportation=image.transportation,
         sequence_number=sequence_number,
+        file_size=file_size,
+        checksum=checksum,
         created_by=image.created_by  # 保存创建者
     )
     db.add(db_image)
@@ -223,6 +334,65 @@ def create_image(db: Session, image: ImageCreate, file_path: str):
     
     return db_image
 
+def create_images_batch(db: Session, task_id: int, images: List[Tuple[ImageCreate, Optional[int], Optional[str]]]):
+    """在一个事务中批量创建图片及涉事人员记录
+
+    images 为 (图片数据, 文件大小, 校验值) 列表，序号按列表顺序连续预留。
+    图片和人员记录均使用批量INSERT写入，返回按列表顺序排列的图片对象。
+    """
+    if not images:
+        return []
+
+    try:
+        # 一条语句为整批图片预留连续序号
+        first_seq = allocate_sequence_numbers(db, task_id, len(images))
+
+        db.execute(insert(Image), [
+            {
+                "task_id": task_id,
+                "file_path": image.file_path.replace('\\', '/'),
+                "time": image.time,
+                "location": image.location,
+                "description": image.description,
+                "gps_latitude": image.gps_latitude,
+                "gps_longitude": image.gps_longitude,
+                "transportation": image.transportation,
+                "sequence_number": first_seq + offset,
+                "file_size": file_size,
+                "checksum": checksum,
+                "created_by": image.created_by
+            }
+            for offset, (image, file_size, checksum) in enumerate(images)
+        ])
+
+        # 按序号取回新图片的ID
+        id_by_seq = dict(db.query(Image.sequence_number, Image.id).filter(
+            Image.task_id == task_id,
+            Image.sequence_number.between(first_seq, first_seq + len(images) - 1)
+        ).all())
+
+        people_rows = [
+            {**person.dict(), "image_id": id_by_seq[first_seq + offset]}
+            for offset, (image, _, _) in enumerate(images)
+            for person in (image.people_involved or [])
+        ]
+        if people_rows:
+            db.execute(insert(PersonInvolved), people_rows)
+
+        # 登记到上传文件索引
+        upload_index.register_many(db, [image.file_path for image, _, _ in images])
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # 取回完整的图片记录（含涉事人员）用于返回
+    image_ids = [id_by_seq[first_seq + offset] for offset in range(len(images))]
+    db_images = db.query(Image).options(selectinload(Image.people_involved)).filter(Image.id.in_(image_ids)).all()
+    images_by_id = {img.id: img for img in db_images}
+    return [images_by_id[image_id] for image_id in image_ids]
+
 def update_image(db: Session, image_id: int, image_data: ImageCreate):
     db_image = db.query(Image).filter(Image.id == image_id).first()
     if not db_image:
@@ -275,5 +445,53 @@ def get_images_by_task(db: Session, task_id: int):
         Image.task_id == task_id
     ).order_by(Image.time).all()
 
+def get_task_images_page(
+    db: Session,
+    task_id: int,
+    limit: Optional[int] = None,
+    after_time: Optional[datetime] = None,
+    after_id: Optional[int] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    transportation: Optional[str] = None,
+    created_by: Optional[str] = None,
+    has_gps: Optional[bool] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None
+):
+    """按 (时间, ID) 排序分页获取任务图片，过滤条件在SQL中执行
+
+    after_time/after_id 为上一页最后一张图片的时间和ID（键集分页）；bbox 为 (最小经度, 最小纬度, 最大经度, 最大纬度)。
+    """
+    query = db.query(Image).options(selectinload(Image.people_involved)).filter(Image.task_id == task_id)
+    
+    if after_time is not None and after_id is not None:
+        query = query.filter(or_(
+            Image.time > after_time,
+            and_(Image.time == after_time, Image.id > after_id)
+        ))
+    if start_time is not None:
+        query = query.filter(Image.time >= start_time)
+    if end_time is not None:
+        query = query.filter(Image.time <= end_time)
+    if transportation:
+        query = query.filter(Image.transportation == transportation)
+    if created_by:
+        query = query.filter(Image.created_by == created_by)
+    if has_gps is True:
+        query = query.filter(Image.gps_latitude.isnot(None), Image.gps_longitude.isnot(None))
+    elif has_gps is False:
+        query = query.filter(or_(Image.gps_latitude.is_(None), Image.gps_longitude.is_(None)))
+    if bbox is not None:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        query = query.filter(
+            Image.gps_longitude.between(min_lng, max_lng),
+            Image.gps_latitude.between(min_lat, max_lat)
+        )
+    
+    query = query.order_by(Image.time, Image.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
 def get_image(db: Session, image_id: int):
     return db.query(Image).filter(Image.id == image_id).first() 
\ No newline at end of file
@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+from config import settings
+from .pool_stats import InstrumentedAsyncQueuePool, InstrumentedQueuePool
 
 # 数据库配置
 # 从环境变量获取数据库连接信息，如果环境变量不存在则使用默认值
@@ -17,39 +20,55 @@ IS_PRODUCTION = ENV.lower() == "production"
 
 # 构建MySQL连接URL
 SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}?charset=utf8mb4"
+# 异步连接URL（aiomysql驱动），供async路由使用
+ASYNC_SQLALCHEMY_DATABASE_URL = f"mysql+aiomysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}?charset=utf8mb4"
+
+# 每个连接建立时通过init_command设置会话时区，不再额外执行SET语句
+CONNECT_INIT_COMMAND = f"SET time_zone = '{settings.DB_TIMEZONE}'"
+
+# 连接池参数（每个worker进程各自拥有连接池，同步和异步引擎分别计算）
+POOL_OPTIONS = dict(
+    pool_pre_ping=True,  # 自动检测连接是否有效
+    pool_recycle=settings.DB_POOL_RECYCLE,  # 连接回收时间（秒）
+    pool_size=settings.DB_POOL_SIZE,  # 连接池大小
+    max_overflow=settings.DB_MAX_OVERFLOW,  # 超出连接池大小后允许额外创建的连接数
+    pool_timeout=settings.DB_POOL_TIMEOUT  # 获取连接的等待超时时间（秒）
+)
 
 # 创建MySQL引擎
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     echo=False,  # 关闭SQL语句日志
     echo_pool=False,  # 关闭连接池日志
-    pool_pre_ping=True,  # 自动检测连接是否有效
-    pool_recycle=3600,  # 连接回收时间（秒）
-    pool_size=10,  # 连接池大小
-    max_overflow=20,  # 最大连接数
-    pool_timeout=30  # 连接超时时间
+    poolclass=InstrumentedQueuePool,
+    connect_args={"init_command": CONNECT_INIT_COMMAND},
+    **POOL_OPTIONS
 )
 
-# 为每个连接设置时区
-@event.listens_for(engine, "connect")
-def set_timezone(dbapi_connection, connection_record):
-    cursor = dbapi_connection.cursor()
-    cursor.execute("SET time_zone = '+08:00'")
-    try:
-        if not IS_PRODUCTION:  # 仅在非生产环境尝试设置全局时区
-            cursor.execute("SET GLOBAL time_zone = '+08:00'")  # 设置全局时区
-    except:
-        pass  # 如果没有权限设置全局时区，则忽略错误
-    cursor.execute("SET SESSION time_zone = '+08:00'")  # 设置会话时区
-    cursor.close()
-
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# 创建异步引擎（async def 路由使用，查询时不阻塞事件循环）
+# 同步引擎继续用于普通 def 路由（在线程池中执行）、迁移、后台进程和命令行脚本
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    echo=False,
+    poolclass=InstrumentedAsyncQueuePool,
+    connect_args={"init_command": CONNECT_INIT_COMMAND},
+    **POOL_OPTIONS
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # 数据库会话依赖
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# 异步数据库会话依赖
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db 
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+连接池统计
+在QueuePool获取连接的位置计时，记录获取次数、等待时间和超时次数，
+结合连接池当前状态（已借出、溢出连接数）用于按负载确定每个worker的连接池大小。
+"""
+
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+class _WaitStats:
+    """获取连接的等待时间统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / attempts * 1000, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3)
+            }
+
+class _InstrumentedMixin:
+    def _do_get(self):
+        stats = self.__dict__.setdefault("_wait_stats", _WaitStats())
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        stats.record(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # 重建连接池（如engine.dispose）时保留累计的统计
+        pool = super().recreate()
+        pool.__dict__["_wait_stats"] = self.__dict__.setdefault("_wait_stats", _WaitStats())
+        return pool
+
+class InstrumentedQueuePool(_InstrumentedMixin, QueuePool):
+    """记录等待时间的QueuePool（同步引擎）"""
+
+class InstrumentedAsyncQueuePool(_InstrumentedMixin, AsyncAdaptedQueuePool):
+    """记录等待时间的AsyncAdaptedQueuePool（异步引擎）"""
+
+def get_pool_stats(pool) -> dict:
+    """连接池当前状态和累计的等待统计"""
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "timeout": pool.timeout()
+    }
+    wait_stats = pool.__dict__.get("_wait_stats")
+    stats.update(wait_stats.snapshot() if wait_stats else _WaitStats().snapshot())
+    return stats
@@ -0,0 +1,170 @@
+"""
+常用查询的执行计划和耗时对比
+在数据库中生成测试数据后，输出各常用查询的执行计划（EXPLAIN）和耗时，
+用于对比添加索引（迁移007）前后的效果：
+
+    python backend/db/query_benchmark.py seed --tasks 20 --images 2000   # 生成测试数据
+    python backend/db/query_benchmark.py run                             # 输出执行计划和耗时
+    alembic upgrade head                                                 # 添加索引
+    python backend/db/query_benchmark.py run                             # 再次对比
+    python backend/db/query_benchmark.py cleanup                         # 删除测试数据
+
+测试数据属于用户名为 __benchmark__ 的用户，cleanup 只删除该用户的数据。
+"""
+
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.orm import Session
+
+# 作为脚本运行时，添加项目根目录到Python路径
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from backend.models.models import Image, PersonInvolved, Task, TaskPermission, User
+
+BENCHMARK_USERNAME = "__benchmark__"
+BATCH_SIZE = 1000
+
+def _get_benchmark_user(db: Session):
+    return db.query(User).filter(User.username == BENCHMARK_USERNAME).first()
+
+def seed(db: Session, tasks: int, images_per_task: int, people_per_image: int = 2, shared_users: int = 50):
+    """生成测试数据：tasks个任务，每个任务images_per_task张图片，每张图片people_per_image个人员"""
+    user = _get_benchmark_user(db)
+    if user is None:
+        user = User(username=BENCHMARK_USERNAME, hashed_password="", company="benchmark",
+                    phone=f"1{random.randint(3000000000, 9999999999)}", is_active=False)
+        db.add(user)
+        db.flush()
+
+    # 授权记录对应的用户（同样是不可登录的测试用户）
+    share_user_ids = []
+    for index in range(shared_users):
+        shared = User(username=f"{BENCHMARK_USERNAME}{index}", hashed_password="", company="benchmark",
+                      phone=f"1{random.randint(3000000000, 9999999999)}", is_active=False)
+        db.add(shared)
+        db.flush()
+        share_user_ids.append(shared.id)
+
+    start_time = datetime(2024, 1, 1)
+    for task_index in range(tasks):
+        task = Task(title=f"{BENCHMARK_USERNAME} {task_index}", owner_id=user.id)
+        db.add(task)
+        db.flush()
+
+        db.execute(insert(TaskPermission), [
+            {"task_id": task.id, "user_id": user_id, "shared_by_id": user.id, "permission_type": "view",
+             "can_upload": False, "can_edit": False, "can_manage": False}
+            for user_id in share_user_ids
+        ])
+
+        for offset in range(0, images_per_task, BATCH_SIZE):
+            count = min(BATCH_SIZE, images_per_task - offset)
+            db.execute(insert(Image), [
+                {"task_id": task.id, "file_path": f"task_{task.id}/benchmark_{offset + i}.jpg",
+                 "time": start_time + timedelta(minutes=random.randint(0, 500000)),
+                 "location": "benchmark", "transportation": "步行",
+                 "sequence_number": offset + i + 1, "created_by": BENCHMARK_USERNAME}
+                for i in range(count)
+            ])
+        image_ids = db.execute(select(Image.id).where(Image.task_id == task.id)).scalars().all()
+        for offset in range(0, len(image_ids), BATCH_SIZE):
+            db.execute(insert(PersonInvolved), [
+                {"image_id": image_id, "name": "benchmark",
+                 "id_number": f"{random.randint(10 ** 17, 10 ** 18 - 1)}", "household_registration": ""}
+                for image_id in image_ids[offset:offset + BATCH_SIZE]
+                for _ in range(people_per_image)
+            ])
+        db.commit()
+        print(f"任务 {task_index + 1}/{tasks} 已生成")
+
+def cleanup(db: Session):
+    """删除测试数据"""
+    users = db.query(User).filter(User.username.like(f"{BENCHMARK_USERNAME}%")).all()
+    user_ids = [user.id for user in users]
+    task_ids = db.execute(select(Task.id).where(Task.owner_id.in_(user_ids))).scalars().all() if user_ids else []
+    if task_ids:
+        image_ids = select(Image.id).where(Image.task_id.in_(task_ids))
+        db.query(PersonInvolved).filter(PersonInvolved.image_id.in_(image_ids)).delete(synchronize_session=False)
+        db.query(Image).filter(Image.task_id.in_(task_ids)).delete(synchronize_session=False)
+        db.query(TaskPermission).filter(TaskPermission.task_id.in_(task_ids)).delete(synchronize_session=False)
+        db.query(Task).filter(Task.id.in_(task_ids)).delete(synchronize_session=False)
+    if user_ids:
+        db.query(User).filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+    db.commit()
+    print(f"已删除 {len(task_ids)} 个测试任务")
+
+def _queries(db: Session):
+    """待测试的常用查询（名称, 语句）"""
+    user = _get_benchmark_user(db)
+    if user is None:
+        raise SystemExit("没有测试数据，请先运行 seed")
+    task_id = db.execute(select(Task.id).where(Task.owner_id == user.id).order_by(Task.id.desc())).scalars().first()
+    shared_user_id = db.execute(select(TaskPermission.user_id).where(TaskPermission.task_id == task_id)).scalars().first()
+    image_ids = db.execute(select(Image.id).where(Image.task_id == task_id).limit(500)).scalars().all()
+    id_number = db.execute(select(PersonInvolved.id_number).where(PersonInvolved.image_id == image_ids[0])).scalars().first()
+
+    return [
+        ("任务图片按时间排序", select(Image).where(Image.task_id == task_id).order_by(Image.time)),
+        ("任务图片按序号排序", select(Image).where(Image.task_id == task_id).order_by(Image.sequence_number)),
+        ("用户的任务授权", select(TaskPermission).where(TaskPermission.task_id == task_id,
+                                                       TaskPermission.user_id == shared_user_id)),
+        ("图片的人员信息", select(PersonInvolved).where(PersonInvolved.image_id.in_(image_ids))),
+        ("按身份证号查询人员", select(PersonInvolved).where(PersonInvolved.id_number == id_number)),
+    ]
+
+def _explain(db: Session, statement) -> str:
+    dialect = db.get_bind().dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+    result = db.execute(text(prefix + sql))
+    columns = list(result.keys())
+    rows = result.fetchall()
+    if dialect.name == "mysql":
+        # 只输出判断是否使用索引需要的列
+        wanted = [name for name in ("table", "type", "key", "rows", "Extra") if name in columns]
+        return "\n".join(
+            "    " + ", ".join(f"{name}={row[columns.index(name)]}" for name in wanted) for row in rows
+        )
+    return "\n".join("    " + " | ".join(str(value) for value in row) for row in rows)
+
+def run(db: Session, repeat: int = 20):
+    """输出每个查询的执行计划和耗时（中位数、P95，毫秒）"""
+    for name, statement in _queries(db):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            db.execute(statement).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{name}: 中位数 {statistics.median(timings):.2f} ms, P95 {p95:.2f} ms")
+        print(_explain(db, statement))
+
+if __name__ == "__main__":
+    import argparse
+    from backend.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="常用查询的执行计划和耗时对比")
+    parser.add_argument("command", choices=["seed", "run", "cleanup"], help="seed: 生成测试数据; run: 输出执行计划和耗时; cleanup: 删除测试数据")
+    parser.add_argument("--tasks", type=int, default=20, help="生成的任务数")
+    parser.add_argument("--images", type=int, default=2000, help="每个任务的图片数")
+    parser.add_argument("--repeat", type=int, default=20, help="每个查询的执行次数")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "seed":
+            seed(db, args.tasks, args.images)
+        elif args.command == "run":
+            run(db, args.repeat)
+        else:
+            cleanup(db)
+    finally:
+        db.close()
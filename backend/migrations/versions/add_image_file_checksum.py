@@ -0,0 +1,23 @@
+"""图片表添加文件大小和校验值
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('images', sa.Column('file_size', sa.Integer(), nullable=True))
+    op.add_column('images', sa.Column('checksum', sa.String(length=64), nullable=True))
+
+def downgrade():
+    op.drop_column('images', 'checksum')
+    op.drop_column('images', 'file_size')
@@ -0,0 +1,39 @@
+"""为常用查询添加索引
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18 15:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # 任务图片列表：按任务过滤，按时间或序号排序
+    op.create_index('ix_images_task_time', 'images', ['task_id', 'time'])
+    op.create_index('ix_images_task_seq', 'images', ['task_id', 'sequence_number'])
+    
+    # 同一用户在同一任务上只保留最新的一条授权记录，然后添加唯一约束
+    op.execute(
+        "DELETE tp FROM task_permissions tp "
+        "JOIN task_permissions newer ON newer.task_id = tp.task_id "
+        "AND newer.user_id = tp.user_id AND newer.id > tp.id"
+    )
+    op.create_unique_constraint('uq_task_permissions_task_user', 'task_permissions', ['task_id', 'user_id'])
+    
+    # 人员信息：按图片加载，按身份证号查询
+    op.create_index('ix_people_involved_image_id', 'people_involved', ['image_id'])
+    op.create_index('ix_people_involved_id_number', 'people_involved', ['id_number'])
+
+def downgrade():
+    op.drop_index('ix_people_involved_id_number', table_name='people_involved')
+    op.drop_index('ix_people_involved_image_id', table_name='people_involved')
+    op.drop_constraint('uq_task_permissions_task_user', 'task_permissions', type_='unique')
+    op.drop_index('ix_images_task_seq', table_name='images')
+    op.drop_index('ix_images_task_time', table_name='images')
@@ -0,0 +1,43 @@
+"""添加生成报告文件表
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-18 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'report_artifacts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('report_type', sa.String(length=20), nullable=False),
+        sa.Column('file_path', sa.String(length=255), nullable=False),
+        sa.Column('file_size', sa.Integer(), nullable=True),
+        sa.Column('checksum', sa.String(length=64), nullable=True),
+        sa.Column('generator_version', sa.String(length=20), nullable=True),
+        sa.Column('fingerprint', sa.String(length=64), nullable=True),
+        sa.Column('created_by', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('file_path')
+    )
+    op.create_index('ix_report_artifacts_task_id', 'report_artifacts', ['task_id', 'id'])
+    op.create_index('ix_report_artifacts_task_fingerprint', 'report_artifacts', ['task_id', 'fingerprint'])
+    op.create_index('ix_report_artifacts_created_at', 'report_artifacts', ['created_at'])
+    # 已有的生成文件通过 python backend/utils/report_cache.py rebuild 登记
+
+def downgrade():
+    op.drop_index('ix_report_artifacts_created_at', table_name='report_artifacts')
+    op.drop_index('ix_report_artifacts_task_fingerprint', table_name='report_artifacts')
+    op.drop_index('ix_report_artifacts_task_id', table_name='report_artifacts')
+    op.drop_table('report_artifacts')
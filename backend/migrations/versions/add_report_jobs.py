@@ -0,0 +1,39 @@
+"""添加后台报告任务表
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'report_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('report_type', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('file_path', sa.String(length=255), nullable=True),
+        sa.Column('error', sa.String(length=255), nullable=True),
+        sa.Column('created_by', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_report_jobs_finished_at', 'report_jobs', ['finished_at'])
+
+def downgrade():
+    op.drop_index('ix_report_jobs_finished_at', table_name='report_jobs')
+    op.drop_table('report_jobs')
@@ -0,0 +1,23 @@
+"""任务表添加软删除时间
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18 20:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('tasks', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_tasks_deleted_at', 'tasks', ['deleted_at'])
+
+def downgrade():
+    op.drop_index('ix_tasks_deleted_at', table_name='tasks')
+    op.drop_column('tasks', 'deleted_at')
@@ -0,0 +1,28 @@
+"""任务表添加图片序号计数器
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('tasks', sa.Column('image_seq', sa.Integer(), nullable=False, server_default='0'))
+    
+    # 用现有图片的最大序号初始化计数器
+    op.execute(
+        "UPDATE tasks SET image_seq = ("
+        "SELECT COALESCE(MAX(images.sequence_number), 0) FROM images WHERE images.task_id = tasks.id"
+        ")"
+    )
+
+def downgrade():
+    op.drop_column('tasks', 'image_seq')
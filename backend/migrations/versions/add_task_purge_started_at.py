@@ -0,0 +1,21 @@
+"""任务表添加后台清理的认领时间
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-18 23:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('tasks', sa.Column('purge_started_at', sa.DateTime(), nullable=True))
+
+def downgrade():
+    op.drop_column('tasks', 'purge_started_at')
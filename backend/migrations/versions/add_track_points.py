@@ -0,0 +1,35 @@
+"""添加导入轨迹点表
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-18 21:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'track_points',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('task_id', sa.Integer(), nullable=False),
+        sa.Column('time', sa.DateTime(), nullable=True),
+        sa.Column('latitude', sa.Float(), nullable=False),
+        sa.Column('longitude', sa.Float(), nullable=False),
+        sa.Column('location', sa.String(length=255), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # 轨迹点按ID顺序（导入时已按时间排序）读取
+    op.create_index('ix_track_points_task_id', 'track_points', ['task_id', 'id'])
+
+def downgrade():
+    op.drop_index('ix_track_points_task_id', table_name='track_points')
+    op.drop_table('track_points')
@@ -0,0 +1,33 @@
+"""添加上传文件索引表
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'upload_index',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('basename', sa.String(length=255), nullable=False),
+        sa.Column('path', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('path')
+    )
+    op.create_index('ix_upload_index_id', 'upload_index', ['id'])
+    op.create_index('ix_upload_index_basename', 'upload_index', ['basename'])
+    # 已有的上传文件通过 python backend/utils/upload_index.py rebuild 登记
+
+def downgrade():
+    op.drop_index('ix_upload_index_basename', table_name='upload_index')
+    op.drop_index('ix_upload_index_id', table_name='upload_index')
+    op.drop_table('upload_index')
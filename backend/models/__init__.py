@@ -1,11 +1,11 @@
 # Import all models and schemas for easy access
 
-from .models import Base, User, Task, TaskPermission, Image, PersonInvolved
+from .models import Base, User, Task, TaskPermission, Image, PersonInvolved, UploadIndex
 from .schemas import (
     UserBase, UserCreate, User,
     Token, TokenData,
     PersonInvolvedBase, PersonInvolvedCreate, PersonInvolved,
     ImageBase, ImageCreate, Image,
     TaskPermissionBase, TaskPermissionCreate, TaskPermission,
-    TaskBase, TaskCreate, Task
+    TaskBase, TaskCreate, Task, TaskSummary
 ) 
\ No newline at end of file
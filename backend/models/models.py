@@ -1,6 +1,6 @@
 # Database models for the application
 
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text, Float, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, Text, Float, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from sqlalchemy.ext.declarative import declarative_base
@@ -42,6 +42,9 @@ class Task(Base):
     description = Column(Text, nullable=True)
     created_at = Column(DateTime, default=get_now_shanghai)
     owner_id = Column(Integer, ForeignKey("users.id"))
+    image_seq = Column(Integer, nullable=False, default=0, server_default="0")  # 已分配的最大图片序号
+    deleted_at = Column(DateTime, nullable=True, index=True)  # 软删除时间，非空表示已删除、等待后台清理
+    purge_started_at = Column(DateTime, nullable=True)  # 后台清理的认领时间，非空表示已有进程在清理
     
     owner = relationship("User", back_populates="tasks")
     images = relationship("Image", back_populates="task")
@@ -50,6 +53,9 @@ class Task(Base):
 class TaskPermission(Base):
     """Task permission model for sharing tasks between users"""
     __tablename__ = "task_permissions"
+    __table_args__ = (
+        UniqueConstraint("task_id", "user_id", name="uq_task_permissions_task_user"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"))
@@ -67,6 +73,10 @@ class TaskPermission(Base):
 class Image(Base):
     """Image model for storing image metadata"""
     __tablename__ = "images"
+    __table_args__ = (
+        Index("ix_images_task_time", "task_id", "time"),
+        Index("ix_images_task_seq", "task_id", "sequence_number"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(Integer, ForeignKey("tasks.id"))
@@ -78,6 +88,8 @@ class Image(Base):
     gps_longitude = Column(Float, nullable=True)
     transportation = Column(String(50), nullable=False)
     sequence_number = Column(Integer)
+    file_size = Column(Integer, nullable=True)  # 文件大小（字节）
+    checksum = Column(String(64), nullable=True)  # 文件内容的SHA-256校验值
     created_at = Column(DateTime, default=get_now_shanghai)
     updated_at = Column(DateTime, default=get_now_shanghai, onupdate=get_now_shanghai)
     created_by = Column(String(50), nullable=True)
@@ -88,6 +100,10 @@ class Image(Base):
 class PersonInvolved(Base):
     """Person involved model for tracking people in images"""
     __tablename__ = "people_involved"
+    __table_args__ = (
+        Index("ix_people_involved_image_id", "image_id"),
+        Index("ix_people_involved_id_number", "id_number"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     image_id = Column(Integer, ForeignKey("images.id", ondelete="CASCADE"))
@@ -95,4 +111,67 @@ class PersonInvolved(Base):
     id_number = Column(String(18))
     household_registration = Column(String(255))
     
-    image = relationship("Image", back_populates="people_involved") 
\ No newline at end of file
+    image = relationship("Image", back_populates="people_involved")
+
+class ReportJob(Base):
+    """Background report generation jobs, shared by all worker processes"""
+    __tablename__ = "report_jobs"
+    __table_args__ = (
+        Index("ix_report_jobs_finished_at", "finished_at"),
+    )
+    
+    id = Column(String(32), primary_key=True)  # 任务ID（uuid4十六进制）
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    report_type = Column(String(20), nullable=False)  # excel: 轨迹表, report: 轨迹报告
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, completed, failed
+    processed = Column(Integer, nullable=False, default=0)  # 已处理的图片数
+    total = Column(Integer, nullable=False, default=0)  # 图片总数
+    filename = Column(String(255), nullable=True)
+    file_path = Column(String(255), nullable=True)  # 生成文件相对outputs目录的路径
+    error = Column(String(255), nullable=True)
+    created_by = Column(String(50), nullable=True)
+    created_at = Column(DateTime, default=get_now_shanghai)
+    finished_at = Column(DateTime, nullable=True)
+
+class UploadIndex(Base):
+    """Index of stored upload files by basename, used to locate moved files"""
+    __tablename__ = "upload_index"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    basename = Column(String(255), index=True, nullable=False)
+    path = Column(String(255), unique=True, nullable=False)  # 相对uploads目录的路径
+
+class ReportArtifact(Base):
+    """Generated trajectory table / report files and the task data they were built from"""
+    __tablename__ = "report_artifacts"
+    __table_args__ = (
+        Index("ix_report_artifacts_task_id", "task_id", "id"),
+        Index("ix_report_artifacts_task_fingerprint", "task_id", "fingerprint"),
+        Index("ix_report_artifacts_created_at", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    report_type = Column(String(20), nullable=False)  # excel: 轨迹表, report: 轨迹报告
+    file_path = Column(String(255), unique=True, nullable=False)  # 相对outputs目录的路径
+    file_size = Column(Integer, nullable=True)  # 文件大小（字节）
+    checksum = Column(String(64), nullable=True)  # 文件内容的SHA-256校验值
+    generator_version = Column(String(20), nullable=True)  # 生成时的报告模板版本
+    fingerprint = Column(String(64), nullable=True)  # 生成时的任务数据指纹
+    created_by = Column(String(50), nullable=True)
+    created_at = Column(DateTime, default=get_now_shanghai)
+
+class TrackPoint(Base):
+    """GPS track points imported from Excel/CSV files, stored per task in track order"""
+    __tablename__ = "track_points"
+    __table_args__ = (
+        Index("ix_track_points_task_id", "task_id", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    time = Column(DateTime, nullable=True)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    location = Column(String(255), nullable=True)
+    description = Column(Text, nullable=True)
@@ -73,11 +73,29 @@ class Image(ImageBase):
     task_id: int
     created_at: datetime
     updated_at: datetime
+    file_size: Optional[int] = None
+    checksum: Optional[str] = None
     people_involved: List[PersonInvolved] = []
 
     class Config:
         from_attributes = True
 
+class ImageBatchItem(BaseModel):
+    """批量上传时每个文件对应的元数据"""
+    time: datetime
+    location: str
+    description: Optional[str] = None
+    transportation: str
+    gps_latitude: Optional[float] = None
+    gps_longitude: Optional[float] = None
+    people_involved: List[PersonInvolvedCreate] = []
+
+class ImageBatchResult(BaseModel):
+    filename: str
+    success: bool
+    image: Optional[Image] = None
+    error: Optional[str] = None
+
 # Task permission schemas
 class TaskPermissionBase(BaseModel):
     permission_type: str  # 'view', 'edit', 'admin'
@@ -117,4 +135,60 @@ class Task(TaskBase):
     permissions: List[TaskPermission] = []
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class TaskSummary(TaskBase):
+    """任务列表使用的摘要信息，不包含图片明细"""
+    id: int
+    created_at: datetime
+    owner_id: int
+    owner_username: Optional[str] = None
+    image_count: int = 0
+    first_image_time: Optional[datetime] = None
+    last_image_time: Optional[datetime] = None
+    thumbnail_path: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+# Report job schemas
+class ReportJobCreate(BaseModel):
+    case_id: int
+    type: str  # 'excel', 'report'
+
+class ReportJobResult(BaseModel):
+    filename: str
+    file_path: str
+
+class ReportJob(BaseModel):
+    job_id: str
+    type: str
+    case_id: str
+    status: str  # 'pending', 'running', 'completed', 'failed'
+    processed: int = 0
+    total: int = 0
+    result: Optional[ReportJobResult] = None
+    download_url: Optional[str] = None
+    error: Optional[str] = None
+
+class TaskPurgeJob(BaseModel):
+    task_id: int
+    status: str  # 'pending', 'running', 'retrying', 'completed', 'failed', 'skipped'（已由其他进程清理）
+    phase: Optional[str] = None  # 'rows': 删除数据库记录, 'files': 删除文件, 'done'
+    images_deleted: int = 0
+    images_total: int = 0
+    files_deleted: int = 0
+    files_total: int = 0
+    attempts: int = 0
+    error: Optional[str] = None
+
+class TrackImportResult(BaseModel):
+    task_id: int
+    imported: int  # 写入的轨迹点数
+    replaced: int = 0  # 被替换的原有轨迹点数
+    total_rows: int = 0
+    rejected: int = 0  # 坐标无效被丢弃的行数
+    rejected_rows: List[int] = []  # 被丢弃的行号（最多列出前20行）
+    invalid_times: int = 0  # 时间无法解析（按空时间保存）的行数
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
@@ -1,11 +1,22 @@
-from fastapi import APIRouter
-from fastapi.responses import FileResponse, RedirectResponse, HTMLResponse
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import RedirectResponse, HTMLResponse, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from config import settings
+from typing import Optional
+import hashlib
+import logging
 import os
 from fastapi import HTTPException
+from ..api import get_current_user
+from ..db.database import async_engine, engine
+from ..db.pool_stats import get_pool_stats
+from ..models import models
+from ..utils import file_serving, image_derivatives
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["base"])
 templates = Jinja2Templates(directory="frontend")
@@ -70,10 +81,49 @@ async def read_admin(request: Request):
 async def test():
     return {"message": "Test successful! System working normally."}
 
+# 数据库连接池统计（仅管理员可用），用于按负载调整 DB_POOL_SIZE / DB_MAX_OVERFLOW
+# 统计为当前worker进程的数据，多worker部署时每次请求可能落到不同的进程
+@router.get("/api/admin/pool-stats")
+async def get_db_pool_stats(current_user: models.User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="没有权限执行此操作")
+    return {
+        "pid": os.getpid(),
+        "sync": get_pool_stats(engine.pool),
+        "async": get_pool_stats(async_engine.sync_engine.pool)
+    }
+
 # 处理图片访问
+# 传入w参数时返回缩放后的派生图（缩略图/预览图），浏览器支持WebP时返回WebP格式
+# 上传文件名带时间戳，内容不会变化，使用长期缓存
 @router.get("/api/uploads/{task_id}/{filename}")
-async def get_image(task_id: str, filename: str):
+async def get_image(request: Request, task_id: str, filename: str, w: Optional[int] = Query(None, ge=16, le=4096)):
     file_path = os.path.join("uploads", task_id, filename)
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="图片不存在")
-    return FileResponse(file_path) 
\ No newline at end of file
+    if w is None:
+        return file_serving.serve_file(request, file_path, cache_control=file_serving.IMMUTABLE_CACHE)
+    
+    fmt = 'WEBP' if 'image/webp' in request.headers.get('accept', '') else 'JPEG'
+    width = image_derivatives.preview_width(w)
+    
+    # 强ETag：由原图的大小和修改时间、输出宽度、格式和质量决定，命中时不生成也不读取派生图
+    stat = os.stat(file_path)
+    etag_source = f"{stat.st_size}-{stat.st_mtime_ns}-{width}-{fmt}-{settings.PREVIEW_IMAGE_QUALITY}"
+    etag = f'"{hashlib.md5(etag_source.encode()).hexdigest()}"'
+    headers = {"Vary": "Accept"}
+    if file_serving.is_not_modified(request, etag):
+        return Response(status_code=304, headers={**headers, "ETag": etag, "Cache-Control": file_serving.IMMUTABLE_CACHE})
+    
+    try:
+        preview_path = await run_in_threadpool(image_derivatives.get_preview_image, file_path, width, fmt)
+    except (OSError, ValueError) as e:
+        # 无法解码的文件（非图片等）直接返回原文件
+        logger.warning(f"生成预览图失败: {file_path}, {str(e)}")
+        return file_serving.serve_file(request, file_path, cache_control=file_serving.IMMUTABLE_CACHE)
+    
+    media_type = "image/webp" if fmt == 'WEBP' else "image/jpeg"
+    return file_serving.serve_file(
+        request, preview_path, media_type=media_type, headers=headers,
+        cache_control=file_serving.IMMUTABLE_CACHE, etag=etag
+    )
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Request
 from sqlalchemy.orm import Session
+from pydantic import ValidationError
 from typing import List, Optional
 from ..models import models, schemas
 from ..db import crud, get_db
-from ..api import get_current_user
+from ..api import get_current_user, get_task_access, resolve_image_access, TaskAccess
+from ..utils import image_derivatives, upload_index, upload_storage
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
-import shutil
 import json
 import os
 import re
@@ -29,36 +31,14 @@ async def upload_image(
     gps_longitude: Optional[str] = Form(None),
     people_involved: str = Form("[]"),
     current_user: models.User = Depends(get_current_user),
+    access: TaskAccess = Depends(get_task_access),
     db: Session = Depends(get_db)
 ):
-    # 检查任务是否存在
-    task = crud.get_task(db=db, task_id=task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="任务不存在")
-    
-    # 检查用户是否有权限上传图片
-    if task.owner_id != current_user.id:
-        permission = crud.get_user_task_permission(db=db, task_id=task_id, user_id=current_user.id)
-        if not permission or not permission.can_upload:
-            raise HTTPException(status_code=403, detail="没有上传权限")
-    
-    # 创建目录结构：uploads/task_{task_id}/
-    task_dir = f"uploads/task_{task_id}"
-    if not os.path.exists(task_dir):
-        os.makedirs(task_dir)
-    
-    # 保存文件
-    file_extension = os.path.splitext(file.filename)[1]
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    file_name = f"{timestamp}_{file.filename}"
-    file_path = f"{task_dir}/{file_name}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # 修改file_path变量，只保存相对路径，去掉"uploads/"前缀
-    relative_path = f"task_{task_id}/{file_name}"
+    # 检查用户是否有权限上传图片（任务不存在时依赖中已返回404）
+    if not (access.is_owner or access.can_upload):
+        raise HTTPException(status_code=403, detail="没有上传权限")
     
+    # 先解析表单字段，格式错误时不写入文件
     # 解析时间
     try:
         image_time = datetime.fromisoformat(time)
@@ -82,6 +62,15 @@ async def upload_image(
     except json.JSONDecodeError:
         people_data = []
     
+    # 保存文件到 uploads/task_{task_id}/，流式写入临时文件后原子重命名
+    task_dir = f"uploads/task_{task_id}"
+    file_name = upload_storage.make_file_name(task_dir, file.filename)
+    file_path = f"{task_dir}/{file_name}"
+    file_size, checksum = await upload_storage.save_upload(file, file_path)
+    
+    # 修改file_path变量，只保存相对路径，去掉"uploads/"前缀
+    relative_path = f"task_{task_id}/{file_name}"
+    
     # 准备图片数据
     image_data = schemas.ImageCreate(
         task_id=task_id,
@@ -96,34 +85,102 @@ async def upload_image(
         created_by=current_user.username
     )
     
-    # 创建图片记录
-    image = crud.create_image(db=db, image=image_data, file_path=file_path)
+    def save_image_record():
+        # 登记到上传文件索引（随图片记录一起提交）
+        upload_index.register(db, relative_path)
+        return crud.create_image(db=db, image=image_data, file_path=file_path, file_size=file_size, checksum=checksum)
+    
+    # 创建图片记录（数据库操作在线程池中执行，避免阻塞事件循环），失败时删除已保存的文件
+    try:
+        image = await run_in_threadpool(save_image_record)
+    except Exception:
+        await run_in_threadpool(db.rollback)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
     
     return image
 
+# 批量上传图片
+# metadata 为JSON数组，与files一一对应，每项包含 time、location、transportation 等字段（同单张上传）
+@router.post("/{task_id}/batch", response_model=List[schemas.ImageBatchResult])
+async def upload_images_batch(
+    task_id: int,
+    files: List[UploadFile] = File(...),
+    metadata: str = Form(...),
+    current_user: models.User = Depends(get_current_user),
+    access: TaskAccess = Depends(get_task_access),
+    db: Session = Depends(get_db)
+):
+    # 检查上传权限（整批只检查一次）
+    if not (access.is_owner or access.can_upload):
+        raise HTTPException(status_code=403, detail="没有上传权限")
+    
+    # 解析元数据
+    try:
+        items = json.loads(metadata)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="元数据格式不正确")
+    if not isinstance(items, list) or len(items) != len(files):
+        raise HTTPException(status_code=400, detail="元数据数量与文件数量不一致")
+    
+    results = [schemas.ImageBatchResult(filename=file.filename or "", success=False) for file in files]
+    
+    # 逐个保存文件，元数据或文件有问题的只标记该文件失败
+    task_dir = f"uploads/task_{task_id}"
+    reserved_names = set()
+    pending = []  # (结果下标, 保存路径, (图片数据, 文件大小, 校验值))
+    for index, (file, item) in enumerate(zip(files, items)):
+        try:
+            meta = schemas.ImageBatchItem.model_validate(item)
+        except ValidationError:
+            results[index].error = "元数据格式不正确"
+            continue
+        
+        file_name = upload_storage.make_file_name(task_dir, file.filename, reserved_names)
+        file_path = f"{task_dir}/{file_name}"
+        try:
+            file_size, checksum = await upload_storage.save_upload(file, file_path)
+        except HTTPException as e:
+            results[index].error = e.detail
+            continue
+        
+        image_data = schemas.ImageCreate(
+            task_id=task_id,
+            file_path=f"task_{task_id}/{file_name}",
+            created_by=current_user.username,
+            **meta.model_dump()
+        )
+        pending.append((index, file_path, (image_data, file_size, checksum)))
+    
+    # 一个事务内批量写入图片和人员记录，失败时删除本批已保存的文件
+    try:
+        images = await run_in_threadpool(crud.create_images_batch, db, task_id, [entry for _, _, entry in pending])
+    except Exception:
+        for _, file_path, _ in pending:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        raise HTTPException(status_code=500, detail="保存图片记录失败")
+    
+    for (index, _, _), image in zip(pending, images):
+        results[index].success = True
+        results[index].image = schemas.Image.model_validate(image)
+    
+    return results
+
 # 获取图片详情
 @router.get("/{image_id}", response_model=schemas.Image)
 def get_image(
     image_id: int,
+    request: Request,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    image = crud.get_image(db=db, image_id=image_id)
-    if not image:
-        raise HTTPException(status_code=404, detail="图片不存在")
+    image, access = resolve_image_access(request, db, current_user, image_id)
     
-    task = crud.get_task(db=db, task_id=image.task_id)
-    
-    # 检查权限
-    # 系统管理员可以查看任何图片
-    if current_user.is_admin:
-        return image
-        
-    # 非系统管理员需要检查任务权限
-    if task.owner_id != current_user.id:
-        permission = crud.get_user_task_permission(db=db, task_id=task.id, user_id=current_user.id)
-        if not permission:
-            raise HTTPException(status_code=403, detail="没有权限查看此图片")
+    # 检查权限（系统管理员可以查看任何图片）
+    if not access.can_view:
+        raise HTTPException(status_code=403, detail="没有权限查看此图片")
     
     return image
 
@@ -132,15 +189,11 @@ def get_image(
 def update_image(
     image_id: int,
     image_data: schemas.ImageCreate,
+    request: Request,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    image = crud.get_image(db=db, image_id=image_id)
-    if not image:
-        raise HTTPException(status_code=404, detail="图片不存在")
-    
-    task = crud.get_task(db=db, task_id=image.task_id)
-    permission = crud.get_user_task_permission(db=db, task_id=task.id, user_id=current_user.id)
+    image, access = resolve_image_access(request, db, current_user, image_id)
     
     # 权限检查：
     # 1. 任务所有者可以编辑任何图片
@@ -149,8 +202,8 @@ def update_image(
     # 4. 普通用户只能编辑自己上传的图片
     
     # 系统管理员或任务管理员可以编辑任何图片
-    is_system_admin = current_user.is_admin
-    is_task_admin = permission and permission.permission_type == "admin"
+    is_system_admin = access.is_system_admin
+    is_task_admin = access.is_task_admin
     
     if is_system_admin or is_task_admin:
         # 保存原始的创建者信息
@@ -159,10 +212,10 @@ def update_image(
         return crud.update_image(db=db, image_id=image_id, image_data=image_data)
     
     # 非管理员需要继续检查权限
-    is_task_owner = task.owner_id == current_user.id
+    is_task_owner = access.is_owner
     is_image_creator = image.created_by == current_user.username
     
-    if not (is_task_owner or (permission and permission.can_edit and is_image_creator)):
+    if not (is_task_owner or (access.can_edit and is_image_creator)):
         if is_image_creator:
             raise HTTPException(status_code=403, detail="您没有编辑此图片的权限")
         else:
@@ -180,17 +233,12 @@ def update_image(
 @router.delete("/{image_id}", response_model=dict)
 def delete_image(
     image_id: int,
+    request: Request,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # 检查图片是否存在
-    image = crud.get_image(db=db, image_id=image_id)
-    if not image:
-        raise HTTPException(status_code=404, detail="图片不存在")
-    
-    # 获取关联的任务
-    task = crud.get_task(db=db, task_id=image.task_id)
-    permission = crud.get_user_task_permission(db=db, task_id=task.id, user_id=current_user.id)
+    # 获取图片及所属任务的权限（图片不存在时返回404）
+    image, access = resolve_image_access(request, db, current_user, image_id)
     
     # 权限检查：
     # 1. 任务所有者可以删除任何图片
@@ -199,8 +247,8 @@ def delete_image(
     # 4. 普通用户只能删除自己上传的图片
     
     # 系统管理员或任务管理员可以删除任何图片
-    is_system_admin = current_user.is_admin
-    is_task_admin = permission and permission.permission_type == "admin"
+    is_system_admin = access.is_system_admin
+    is_task_admin = access.is_task_admin
     
     if is_system_admin or is_task_admin:
         try:
@@ -208,6 +256,7 @@ def delete_image(
             file_path = f"uploads/{image.file_path}"
             if os.path.exists(file_path):
                 os.remove(file_path)
+            image_derivatives.remove_derivatives(file_path)
             
             # 删除数据库记录
             # 1. 先删除关联的人员信息
@@ -216,6 +265,9 @@ def delete_image(
             # 2. 删除图片记录
             db.query(models.Image).filter(models.Image.id == image_id).delete()
             
+            # 3. 移除上传文件索引
+            upload_index.unregister(db, image.file_path)
+            
             db.commit()
             
             return {"message": "图片已成功删除"}
@@ -224,10 +276,10 @@ def delete_image(
             raise HTTPException(status_code=500, detail=f"删除图片时出错: {str(e)}")
     
     # 非管理员需要继续检查权限
-    is_task_owner = task.owner_id == current_user.id
+    is_task_owner = access.is_owner
     is_image_creator = image.created_by == current_user.username
     
-    if not (is_task_owner or (permission and permission.can_edit and is_image_creator)):
+    if not (is_task_owner or (access.can_edit and is_image_creator)):
         if is_image_creator:
             raise HTTPException(status_code=403, detail="您没有删除此图片的权限")
         else:
@@ -238,6 +290,7 @@ def delete_image(
         file_path = f"uploads/{image.file_path}"
         if os.path.exists(file_path):
             os.remove(file_path)
+        image_derivatives.remove_derivatives(file_path)
         
         # 删除数据库记录
         # 1. 先删除关联的人员信息
@@ -246,6 +299,9 @@ def delete_image(
         # 2. 删除图片记录
         db.query(models.Image).filter(models.Image.id == image_id).delete()
         
+        # 3. 移除上传文件索引
+        upload_index.unregister(db, image.file_path)
+        
         db.commit()
         
         return {"message": "图片已成功删除"}
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from ..models import models, schemas
 from ..db import crud, get_db
-from ..api import get_current_user
+from ..api import get_current_user, get_task_access, TaskAccess
+from ..utils import acl_cache, task_export, task_purge
 
 router = APIRouter(
     prefix="/tasks",
@@ -16,37 +19,36 @@ router = APIRouter(
 def create_task(task: schemas.TaskCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     return crud.create_task(db=db, task=task, user_id=current_user.id)
 
-# 获取用户的所有任务
-@router.get("/", response_model=List[schemas.Task])
-def get_user_tasks(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return crud.get_tasks_by_user(db=db, user_id=current_user.id)
+# 获取用户的任务列表（摘要信息，按任务ID倒序分页）
+# 翻页时将上一页最后一个任务的ID作为before_id传入；完整图片列表请使用 /tasks/{task_id}/images
+@router.get("/", response_model=List[schemas.TaskSummary])
+def get_user_tasks(
+    limit: int = Query(100, ge=1, le=500),
+    before_id: Optional[int] = Query(None, ge=1),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return crud.get_task_summaries_by_user(db=db, user_id=current_user.id, limit=limit, before_id=before_id)
 
 # 获取单个任务
 @router.get("/{task_id}", response_model=schemas.Task)
-def get_task(task_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    task = crud.get_task(db=db, task_id=task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="任务不存在")
-    return task
+def get_task(task_id: int, access: TaskAccess = Depends(get_task_access)):
+    if not access.can_view:
+        raise HTTPException(status_code=403, detail="没有权限访问此任务")
+    return access.task
 
 # 更新任务
 @router.put("/{task_id}", response_model=schemas.Task)
 def update_task(
     task_id: int,
     task_update: schemas.TaskUpdate,
-    current_user: models.User = Depends(get_current_user),
+    access: TaskAccess = Depends(get_task_access),
     db: Session = Depends(get_db)
 ):
-    # 检查任务是否存在
-    task = crud.get_task(db=db, task_id=task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="任务不存在")
-    
     # 检查是否有权限更新任务
-    if task.owner_id != current_user.id:
+    if not access.is_owner:
         # 检查是否有编辑权限
-        permission = crud.get_user_task_permission(db=db, task_id=task_id, user_id=current_user.id)
-        if not permission or permission.permission_type not in ["edit", "admin"]:
+        if access.permission_type not in ["edit", "admin"]:
             raise HTTPException(status_code=403, detail="没有权限编辑此任务")
     
     # 更新任务
@@ -58,20 +60,18 @@ def create_task_permission(
     task_id: int,
     permission: schemas.TaskPermissionCreate,
     current_user: models.User = Depends(get_current_user),
+    access: TaskAccess = Depends(get_task_access),
     db: Session = Depends(get_db)
 ):
-    task = crud.get_task(db=db, task_id=task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="任务不存在")
-    
     # 检查权限：任务创建者或有管理员权限的用户可以分享任务
-    if task.owner_id != current_user.id:
+    if not access.is_owner:
         # 检查当前用户是否有管理员权限
-        user_permission = crud.get_user_task_permission(db=db, task_id=task_id, user_id=current_user.id)
-        if not user_permission or not user_permission.can_manage:
+        if not access.can_manage:
             raise HTTPException(status_code=403, detail="只有任务创建者或管理员可以授权权限")
     
-    return crud.create_task_permission(db=db, permission=permission, task_id=task_id, shared_by_id=current_user.id)
+    db_permission = crud.create_task_permission(db=db, permission=permission, task_id=task_id, shared_by_id=current_user.id)
+    acl_cache.invalidate(task_id, db_permission.user_id)
+    return db_permission
 
 # 删除任务权限（取消分享）
 @router.delete("/{task_id}/permissions/{username}", response_model=dict)
@@ -79,12 +79,9 @@ def delete_task_permission(
     task_id: int,
     username: str,
     current_user: models.User = Depends(get_current_user),
+    access: TaskAccess = Depends(get_task_access),
     db: Session = Depends(get_db)
 ):
-    task = crud.get_task(db=db, task_id=task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="任务不存在")
-    
     # 获取要删除权限的用户
     target_user = crud.get_user_by_username(db=db, username=username)
     if not target_user:
@@ -94,15 +91,12 @@ def delete_task_permission(
     # 1. 任务创建者可以删除任何人的权限
     # 2. 管理员只能删除自己分享的权限
     # 3. 普通用户无法删除权限
-    is_owner = task.owner_id == current_user.id
-    
-    if is_owner:
+    if access.is_owner:
         # 任务创建者可以删除任何人的权限
         pass
     else:
         # 非创建者，检查是否有管理员权限
-        user_permission = crud.get_user_task_permission(db=db, task_id=task_id, user_id=current_user.id)
-        if not user_permission or not user_permission.can_manage:
+        if not access.can_manage:
             raise HTTPException(status_code=403, detail="没有权限管理任务分享")
         
         # 获取要删除的权限记录
@@ -116,51 +110,68 @@ def delete_task_permission(
     
     # 删除权限
     result = crud.delete_task_permission(db=db, task_id=task_id, user_id=target_user.id)
+    acl_cache.invalidate(task_id, target_user.id)
     if not result:
         raise HTTPException(status_code=404, detail="未找到该用户的权限记录")
     
     return {"message": "已成功取消分享"}
 
-# 获取任务的所有图片
+# 获取任务的图片（按时间、ID排序）
+# 不传limit时返回全部图片；分页时将上一页最后一张图片的time和id作为after_time、after_id传入
+# bbox 格式为 "最小经度,最小纬度,最大经度,最大纬度"
 @router.get("/{task_id}/images", response_model=List[schemas.Image])
 def get_task_images(
     task_id: int,
-    current_user: models.User = Depends(get_current_user),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    after_time: Optional[datetime] = None,
+    after_id: Optional[int] = Query(None, ge=1),
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    transportation: Optional[str] = None,
+    created_by: Optional[str] = None,
+    has_gps: Optional[bool] = None,
+    bbox: Optional[str] = None,
+    access: TaskAccess = Depends(get_task_access),
     db: Session = Depends(get_db)
 ):
-    # 检查权限
-    task = crud.get_task(db=db, task_id=task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="任务不存在")
+    # 检查用户是否有权限访问该任务（系统管理员可以访问任何任务的图片）
+    if not access.can_view:
+        raise HTTPException(status_code=403, detail="没有权限访问此任务的图片")
     
-    # 系统管理员可以访问任何任务的图片
-    if current_user.is_admin:
-        return crud.get_images_by_task(db=db, task_id=task_id)
+    if (after_time is None) != (after_id is None):
+        raise HTTPException(status_code=400, detail="after_time和after_id需要同时提供")
     
-    # 检查用户是否有权限访问该任务
-    permission = crud.get_user_task_permission(db=db, task_id=task_id, user_id=current_user.id)
-    if not (task.owner_id == current_user.id or permission):
-        raise HTTPException(status_code=403, detail="没有权限访问此任务的图片")
+    bbox_values = None
+    if bbox:
+        try:
+            bbox_values = tuple(float(value) for value in bbox.split(","))
+        except ValueError:
+            bbox_values = None
+        if not bbox_values or len(bbox_values) != 4 or bbox_values[0] > bbox_values[2] or bbox_values[1] > bbox_values[3]:
+            raise HTTPException(status_code=400, detail="bbox格式不正确")
     
-    return crud.get_images_by_task(db=db, task_id=task_id)
+    return crud.get_task_images_page(
+        db=db,
+        task_id=task_id,
+        limit=limit,
+        after_time=after_time,
+        after_id=after_id,
+        start_time=start_time,
+        end_time=end_time,
+        transportation=transportation,
+        created_by=created_by,
+        has_gps=has_gps,
+        bbox=bbox_values
+    )
 
 # 获取用户对任务的权限信息
 @router.get("/{task_id}/user-permission", response_model=dict)
 def get_user_task_permission_info(
     task_id: int,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    access: TaskAccess = Depends(get_task_access)
 ):
-    # 检查任务是否存在
-    task = crud.get_task(db=db, task_id=task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="任务不存在")
-    
-    # 检查用户是否是任务创建者
-    is_owner = task.owner_id == current_user.id
-    
     # 如果是创建者，拥有全部权限
-    if is_owner:
+    if access.is_owner:
         return {
             "is_owner": True,
             "can_view": True,
@@ -172,61 +183,73 @@ def get_user_task_permission_info(
         }
     
     # 获取用户权限
-    permission = crud.get_user_task_permission(db=db, task_id=task_id, user_id=current_user.id)
-    if not permission:
+    if not access.has_permission:
         raise HTTPException(status_code=403, detail="没有权限访问此任务")
     
     # 返回权限信息
     return {
         "is_owner": False,
         "can_view": True,  # 如果有任何权限，就可以查看
-        "can_edit": permission.can_edit,
-        "can_upload": permission.can_upload,
-        "can_manage": permission.can_manage,
-        "can_share": permission.can_manage,  # 管理员权限的用户也可以分享任务
-        "permission_type": permission.permission_type
+        "can_edit": access.can_edit,
+        "can_upload": access.can_upload,
+        "can_manage": access.can_manage,
+        "can_share": access.can_manage,  # 管理员权限的用户也可以分享任务
+        "permission_type": access.permission_type
     }
 
-# 删除任务
+# 打包导出任务的所有原始文件、生成的报告和图片清单（边打包边下载）
+@router.get("/{task_id}/export.zip")
+def export_task_zip(task_id: int, access: TaskAccess = Depends(get_task_access)):
+    if not access.can_view:
+        raise HTTPException(status_code=403, detail="没有权限导出此任务")
+    return StreamingResponse(
+        task_export.iter_task_zip(task_id),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="task_{task_id}.zip"'}
+    )
+
+# 删除任务：标记删除后立即返回，数据库记录和文件由后台清理
 @router.delete("/{task_id}", response_model=dict)
 def delete_task(
     task_id: int,
-    current_user: models.User = Depends(get_current_user),
+    access: TaskAccess = Depends(get_task_access),
     db: Session = Depends(get_db)
 ):
-    # 检查任务是否存在
-    task = crud.get_task(db=db, task_id=task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="任务不存在")
-    
     # 只有任务创建者可以删除任务
-    if task.owner_id != current_user.id:
+    if not access.is_owner:
         raise HTTPException(status_code=403, detail="只有任务创建者可以删除任务")
     
-    # 删除任务及其所有相关数据
-    result = crud.delete_task(db=db, task_id=task_id)
-    if not result:
-        raise HTTPException(status_code=500, detail="删除任务失败")
+    if not crud.soft_delete_task(db=db, task_id=task_id):
+        raise HTTPException(status_code=404, detail="任务不存在")
+    acl_cache.invalidate(task_id)
+    purge = task_purge.submit(task_id, deleted_by=access.user.username)
     
-    return {"message": "任务已成功删除"}
+    return {"message": "任务已成功删除", "purge": schemas.TaskPurgeJob(**purge).model_dump()}
+
+# 查询已删除任务的后台清理进度（任务创建者或系统管理员，任意worker都可查询）
+@router.get("/{task_id}/purge", response_model=schemas.TaskPurgeJob)
+def get_task_purge(
+    task_id: int,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    status = task_purge.get_status(db, task_id)
+    if not status or (status["owner_id"] not in (None, current_user.id) and not current_user.is_admin):
+        raise HTTPException(status_code=404, detail="没有该任务的清理记录")
+    return status
 
 # 获取任务的所有权限记录
 @router.get("/{task_id}/permissions", response_model=List[dict])
 def get_task_permissions(
     task_id: int,
     current_user: models.User = Depends(get_current_user),
+    access: TaskAccess = Depends(get_task_access),
     db: Session = Depends(get_db)
 ):
-    # 检查任务是否存在
-    task = crud.get_task(db=db, task_id=task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="任务不存在")
-    
     # 检查权限：任务创建者或有管理员权限的用户可以查看权限列表
-    is_owner = task.owner_id == current_user.id
+    is_owner = access.is_owner
     if not is_owner:
-        user_permission = crud.get_user_task_permission(db=db, task_id=task_id, user_id=current_user.id)
-        if not user_permission or not user_permission.can_manage:
+        if not access.can_manage:
             raise HTTPException(status_code=403, detail="只有任务创建者或管理员可以查看权限列表")
     
     # 获取权限记录
@@ -248,7 +271,7 @@ def get_task_permissions(
             if permission.shared_by_id:
                 shared_by = db.query(models.User).filter(models.User.id == permission.shared_by_id).first()
                 if shared_by:
-                    is_creator = (task.owner_id == permission.shared_by_id)
+                    is_creator = (access.owner_id == permission.shared_by_id)
                     shared_by_info = {
                         "username": shared_by.username,
                         "is_creator": is_creator
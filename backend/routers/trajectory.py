@@ -4,19 +4,22 @@
 所有路由的完整路径为 /api/trajectory/xxx
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
+import numpy as np
 from backend.db.database import get_db, IS_PRODUCTION
-from backend.models.models import Task, Image, PersonInvolved
-import pandas as pd
-from docx import Document
-from docx.shared import Inches
+from config import settings
+from backend.models import models, schemas
+from backend.api import get_current_user, get_task_access, resolve_task_access, TaskAccess
+from backend.utils import file_serving, reports, report_jobs, report_cache, track_import, track_simplify
 import os
-from datetime import datetime
+from typing import List, Optional
 import json
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import HTMLResponse
 import shutil
 import mimetypes
+import urllib.parse
 
 import logging
 
@@ -32,119 +35,28 @@ router = APIRouter(
 # 创建outputs目录（如果不存在）
 os.makedirs('outputs', exist_ok=True)
 
-# 创建任务子目录函数
-def get_task_output_dir(task_id: str) -> str:
-    """获取任务输出目录，如果不存在则创建"""
-    task_dir = os.path.join('outputs', f'task_{task_id}')
-    os.makedirs(task_dir, exist_ok=True)
-    return task_dir
-
-def get_case_info(case_id: str, db: Session):
-    """获取案件信息，包括图片和相关人员信息"""
-    try:
-        # 获取任务信息
-        task = db.query(Task).filter(Task.id == case_id).first()
-        if not task:
-            return None
-            
-        # 获取所有相关图片信息，按时间排序
-        images = db.query(Image).filter(Image.task_id == case_id).order_by(Image.time).all()
-        
-        # 处理图片信息
-        images_info = []
-        for img in images:
-            # 获取该图片相关的人员信息
-            people = db.query(PersonInvolved).filter(PersonInvolved.image_id == img.id).all()
-            
-            image_info = {
-                'time': img.time.strftime('%Y-%m-%d %H:%M:%S') if img.time else '',
-                'location': img.location or '',
-                'transportation': img.transportation or '',
-                'description': img.description or '',
-                'persons': [{
-                    'name': p.name,
-                    'id_number': p.id_number,
-                    'hometown': p.household_registration
-                } for p in people],
-                'image_path': img.file_path if img.file_path else None
-            }
-            images_info.append(image_info)
-        
-        # 获取所有涉事人员信息（不重复）
-        involved_persons = db.query(PersonInvolved).distinct(
-            PersonInvolved.name,
-            PersonInvolved.id_number,
-            PersonInvolved.household_registration
-        ).filter(
-            PersonInvolved.image_id.in_([img.id for img in images])
-        ).all()
-        
-        return {
-            'subject': task.title,  # 使用任务标题作为主题
-            'images_info': images_info,
-            'involved_persons': [{
-                'name': p.name,
-                'id_number': p.id_number,
-                'hometown': p.household_registration
-            } for p in involved_persons]
-        }
-    except Exception as e:
-        logger.error(f"获取案件信息失败: {str(e)}", exc_info=not IS_PRODUCTION)
-        raise HTTPException(status_code=500, detail="获取案件信息失败")
+def _require_view(request: Request, db: Session, user: models.User, task_id: int):
+    """生成报告前检查当前用户能否查看任务，任务不存在时返回404"""
+    if not resolve_task_access(request, db, user, task_id).can_view:
+        raise HTTPException(status_code=403, detail="没有权限访问此任务")
 
 @router.get("/excel/{case_id}")
-async def generate_trajectory_excel(case_id: str, db: Session = Depends(get_db)):
+def generate_trajectory_excel(
+    case_id: int,
+    request: Request,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """生成指定案件的轨迹表Excel文件"""
+    _require_view(request, db, current_user, case_id)
     logger.info(f"开始为案件ID {case_id} 生成轨迹表")
     try:
-        # 获取案件信息
-        case_info = get_case_info(case_id, db)
-        if not case_info:
+        # 任务数据未变化时直接返回已生成的文件
+        result = reports.build(str(case_id), "excel", db, created_by=current_user.username)
+        if not result:
             raise HTTPException(status_code=404, detail="未找到相关案件信息")
-            
-        # 准备Excel数据
-        excel_data = []
-        for img_info in case_info['images_info']:
-            # 将人员信息转换为字符串
-            persons_str = ', '.join([f"{p['name']}({p['id_number']})" for p in img_info['persons']]) if img_info['persons'] else ''
-            
-            excel_data.append({
-                '时间': img_info['time'],
-                '地点': img_info['location'],
-                '交通方式': img_info['transportation'],
-                '事件描述': img_info['description'],
-                '涉事人员': persons_str
-            })
-        
-        # 创建DataFrame
-        df = pd.DataFrame(excel_data)
-        
-        # 生成文件名
-        current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"关于{case_info['subject']}的轨迹表_{current_time}.xlsx"
-        
-        # 获取任务输出目录
-        task_dir = get_task_output_dir(case_id)
-        filepath = os.path.join(task_dir, filename)
-        
-        # 创建Excel写入器
-        writer = pd.ExcelWriter(filepath, engine='openpyxl')
-        
-        # 写入数据
-        df.to_excel(writer, sheet_name=f"关于{case_info['subject']}的轨迹表", index=False)
         
-        # 调整列宽
-        worksheet = writer.sheets[f"关于{case_info['subject']}的轨迹表"]
-        for idx, col in enumerate(df.columns):
-            max_length = max(df[col].astype(str).apply(len).max(),
-                           len(col))
-            worksheet.column_dimensions[chr(65 + idx)].width = max_length + 2
-            
-        # 保存文件
-        writer.close()
-        
-        logger.info(f"成功生成轨迹表: {filename}")
-        return {"filename": filename, "file_path": os.path.join(f'task_{case_id}', filename)}
+        return result
     except HTTPException:
         raise
     except Exception as e:
@@ -152,121 +64,206 @@ async def generate_trajectory_excel(case_id: str, db: Session = Depends(get_db))
         raise HTTPException(status_code=500, detail="生成轨迹表失败")
 
 @router.get("/report/{case_id}")
-async def generate_trajectory_report(case_id: str, db: Session = Depends(get_db)):
+def generate_trajectory_report(
+    case_id: int,
+    request: Request,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """生成指定案件的轨迹报告Word文档"""
+    _require_view(request, db, current_user, case_id)
     logger.info(f"开始为案件ID {case_id} 生成轨迹报告")
     try:
-        # 获取案件信息
-        case_info = get_case_info(case_id, db)
-        if not case_info:
+        # 任务数据未变化时直接返回已生成的文件
+        result = reports.build(str(case_id), "report", db, created_by=current_user.username)
+        if not result:
             raise HTTPException(status_code=404, detail="未找到相关案件信息")
-            
-        # 创建Word文档
-        doc = Document()
         
-        # 添加标题
-        doc.add_heading(f"关于{case_info['subject']}的轨迹报告", 0)
-        
-        # 添加涉事人员信息
-        doc.add_heading('涉事人员信息', level=1)
-        if case_info['involved_persons']:
-            for person in case_info['involved_persons']:
-                doc.add_paragraph(
-                    f"姓名：{person['name']}\n"
-                    f"身份证号：{person['id_number']}\n"
-                    f"户籍地：{person['hometown']}\n"
-                )
-        else:
-            doc.add_paragraph('无涉事人员信息')
-        
-        # 添加轨迹信息
-        doc.add_heading('轨迹信息', level=1)
-        for img_info in case_info['images_info']:
-            # 添加时间和地点作为小标题
-            doc.add_heading(f"{img_info['time']} - {img_info['location']}", level=2)
-            
-            # 添加详细信息
-            p = doc.add_paragraph()
-            p.add_run('交通方式：').bold = True
-            p.add_run(f"{img_info['transportation']}\n")
-            p.add_run('事件描述：').bold = True
-            p.add_run(f"{img_info['description']}\n")
-            
-            # 添加涉事人员信息
-            if img_info['persons']:
-                p.add_run('涉事人员：').bold = True
-                persons_str = ', '.join([f"{p['name']}({p['id_number']})" for p in img_info['persons']])
-                p.add_run(f"{persons_str}\n")
-            
-            # 添加图片 - 直接使用原始路径
-            if img_info['image_path']:
-                try:
-                    # 构建完整的原始图片路径
-                    original_image_path = img_info['image_path']
-                    if not original_image_path.startswith('/'):
-                        original_image_path = '/' + original_image_path
-                    
-                    # 尝试查找原始图片
-                    # 1. 尝试当前路径 (带有task_id)
-                    full_path = os.path.join('uploads', original_image_path.lstrip('/'))
-                    
-                    # 2. 尝试不带task_id的路径
-                    if not os.path.exists(full_path):
-                        basename = os.path.basename(original_image_path)
-                        full_path = os.path.join('uploads', basename)
-                    
-                    # 3. 尝试用图片名直接在uploads目录下查找
-                    if not os.path.exists(full_path):
-                        basename = os.path.basename(original_image_path)
-                        # 在uploads子目录中查找
-                        for root, dirs, files in os.walk('uploads'):
-                            for file in files:
-                                if file == basename:
-                                    full_path = os.path.join(root, file)
-                                    break
-                            if os.path.exists(full_path):
-                                break
-                    
-                    if os.path.exists(full_path):
-                        # 直接将原始图片添加到文档
-                        doc.add_picture(full_path, width=Inches(6))
-                    else:
-                        logger.warning(f"找不到图片: {original_image_path}")
-                        p.add_run("\n[图片未找到]\n")
-                except Exception as e:
-                    logger.error(f"添加图片失败: {str(e)}", exc_info=not IS_PRODUCTION)
-                    p.add_run("\n[图片添加失败]\n")
-            
-            # 添加分隔线
-            doc.add_paragraph('_' * 40)
-        
-        # 添加落款
-        doc.add_paragraph(f"\n\n{datetime.now().strftime('%Y年%m月%d日')}")
-        
-        # 生成文件名和保存文件
-        current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"关于{case_info['subject']}的轨迹报告_{current_time}.docx"
-        
-        # 获取任务输出目录
-        task_dir = get_task_output_dir(case_id)
-        filepath = os.path.join(task_dir, filename)
-        doc.save(filepath)
-        
-        logger.info(f"成功生成轨迹报告: {filename}")
-        return {"filename": filename, "file_path": os.path.join(f'task_{case_id}', filename)}
+        return result
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"生成轨迹报告失败: {str(e)}", exc_info=not IS_PRODUCTION)
         raise HTTPException(status_code=500, detail="生成轨迹报告失败")
 
-@router.get("/download/{filename}")
-async def download_file(filename: str, download: bool = False):
-    logger.info(f"尝试访问文件: {filename}")
-    filepath = os.path.join('outputs', filename)
-    if not os.path.exists(filepath):
-        logger.warning(f"文件不存在: {filepath}")
+def _job_response(job: dict) -> dict:
+    """为任务状态附加结果文件的下载链接"""
+    download_url = None
+    if job["result"]:
+        download_url = f"/api/trajectory/download-file/{urllib.parse.quote(job['result']['file_path'], safe='')}"
+    return {**job, "download_url": download_url}
+
+@router.post("/jobs", response_model=schemas.ReportJob, status_code=202)
+def create_report_job(
+    job: schemas.ReportJobCreate,
+    request: Request,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """提交后台报告生成任务（excel: 轨迹表, report: 轨迹报告）
+
+    只有能查看任务的用户可以提交；任务状态只有提交者（和系统管理员）可以查询，见 get_report_job。
+    """
+    if job.type not in report_jobs.REPORT_TYPES:
+        raise HTTPException(status_code=400, detail="不支持的报告类型")
+    
+    _require_view(request, db, current_user, job.case_id)
+    
+    # 数据未变化时直接返回已生成的文件，不进入进程池排队
+    cached = reports.get_cached(str(job.case_id), job.type, db)
+    return _job_response(report_jobs.submit_job(job.type, str(job.case_id), current_user.username, cached_result=cached))
+
+@router.get("/jobs/{job_id}", response_model=schemas.ReportJob)
+def get_report_job(job_id: str, current_user: models.User = Depends(get_current_user)):
+    """查询报告生成任务的状态和进度"""
+    job = report_jobs.get_job(job_id)
+    if not job or (job["created_by"] != current_user.username and not current_user.is_admin):
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return _job_response(job)
+
+# 轨迹接口的响应格式版本，修改响应结构后需要递增，使客户端缓存失效
+TRACK_FORMAT_VERSION = "1"
+
+@router.get("/track/{task_id}")
+def get_task_track(
+    task_id: int,
+    request: Request,
+    format: str = Query("geojson", pattern="^(geojson|polyline)$"),
+    zoom: Optional[int] = Query(None, ge=track_simplify.MIN_ZOOM, le=track_simplify.MAX_ZOOM),
+    source: str = Query("images", pattern="^(images|imported)$"),
+    access: TaskAccess = Depends(get_task_access),
+    db: Session = Depends(get_db)
+):
+    """获取任务的轨迹
+
+    source=images（默认）为有GPS信息的图片按时间排序连线；source=imported 为导入的轨迹文件（见 /track/{task_id}/import）。
+    format=geojson 返回GeoJSON LineString（[经度, 纬度]）；format=polyline 返回Google Encoded Polyline。
+    传入zoom时按该缩放级别抽稀（相差不到一个像素的点被去掉），不传时返回全部点。
+    ETag由任务数据指纹计算，数据未变化时返回304。
+    """
+    if not access.can_view:
+        raise HTTPException(status_code=403, detail="没有权限访问此任务的轨迹")
+
+    cache_key = f"track-{format}-{zoom}"
+    if source == "imported":
+        count, max_id = track_import.get_track_stats(db, task_id)
+        cache_key = f"track-imported-{format}-{zoom}-{count}-{max_id}"
+    fingerprint = report_cache.get_task_fingerprint(str(task_id), db, cache_key, TRACK_FORMAT_VERSION)
+    if fingerprint is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    etag = f'"{fingerprint[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": file_serving.REVALIDATE_CACHE}
+    if file_serving.is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    if source == "imported":
+        coords, start_time, end_time = track_import.load_points(db, task_id)
+    else:
+        rows = db.query(
+            models.Image.gps_longitude,
+            models.Image.gps_latitude,
+            models.Image.time
+        ).filter(
+            models.Image.task_id == task_id,
+            models.Image.gps_latitude.isnot(None),
+            models.Image.gps_longitude.isnot(None)
+        ).order_by(models.Image.time, models.Image.id).all()
+        coords = np.array([(row[0], row[1]) for row in rows], dtype=float).reshape(-1, 2)
+        start_time = rows[0].time if rows else None
+        end_time = rows[-1].time if rows else None
+
+    keep = track_simplify.simplify(coords, track_simplify.tolerance_for_zoom(zoom))
+    simplified = np.round(coords[keep], 6)
+
+    properties = {
+        "task_id": task_id,
+        "source": source,
+        "zoom": zoom,
+        "point_count": len(coords),
+        "simplified_count": len(simplified),
+        "start_time": start_time.isoformat() if start_time else None,
+        "end_time": end_time.isoformat() if end_time else None
+    }
+
+    if format == "polyline":
+        content = {**properties, "polyline": track_simplify.encode_polyline(simplified)}
+        return JSONResponse(content=content, headers=headers)
+
+    content = {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": simplified.tolist()},
+        "properties": properties
+    }
+    return JSONResponse(content=content, headers=headers, media_type="application/geo+json")
+
+@router.post("/track/{task_id}/import", response_model=schemas.TrackImportResult)
+def import_task_track(
+    task_id: int,
+    file: UploadFile = File(...),
+    access: TaskAccess = Depends(get_task_access),
+    db: Session = Depends(get_db)
+):
+    """导入Excel/CSV轨迹文件，替换任务原有的导入轨迹
+
+    文件须包含纬度、经度列，时间、地点、描述列可选（列名见 track_import）。
+    坐标无效的行被丢弃并在结果中列出行号；有效点按时间排序后在一个事务中批量写入。
+    """
+    if not (access.is_owner or access.can_upload):
+        raise HTTPException(status_code=403, detail="没有上传权限")
+
+    max_bytes = settings.UPLOAD_MAX_BYTES
+    content = file.file.read(max_bytes + 1)
+    if len(content) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"文件大小超过限制（{max_bytes // (1024 * 1024)}MB）")
+
+    try:
+        points, stats = track_import.parse_points(track_import.read_track_file(content, file.filename))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if points.empty:
+        raise HTTPException(status_code=400, detail="文件中没有有效的GPS坐标")
+
+    replaced = track_import.save_points(db, task_id, points)
+    times = points["time"].dropna()
+    return {
+        "task_id": task_id,
+        "imported": len(points),
+        "replaced": replaced,
+        **stats,
+        "start_time": times.min().to_pydatetime() if not times.empty else None,
+        "end_time": times.max().to_pydatetime() if not times.empty else None
+    }
+
+def _get_artifact(db: Session, filename: str) -> models.ReportArtifact:
+    """按相对outputs目录的路径查找登记的生成文件，未登记或文件已不存在时返回404"""
+    artifact = report_cache.get_by_path(db, filename)
+    if not artifact or not os.path.isfile(os.path.join('outputs', artifact.file_path)):
+        logger.warning(f"文件不存在: {filename}")
         raise HTTPException(status_code=404, detail="文件不存在")
+    return artifact
+
+def _get_viewable_artifact(request: Request, db: Session, user: models.User, filename: str) -> models.ReportArtifact:
+    """查找登记的生成文件并检查当前用户能否查看其所属任务"""
+    artifact = _get_artifact(db, filename)
+    if not resolve_task_access(request, db, user, artifact.task_id).can_view:
+        raise HTTPException(status_code=403, detail="没有权限访问此文件")
+    return artifact
+
+def _artifact_etag(artifact: models.ReportArtifact) -> Optional[str]:
+    """使用登记的内容校验值作为ETag"""
+    return f'"{artifact.checksum}"' if artifact.checksum else None
+
+@router.get("/download/{filename:path}")
+def download_file(
+    filename: str,
+    request: Request,
+    download: bool = False,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    logger.info(f"尝试访问文件: {filename}")
+    artifact = _get_viewable_artifact(request, db, current_user, filename)
+    filepath = os.path.join('outputs', artifact.file_path)
     
     # 获取文件的MIME类型
     content_type, _ = mimetypes.guess_type(filepath)
@@ -278,9 +275,7 @@ async def download_file(filename: str, download: bool = False):
         else:
             content_type = 'application/octet-stream'
     
-    headers = {
-        'Content-Type': content_type
-    }
+    headers = {}
     
     # 解决中文文件名编码问题
     # 使用URL编码而不是latin-1编码
@@ -296,16 +291,30 @@ async def download_file(filename: str, download: bool = False):
         # 默认inline方式，浏览器会尝试预览
         headers['Content-Disposition'] = f'inline; filename="{encoded_filename}"'
     
-    return FileResponse(filepath, headers=headers)
+    return file_serving.serve_file(request, filepath, media_type=content_type, headers=headers, etag=_artifact_etag(artifact))
+
+@router.get("/signed/{filename:path}")
+def signed_file(filename: str, request: Request, expires: int, signature: str, db: Session = Depends(get_db)):
+    """通过签名链接访问文件（供在线文档预览服务获取文件，链接由预览页生成，短期有效）"""
+    artifact = _get_artifact(db, filename)
+    if not file_serving.verify_signature(artifact.file_path, expires, signature):
+        raise HTTPException(status_code=403, detail="链接无效或已过期")
+    filepath = os.path.join('outputs', artifact.file_path)
+    content_type = mimetypes.guess_type(filepath)[0] or 'application/octet-stream'
+    headers = {'Content-Disposition': f'inline; filename="{urllib.parse.quote(os.path.basename(filepath))}"'}
+    return file_serving.serve_file(request, filepath, media_type=content_type, headers=headers, etag=_artifact_etag(artifact))
 
-@router.get("/preview/{filename}")
-async def preview_file(filename: str, request: Request):
+@router.get("/preview/{filename:path}")
+def preview_file(
+    filename: str,
+    request: Request,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """预览文件，提供多种预览方式包括Microsoft Office Web Viewer和Google Docs Viewer"""
     logger.info(f"尝试预览文件: {filename}")
-    filepath = os.path.join('outputs', filename)
-    if not os.path.exists(filepath):
-        logger.warning(f"文件不存在: {filepath}")
-        raise HTTPException(status_code=404, detail="文件不存在")
+    artifact = _get_viewable_artifact(request, db, current_user, filename)
+    filepath = os.path.join('outputs', artifact.file_path)
     
     # 获取文件的MIME类型
     content_type, _ = mimetypes.guess_type(filepath)
@@ -321,8 +330,8 @@ async def preview_file(filename: str, request: Request):
         # 确保使用正确的协议
         protocol = "https" if request.url.scheme == "https" else "http"
         
-        # 构建完整的文件URL - 必须是外部可访问的
-        file_url = f"{protocol}://{host}/api/trajectory/download/{encoded_filename}"
+        # 构建完整的文件URL - 必须是外部可访问的（预览服务无法携带登录凭据，使用短期有效的签名链接）
+        file_url = f"{protocol}://{host}/api/trajectory/signed/{encoded_filename}?{file_serving.sign_path(artifact.file_path)}"
         logger.info(f"生成外部访问URL: {file_url}")
         
         # 构建多种在线预览服务的URL
@@ -497,22 +506,24 @@ async def preview_file(filename: str, request: Request):
                 content_type = 'application/octet-stream'
         
         headers = {
-            'Content-Type': content_type,
             'Content-Disposition': f'inline; filename="{encoded_filename}"',
             'X-Content-Type-Options': 'nosniff'
         }
         
         logger.info(f"开始预览文件: {filepath}，内容类型: {content_type}")
-        return FileResponse(filepath, headers=headers)
+        return file_serving.serve_file(request, filepath, media_type=content_type, headers=headers)
 
-@router.get("/download-file/{filename}")
-async def force_download_file(filename: str):
+@router.get("/download-file/{filename:path}")
+def force_download_file(
+    filename: str,
+    request: Request,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """强制下载文件"""
     logger.info(f"强制下载文件: {filename}")
-    filepath = os.path.join('outputs', filename)
-    if not os.path.exists(filepath):
-        logger.warning(f"文件不存在: {filepath}")
-        raise HTTPException(status_code=404, detail="文件不存在")
+    artifact = _get_viewable_artifact(request, db, current_user, filename)
+    filepath = os.path.join('outputs', artifact.file_path)
     
     # 获取文件的MIME类型
     content_type, _ = mimetypes.guess_type(filepath)
@@ -529,80 +540,62 @@ async def force_download_file(filename: str):
     encoded_filename = urllib.parse.quote(filename)
     
     headers = {
-        'Content-Type': content_type,
         # 设置为attachment模式强制下载
         'Content-Disposition': f'attachment; filename="{encoded_filename}"'
     }
     
     logger.info(f"开始下载文件: {filepath}")
-    return FileResponse(filepath, headers=headers)
+    return file_serving.serve_file(request, filepath, media_type=content_type, headers=headers, etag=_artifact_etag(artifact))
 
-@router.get("/delete-file/{filename}")
-async def delete_file(filename: str):
-    """删除指定文件"""
+@router.get("/delete-file/{filename:path}")
+def delete_file(
+    filename: str,
+    request: Request,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """删除指定的生成文件（任务创建者或有编辑、管理权限的用户）"""
     logger.info(f"尝试删除文件: {filename}")
     # 解码文件名，如果有URL编码
-    import urllib.parse
     filename = urllib.parse.unquote(filename)
     
-    # 检查文件是否存在于outputs目录
-    filepath = os.path.join('outputs', filename)
-    if not os.path.exists(filepath):
-        logger.warning(f"要删除的文件不存在: {filepath}")
+    artifact = report_cache.get_by_path(db, filename)
+    if not artifact:
+        logger.warning(f"要删除的文件不存在: {filename}")
         raise HTTPException(status_code=404, detail="文件不存在")
     
-    try:
-        # 删除文件
-        os.remove(filepath)
-        logger.info(f"成功删除文件: {filepath}")
-        return {"status": "success", "message": "文件删除成功"}
-    except Exception as e:
-        logger.error(f"删除文件失败: {str(e)}", exc_info=not IS_PRODUCTION)
-        raise HTTPException(status_code=500, detail=f"删除文件失败: {str(e)}")
+    access = resolve_task_access(request, db, current_user, artifact.task_id)
+    if not (access.is_owner or access.can_edit or access.can_manage):
+        raise HTTPException(status_code=403, detail="没有权限删除此文件")
+    
+    if not report_cache.delete(db, artifact):
+        raise HTTPException(status_code=500, detail="删除文件失败")
+    db.commit()
+    logger.info(f"成功删除文件: {artifact.file_path}")
+    return {"status": "success", "message": "文件删除成功"}
 
-@router.get("/files/{task_id}")
-async def get_task_files(task_id: str):
-    """获取指定任务的所有轨迹相关文件"""
-    logger.info(f"获取任务 {task_id} 的所有轨迹文件")
-    try:
-        # 获取任务输出目录
-        task_dir = get_task_output_dir(task_id)
-        
-        # 检查目录是否存在
-        if not os.path.exists(task_dir):
-            logger.warning(f"任务输出目录不存在: {task_dir}")
-            return []
-        
-        # 获取目录中的所有文件
-        files = []
-        for filename in os.listdir(task_dir):
-            filepath = os.path.join(task_dir, filename)
-            if os.path.isfile(filepath):
-                # 获取文件创建时间
-                created_time = os.path.getctime(filepath)
-                created_datetime = datetime.fromtimestamp(created_time)
-                
-                # 解析文件类型
-                if filename.lower().endswith('.xlsx'):
-                    file_type = 'excel'
-                elif filename.lower().endswith('.docx') or filename.lower().endswith('.pdf'):
-                    file_type = 'report'
-                else:
-                    file_type = 'other'
-                
-                # 添加文件信息
-                files.append({
-                    "filename": os.path.join(f'task_{task_id}', filename),  # 包含相对路径
-                    "display_name": filename,  # 显示名称
-                    "type": file_type,
-                    "created_at": created_datetime.isoformat()
-                })
-        
-        # 按创建时间倒序排序
-        files.sort(key=lambda x: x["created_at"], reverse=True)
-        
-        logger.info(f"找到 {len(files)} 个文件")
-        return files
-    except Exception as e:
-        logger.error(f"获取任务文件失败: {str(e)}", exc_info=not IS_PRODUCTION)
-        raise HTTPException(status_code=500, detail=f"获取任务文件失败: {str(e)}") 
\ No newline at end of file
+@router.get("/files/{task_id}", response_model=List[dict])
+def get_task_files(
+    task_id: int,
+    limit: int = Query(100, ge=1, le=500),
+    before_id: Optional[int] = Query(None, ge=1),
+    access: TaskAccess = Depends(get_task_access),
+    db: Session = Depends(get_db)
+):
+    """获取指定任务的生成文件（按生成时间倒序分页，翻页时将上一页最后一个文件的id作为before_id传入）"""
+    if not access.can_view:
+        raise HTTPException(status_code=403, detail="没有权限访问此任务的文件")
+    
+    artifacts = report_cache.list_artifacts(db, task_id, limit=limit, before_id=before_id)
+    return [
+        {
+            "id": artifact.id,
+            "filename": artifact.file_path,  # 包含相对路径
+            "display_name": os.path.basename(artifact.file_path),  # 显示名称
+            "type": artifact.report_type,
+            "file_size": artifact.file_size,
+            "created_by": artifact.created_by,
+            "created_at": artifact.created_at.isoformat() if artifact.created_at else None
+        }
+        for artifact in artifacts
+    ]
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from ..models import models, schemas
-from ..utils import utils
-from ..db import crud, get_db
+from ..utils import utils, user_cache
+from ..db import async_crud, crud, get_db, get_async_db
 from ..api import get_current_user
 from typing import List
 
@@ -46,9 +47,12 @@ async def read_users_me(current_user: models.User = Depends(get_current_user)):
 
 # 用户登录
 @oauth2_router.post("/token", response_model=schemas.Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.get_user_by_username(db, username=form_data.username)
-    if not user or not utils.verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await async_crud.get_user_by_username(db, username=form_data.username)
+    
+    # 密码验证在线程池中执行，不阻塞事件循环
+    valid, new_hash = await utils.verify_password_async(form_data.password, user.hashed_password) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=401,
             detail="用户名或密码不正确",
@@ -70,6 +74,11 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             detail="账号已被禁用，请联系管理员",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    
+    # 密码哈希的成本与当前配置不一致时，保存按当前成本重新计算的哈希
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
         
     access_token_expires = timedelta(minutes=utils.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = utils.create_access_token(
@@ -85,13 +94,13 @@ async def verify_token(current_user: models.User = Depends(get_current_user)):
 
 # 获取所有待审核用户列表（仅管理员可用）
 @router.get("/pending", response_model=List[schemas.User])
-async def get_pending_users(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_pending_users(current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     # 检查当前用户是否是管理员
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="没有权限执行此操作")
     
     # 获取所有待审核用户
-    pending_users = db.query(models.User).filter(models.User.is_approved == False).all()
+    pending_users = await async_crud.get_pending_users(db)
     return pending_users
 
 # 审核用户（仅管理员可用）
@@ -100,21 +109,20 @@ async def approve_user(
     user_id: int, 
     approve: bool = True,
     current_user: models.User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # 检查当前用户是否是管理员
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="没有权限执行此操作")
     
     # 查找要审核的用户
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await async_crud.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
     # 更新用户审核状态
-    user.is_approved = approve
-    db.commit()
-    db.refresh(user)
+    await async_crud.update_user_flags(db, user, is_approved=approve)
+    user_cache.invalidate(user.username)
     return user
 
 # 设置管理员权限（仅管理员可用）
@@ -123,14 +131,14 @@ async def set_admin(
     user_id: int, 
     is_admin: bool = True,
     current_user: models.User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # 检查当前用户是否是管理员
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="没有权限执行此操作")
     
     # 查找要设置的用户
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await async_crud.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
@@ -139,20 +147,19 @@ async def set_admin(
         raise HTTPException(status_code=400, detail="不能取消自己的管理员权限")
     
     # 更新用户管理员状态
-    user.is_admin = is_admin
-    db.commit()
-    db.refresh(user)
+    await async_crud.update_user_flags(db, user, is_admin=is_admin)
+    user_cache.invalidate(user.username)
     return user
 
 # 获取所有用户（仅管理员可用）
 @router.get("/", response_model=List[schemas.User])
-async def get_all_users(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_all_users(current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     # 检查当前用户是否是管理员
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="没有权限执行此操作")
     
     # 获取所有用户
-    users = db.query(models.User).all()
+    users = await async_crud.get_users(db)
     return users
 
 # 激活/禁用用户（仅管理员可用）
@@ -161,14 +168,14 @@ async def set_user_active(
     user_id: int, 
     is_active: bool = True,
     current_user: models.User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # 检查当前用户是否是管理员
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="没有权限执行此操作")
     
     # 查找要设置的用户
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await async_crud.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
@@ -177,9 +184,8 @@ async def set_user_active(
         raise HTTPException(status_code=400, detail="不能禁用自己的账号")
     
     # 更新用户激活状态
-    user.is_active = is_active
-    db.commit()
-    db.refresh(user)
+    await async_crud.update_user_flags(db, user, is_active=is_active)
+    user_cache.invalidate(user.username)
     return user
 
 # 删除用户（仅管理员可用）
@@ -187,14 +193,14 @@ async def set_user_active(
 async def delete_user(
     user_id: int,
     current_user: models.User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # 检查当前用户是否是管理员
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="没有权限执行此操作")
     
     # 查找要删除的用户
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await async_crud.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
@@ -203,8 +209,9 @@ async def delete_user(
         raise HTTPException(status_code=400, detail="不能删除自己的账号")
     
     # 删除用户
-    db.delete(user)
-    db.commit()
+    username = user.username
+    await async_crud.delete_user(db, user)
+    user_cache.invalidate(username)
     return {"message": "用户已删除"}
 
 # 切换用户状态（启用/禁用）
@@ -213,14 +220,14 @@ async def toggle_user_status(
     user_id: int,
     status: schemas.UserStatusUpdate,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # 检查当前用户是否是管理员
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="没有权限执行此操作")
     
     # 查找要更新的用户
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await async_crud.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
@@ -229,7 +236,6 @@ async def toggle_user_status(
         raise HTTPException(status_code=400, detail="不能禁用自己的账户")
     
     # 更新用户状态
-    user.is_active = status.is_active
-    db.commit()
-    db.refresh(user)
+    await async_crud.update_user_flags(db, user, is_active=status.is_active)
+    user_cache.invalidate(user.username)
     return user 
\ No newline at end of file
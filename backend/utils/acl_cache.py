@@ -0,0 +1,58 @@
+"""
+任务访问权限的进程内缓存（按 (任务ID, 用户ID) 缓存任务创建者和授权记录的快照）
+同一用户短时间内对同一任务的连续请求（图片列表、地图页面等）不再重复查询权限。
+授权/取消授权、删除任务时主动失效当前进程的缓存；多个worker进程之间不共享缓存，
+其他进程的授权变化最迟在 ACL_CACHE_TTL_SECONDS 秒后生效（任务删除在命中缓存时即被发现），设置为0时不缓存。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from config import settings
+
+# 缓存的授权记录字段
+PERMISSION_FIELDS = ("permission_type", "can_upload", "can_edit", "can_manage", "shared_by_id")
+
+_cache: "OrderedDict[Tuple[int, int], tuple]" = OrderedDict()
+_lock = threading.Lock()
+
+def get(task_id: int, user_id: int) -> Optional[Tuple[int, Optional[dict]]]:
+    """获取缓存的 (任务创建者ID, 授权记录字段)，未缓存或已过期时返回None"""
+    if settings.ACL_CACHE_TTL_SECONDS <= 0:
+        return None
+    key = (task_id, user_id)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return value
+
+def put(task_id: int, user_id: int, owner_id: int, permission: Optional[dict]):
+    if settings.ACL_CACHE_TTL_SECONDS <= 0:
+        return
+    key = (task_id, user_id)
+    with _lock:
+        _cache[key] = (time.monotonic() + settings.ACL_CACHE_TTL_SECONDS, (owner_id, permission))
+        _cache.move_to_end(key)
+        while len(_cache) > settings.ACL_CACHE_MAX_SIZE:
+            _cache.popitem(last=False)
+
+def invalidate(task_id: int, user_id: Optional[int] = None):
+    """移除任务的缓存，不指定user_id时移除该任务所有用户的缓存"""
+    with _lock:
+        if user_id is not None:
+            _cache.pop((task_id, user_id), None)
+            return
+        for key in [key for key in _cache if key[0] == task_id]:
+            del _cache[key]
+
+def clear():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,173 @@
+"""
+文件下载的统一处理
+为上传图片和生成的报告文件提供：
+- 强ETag（由文件大小和修改时间计算，或由调用方传入校验值）和Last-Modified；
+- 条件请求（If-None-Match / If-Modified-Since）返回304；
+- 单段Range请求（If-Range校验）返回206，便于大文件断点续传；
+- Cache-Control：上传文件名带时间戳且内容不再变化，使用长期immutable缓存；生成文件每次重新验证；
+- 可选交给nginx（X-Accel-Redirect）或Apache（X-Sendfile）发送文件内容，由 FILE_SENDFILE_MODE 配置；
+- 短期有效的签名链接，供无法携带登录凭据的外部服务（在线文档预览）访问指定文件。
+"""
+
+import hashlib
+import hmac
+import os
+import re
+import time
+import urllib.parse
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from config import settings
+
+# 内容不会变化的文件（上传图片）：缓存一年，不再重新验证
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# 内容可能变化的文件（重新生成的报告）：允许缓存，但每次使用前重新验证
+REVALIDATE_CACHE = "no-cache"
+
+CHUNK_SIZE = 256 * 1024
+
+# 签名链接的有效期（秒）
+SIGNED_URL_EXPIRE_SECONDS = 600
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def make_etag(stat_result: os.stat_result) -> str:
+    """由文件大小和修改时间计算强ETag"""
+    source = f"{stat_result.st_size}-{stat_result.st_mtime_ns}"
+    return f'"{hashlib.md5(source.encode()).hexdigest()}"'
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[float] = None) -> bool:
+    """判断条件请求是否命中（客户端缓存仍然有效）
+
+    If-None-Match 优先；没有If-None-Match时才比较If-Modified-Since。
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _parse_range(range_header: str, size: int):
+    """解析单段Range请求头，返回 (起始, 结束) 闭区间；不支持的格式返回None，范围无效时返回False"""
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        # 多段范围等不支持的格式，按RFC 7233忽略Range返回完整内容
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-N：最后N个字节
+        length = int(end)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+def _iter_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def _sendfile_headers(path: str) -> Optional[Dict[str, str]]:
+    """按 FILE_SENDFILE_MODE 生成交给Web服务器发送文件的响应头，未启用时返回None"""
+    mode = settings.FILE_SENDFILE_MODE
+    if mode == "x-accel-redirect":
+        # nginx内部location：FILE_SENDFILE_PREFIX + 相对项目目录的路径
+        relative_path = os.path.relpath(path).replace("\\", "/")
+        location = settings.FILE_SENDFILE_PREFIX.rstrip("/") + "/" + urllib.parse.quote(relative_path)
+        return {"X-Accel-Redirect": location}
+    if mode == "x-sendfile":
+        return {"X-Sendfile": os.path.abspath(path)}
+    return None
+
+def serve_file(
+    request: Request,
+    path: str,
+    media_type: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+    cache_control: str = REVALIDATE_CACHE,
+    etag: Optional[str] = None
+) -> Response:
+    """返回文件内容，处理缓存验证、Range请求和Web服务器代发
+
+    etag 为空时由文件大小和修改时间计算；headers 中可以传入Content-Disposition等额外响应头。
+    """
+    stat_result = os.stat(path)
+    etag = etag or make_etag(stat_result)
+    response_headers = dict(headers or {})
+    response_headers.update({
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes"
+    })
+
+    if is_not_modified(request, etag, stat_result.st_mtime):
+        response_headers.pop("Content-Type", None)
+        return Response(status_code=304, headers=response_headers)
+
+    # 由nginx/Apache发送文件内容（Range请求也由它们处理）
+    sendfile_headers = _sendfile_headers(path)
+    if sendfile_headers:
+        response_headers.update(sendfile_headers)
+        return Response(media_type=media_type, headers=response_headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        size = stat_result.st_size
+        byte_range = _parse_range(range_header, size)
+        if byte_range is False:
+            response_headers.pop("Content-Type", None)
+            response_headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=response_headers)
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            response_headers["Content-Length"] = str(length)
+            return StreamingResponse(
+                _iter_file(path, start, length),
+                status_code=206,
+                media_type=media_type,
+                headers=response_headers
+            )
+
+    return FileResponse(path, media_type=media_type, headers=response_headers, stat_result=stat_result)
+
+def _signature(path: str, expires: int) -> str:
+    message = f"{path}:{expires}".encode("utf-8")
+    return hmac.new(settings.SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+def sign_path(path: str, lifetime: int = SIGNED_URL_EXPIRE_SECONDS) -> str:
+    """为文件路径生成签名链接的查询参数（expires=...&signature=...）"""
+    expires = int(time.time()) + lifetime
+    return urllib.parse.urlencode({"expires": expires, "signature": _signature(path, expires)})
+
+def verify_signature(path: str, expires: int, signature: str) -> bool:
+    """校验签名链接：签名与路径匹配且未过期"""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(path, expires), signature)
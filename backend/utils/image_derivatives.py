@@ -0,0 +1,216 @@
+"""
+上传图片的缩放副本（派生图）
+原图通常是千万像素级的手机照片，直接嵌入Word报告或在图片列表中显示会使传输量过大。
+这里按需要的像素宽度生成JPEG/WebP副本，保存在原图所在目录的 .derivatives 子目录中，
+生成一次后被后续所有请求复用；原图更新（修改时间变新）后会重新生成。
+派生图总大小超过 DERIVATIVE_CACHE_MAX_BYTES 时，按最近使用时间淘汰最久未使用的文件；
+已有派生图的大小和使用时间记录在进程内的索引中，只在首次使用时扫描一次uploads目录。
+"""
+
+import glob
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ROOT = 'uploads'
+DERIVATIVE_DIR_NAME = '.derivatives'
+
+# 图片列表/预览可请求的宽度（缩略图、中等尺寸预览），请求的其他宽度向上取整到这些档位
+PREVIEW_WIDTHS = (256, 1024)
+
+# 支持的输出格式及扩展名
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+# 最近使用时间的刷新间隔（秒），避免每次命中都修改文件时间
+_TOUCH_INTERVAL = 600
+
+# 进程内的派生图索引：路径 -> (最近使用时间, 大小)，为None时表示尚未扫描
+_cache_lock = threading.Lock()
+_cache_entries: Optional[Dict[str, Tuple[float, int]]] = None
+_cache_bytes = 0
+
+def derivative_path(source_path: str, width: int, fmt: str = 'JPEG') -> str:
+    """派生图的存放路径：<原图目录>/.derivatives/<原文件名>.w<宽度>.<jpg|webp>"""
+    directory, filename = os.path.split(source_path)
+    return os.path.join(directory, DERIVATIVE_DIR_NAME, f"{filename}.w{width}.{FORMAT_EXTENSIONS[fmt]}")
+
+def preview_width(width: int) -> int:
+    """把请求的宽度归到 PREVIEW_WIDTHS 中不小于它的最小档位，限制派生图的种类"""
+    for candidate in PREVIEW_WIDTHS:
+        if width <= candidate:
+            return candidate
+    return PREVIEW_WIDTHS[-1]
+
+def get_derivative(source_path: str, width: int, quality: int = 85, fmt: str = 'JPEG') -> str:
+    """获取原图按指定宽度缩放后的副本路径，不存在或已过期时生成
+
+    按EXIF方向信息旋转图片，原图宽度不超过指定宽度时不放大。
+    """
+    dest_path = derivative_path(source_path, width, fmt)
+    if os.path.exists(dest_path) and os.path.getmtime(dest_path) >= os.path.getmtime(source_path):
+        _touch(dest_path)
+        return dest_path
+
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    with Image.open(source_path) as img:
+        # JPEG按目标尺寸降采样解码，避免完整解码大图（方向未知，按宽高都不小于目标宽度请求）
+        img.draft('RGB', (width, width))
+        img = ImageOps.exif_transpose(img)
+
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+
+        # 带透明通道的图片铺白色背景后转为RGB
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        # 先写临时文件再重命名，避免并发生成时读到不完整的文件（同一进程的多个线程也各自使用不同的临时文件）
+        tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            if fmt == 'WEBP':
+                img.save(tmp_path, 'WEBP', quality=quality, method=4)
+            else:
+                img.save(tmp_path, 'JPEG', quality=quality, optimize=True)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+    os.replace(tmp_path, dest_path)
+    _account(dest_path, os.path.getsize(dest_path))
+    return dest_path
+
+def get_preview_image(source_path: str, width: int, fmt: str = 'JPEG') -> str:
+    """获取图片列表/预览用的派生图（宽度归档到 PREVIEW_WIDTHS）"""
+    return get_derivative(source_path, preview_width(width), settings.PREVIEW_IMAGE_QUALITY, fmt)
+
+def get_report_image(source_path: str, width_inches: float) -> str:
+    """获取嵌入报告用的图片（按 REPORT_IMAGE_DPI 计算像素宽度）"""
+    width = int(width_inches * settings.REPORT_IMAGE_DPI)
+    return get_derivative(source_path, width, settings.REPORT_IMAGE_QUALITY)
+
+def remove_derivatives(source_path: str):
+    """删除原图的所有派生图（删除原图时调用）"""
+    directory, filename = os.path.split(source_path)
+    pattern = os.path.join(directory, DERIVATIVE_DIR_NAME, f"{glob.escape(filename)}.w*.*")
+    for path in glob.glob(pattern):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"删除派生图失败: {path}, {str(e)}")
+            continue
+        _forget(path)
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _touch(path: str):
+    """刷新派生图的修改时间作为最近使用时间（LRU淘汰依据）"""
+    try:
+        if time.time() - os.path.getmtime(path) <= _TOUCH_INTERVAL:
+            return
+        os.utime(path)
+    except OSError:
+        return
+    with _cache_lock:
+        entry = _cache_entries.get(path) if _cache_entries is not None else None
+        if entry is not None:
+            _cache_entries[path] = (time.time(), entry[1])
+
+def _scan_derivatives(root: str):
+    """列出root下所有派生图的 (修改时间, 大小, 路径)
+
+    只对 .derivatives 目录中的文件取文件信息，不进入其他隐藏目录，原图文件只出现在目录列表中。
+    """
+    entries = []
+    for directory, dirs, files in os.walk(root):
+        if os.path.basename(directory) != DERIVATIVE_DIR_NAME:
+            dirs[:] = [d for d in dirs if d == DERIVATIVE_DIR_NAME or not d.startswith('.')]
+            continue
+        dirs[:] = []
+        for filename in files:
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+def _load_entries():
+    """首次使用时扫描uploads目录建立索引（调用方持有_cache_lock）"""
+    global _cache_entries, _cache_bytes
+    if _cache_entries is None:
+        _cache_entries = {path: (mtime, size) for mtime, size, path in _scan_derivatives(UPLOAD_ROOT)}
+        _cache_bytes = sum(size for _, size in _cache_entries.values())
+
+def _forget(path: str):
+    """从索引中移除已删除的派生图"""
+    global _cache_bytes
+    with _cache_lock:
+        if _cache_entries is not None:
+            entry = _cache_entries.pop(path, None)
+            if entry is not None:
+                _cache_bytes -= entry[1]
+
+def _account(path: str, size: int):
+    """登记新生成的派生图，总大小超过上限时执行淘汰
+
+    索引在进程内维护，多个worker进程各自只统计和淘汰自己已知的派生图（其他进程生成的文件在重启扫描后计入）。
+    """
+    global _cache_bytes
+    with _cache_lock:
+        _load_entries()
+        previous = _cache_entries.get(path)
+        if previous is not None:
+            _cache_bytes -= previous[1]
+        _cache_entries[path] = (time.time(), size)
+        _cache_bytes += size
+        if _cache_bytes > settings.DERIVATIVE_CACHE_MAX_BYTES:
+            _evict_locked()
+
+def evict() -> int:
+    """按最近使用时间淘汰派生图，直到总大小降到上限的90%以下，返回剩余总大小"""
+    with _cache_lock:
+        _load_entries()
+        return _evict_locked()
+
+def _evict_locked() -> int:
+    global _cache_bytes
+    max_bytes = settings.DERIVATIVE_CACHE_MAX_BYTES
+    if _cache_bytes <= max_bytes:
+        return _cache_bytes
+
+    target = int(max_bytes * 0.9)
+    removed = 0
+    for path, (_, size) in sorted(_cache_entries.items(), key=lambda item: item[1][0]):
+        if _cache_bytes <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            continue
+        else:
+            removed += 1
+        del _cache_entries[path]
+        _cache_bytes -= size
+    logger.info(f"派生图缓存超过上限，已淘汰 {removed} 个文件，当前总大小 {_cache_bytes} 字节")
+    return _cache_bytes
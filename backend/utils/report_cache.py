@@ -0,0 +1,261 @@
+"""
+生成报告文件的登记和结果缓存
+每个生成的轨迹表/轨迹报告都登记在 report_artifacts 表中（任务、类型、路径、大小、校验值、模板版本、
+任务数据指纹、生成人）。文件列表、下载、删除和过期清理都通过该表完成，不再扫描outputs目录。
+以任务数据指纹（图片数量、图片最后更新时间、涉事人员记录、任务标题和模板版本）为键，
+数据未变化时直接复用已生成的文件，不再重新生成。
+
+旧版本在每个任务目录下用 .report_cache.json 记录 指纹 -> 文件名；升级后执行一次
+    python backend/utils/report_cache.py rebuild
+把outputs目录中已有的文件登记到表中（同时迁移旧索引中的指纹）。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+# 作为脚本运行时，添加项目根目录到Python路径
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from config import settings
+from backend.models.models import Task, Image, PersonInvolved, ReportArtifact, get_now_shanghai
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_ROOT = 'outputs'
+# 旧版本的指纹索引文件，仅在rebuild时读取
+LEGACY_INDEX_NAME = '.report_cache.json'
+
+# 生成文件的扩展名对应的报告类型
+REPORT_TYPE_BY_EXTENSION = {'.xlsx': 'excel', '.docx': 'report', '.pdf': 'report'}
+
+# 清理文件时每批处理的记录数
+EVICT_BATCH_SIZE = 500
+
+def get_task_fingerprint(case_id: str, db: Session, report_type: str, template_version: str) -> Optional[str]:
+    """计算任务数据指纹，任务不存在时返回None"""
+    task = db.query(Task.title).filter(Task.id == case_id, Task.deleted_at.is_(None)).first()
+    if not task:
+        return None
+
+    # 图片和涉事人员的聚合信息（一次查询）
+    stats = db.query(
+        func.count(func.distinct(Image.id)),
+        func.max(Image.id),
+        func.max(Image.updated_at),
+        func.count(PersonInvolved.id),
+        func.max(PersonInvolved.id)
+    ).outerjoin(
+        PersonInvolved, PersonInvolved.image_id == Image.id
+    ).filter(
+        Image.task_id == case_id
+    ).one()
+
+    raw = "|".join(str(v) for v in (report_type, template_version, task.title) + tuple(stats))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _normalize(relative_path: str) -> str:
+    return relative_path.replace('\\', '/').lstrip('/')
+
+def _full_path(artifact: ReportArtifact) -> str:
+    return os.path.join(OUTPUT_ROOT, artifact.file_path)
+
+def _file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def to_result(artifact: ReportArtifact) -> dict:
+    """生成结果（文件名和相对outputs目录的路径），与报告生成函数的返回值格式一致"""
+    return {"filename": os.path.basename(artifact.file_path), "file_path": artifact.file_path}
+
+def lookup(db: Session, case_id: str, fingerprint: str) -> Optional[dict]:
+    """查找指纹对应的已生成文件，文件已被删除时移除记录并视为未命中"""
+    artifact = db.query(ReportArtifact).filter(
+        ReportArtifact.task_id == case_id,
+        ReportArtifact.fingerprint == fingerprint
+    ).order_by(ReportArtifact.id.desc()).first()
+    if not artifact:
+        return None
+    if not os.path.isfile(_full_path(artifact)):
+        db.delete(artifact)
+        db.commit()
+        return None
+    return to_result(artifact)
+
+def register(
+    db: Session,
+    case_id: str,
+    report_type: str,
+    file_path: str,
+    fingerprint: Optional[str],
+    generator_version: Optional[str],
+    created_by: Optional[str] = None
+) -> ReportArtifact:
+    """登记新生成的文件（file_path为相对outputs目录的路径；不提交事务，由调用方提交）"""
+    file_path = _normalize(file_path)
+    full_path = os.path.join(OUTPUT_ROOT, file_path)
+    artifact = ReportArtifact(
+        task_id=int(case_id),
+        report_type=report_type,
+        file_path=file_path,
+        file_size=os.path.getsize(full_path),
+        checksum=_file_checksum(full_path),
+        generator_version=generator_version,
+        fingerprint=fingerprint,
+        created_by=created_by
+    )
+    db.add(artifact)
+    return artifact
+
+def get_by_path(db: Session, file_path: str) -> Optional[ReportArtifact]:
+    """按相对outputs目录的路径查找登记的文件"""
+    return db.query(ReportArtifact).filter(ReportArtifact.file_path == _normalize(file_path)).first()
+
+def list_artifacts(db: Session, task_id: int, limit: int = 100, before_id: Optional[int] = None) -> List[ReportArtifact]:
+    """任务的生成文件，按生成顺序倒序分页（翻页时传入上一页最后一条记录的ID）"""
+    query = db.query(ReportArtifact).filter(ReportArtifact.task_id == task_id)
+    if before_id is not None:
+        query = query.filter(ReportArtifact.id < before_id)
+    return query.order_by(ReportArtifact.id.desc()).limit(limit).all()
+
+def _remove_file(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return True
+    except OSError as e:
+        logger.warning(f"删除报告文件失败: {path}, {str(e)}")
+        return False
+
+def delete(db: Session, artifact: ReportArtifact) -> bool:
+    """删除文件和登记记录（不提交事务），文件删除失败时保留记录并返回False"""
+    if not _remove_file(_full_path(artifact)):
+        return False
+    db.delete(artifact)
+    return True
+
+def _delete_batch(db: Session, artifacts: List[ReportArtifact]) -> int:
+    removed_ids = [artifact.id for artifact in artifacts if _remove_file(_full_path(artifact))]
+    if removed_ids:
+        db.query(ReportArtifact).filter(ReportArtifact.id.in_(removed_ids)).delete(synchronize_session=False)
+        db.commit()
+    return len(removed_ids)
+
+def evict(db: Session):
+    """按生成时间和总大小清理生成文件
+
+    超过 REPORT_CACHE_MAX_AGE_DAYS 的文件直接删除；
+    剩余文件总大小超过 REPORT_CACHE_MAX_BYTES 时，从最早生成的文件开始删除。
+    """
+    removed = 0
+
+    if settings.REPORT_CACHE_MAX_AGE_DAYS:
+        cutoff = get_now_shanghai().replace(tzinfo=None) - timedelta(days=settings.REPORT_CACHE_MAX_AGE_DAYS)
+        while True:
+            expired = db.query(ReportArtifact).filter(
+                ReportArtifact.created_at < cutoff
+            ).order_by(ReportArtifact.id).limit(EVICT_BATCH_SIZE).all()
+            deleted = _delete_batch(db, expired)
+            removed += deleted
+            if len(expired) < EVICT_BATCH_SIZE or not deleted:
+                break
+
+    total_size = db.query(func.coalesce(func.sum(ReportArtifact.file_size), 0)).scalar()
+    last_id = 0
+    while total_size > settings.REPORT_CACHE_MAX_BYTES:
+        oldest = db.query(ReportArtifact).filter(
+            ReportArtifact.id > last_id
+        ).order_by(ReportArtifact.id).limit(EVICT_BATCH_SIZE).all()
+        if not oldest:
+            break
+        last_id = oldest[-1].id
+        batch = []
+        for artifact in oldest:
+            if total_size <= settings.REPORT_CACHE_MAX_BYTES:
+                break
+            batch.append(artifact)
+            total_size -= artifact.file_size or 0
+        removed += _delete_batch(db, batch)
+
+    if removed:
+        logger.info(f"已清理 {removed} 个过期的报告文件")
+
+def rebuild(db: Session) -> int:
+    """把outputs目录中尚未登记的生成文件登记到表中，返回新登记的文件数
+
+    旧版本 .report_cache.json 中记录的指纹一并迁移，迁移后删除该索引文件。
+    """
+    if not os.path.isdir(OUTPUT_ROOT):
+        return 0
+    task_ids = {task_id for (task_id,) in db.query(Task.id).filter(Task.deleted_at.is_(None)).all()}
+    registered = {path for (path,) in db.query(ReportArtifact.file_path).all()}
+
+    count = 0
+    for entry in os.scandir(OUTPUT_ROOT):
+        if not entry.is_dir() or not entry.name.startswith('task_'):
+            continue
+        try:
+            task_id = int(entry.name[len('task_'):])
+        except ValueError:
+            continue
+        if task_id not in task_ids:
+            logger.warning(f"任务不存在，跳过目录: {entry.path}")
+            continue
+
+        legacy_index_path = os.path.join(entry.path, LEGACY_INDEX_NAME)
+        fingerprints = {}
+        try:
+            with open(legacy_index_path, 'r', encoding='utf-8') as f:
+                fingerprints = {filename: fp for fp, filename in json.load(f).items()}
+        except (OSError, ValueError):
+            pass
+
+        for file_entry in os.scandir(entry.path):
+            report_type = REPORT_TYPE_BY_EXTENSION.get(os.path.splitext(file_entry.name)[1].lower())
+            if not file_entry.is_file() or file_entry.name.startswith('.') or not report_type:
+                continue
+            file_path = f"{entry.name}/{file_entry.name}"
+            if file_path in registered:
+                continue
+            artifact = register(db, str(task_id), report_type, file_path, fingerprints.get(file_entry.name), None)
+            artifact.created_at = datetime.fromtimestamp(file_entry.stat().st_mtime)
+            count += 1
+        db.commit()
+
+        if os.path.exists(legacy_index_path):
+            _remove_file(legacy_index_path)
+    return count
+
+if __name__ == "__main__":
+    import argparse
+    from backend.db.database import SessionLocal
+    from backend.utils.logger import setup_logger
+
+    logger = setup_logger("report_cache")
+
+    parser = argparse.ArgumentParser(description="生成报告文件登记维护工具")
+    parser.add_argument("command", choices=["rebuild", "evict"], help="rebuild: 登记outputs目录中已有的文件; evict: 按保留策略清理文件")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            count = rebuild(db)
+            logger.info(f"登记完成，共登记 {count} 个文件")
+        else:
+            evict(db)
+    finally:
+        db.close()
@@ -0,0 +1,202 @@
+"""
+后台报告生成任务
+轨迹表/轨迹报告的生成（数据库查询、xlsxwriter写入、python-docx插图和保存）都是阻塞操作，
+这里把它们放到进程池中执行，避免占用uvicorn工作进程的事件循环。
+
+任务状态和进度保存在 report_jobs 表中：子进程写入进度，提交任务的进程在任务结束时写入结果，
+多个uvicorn worker都能查询任意任务的状态，查询进度的请求不需要落到提交任务的worker上。
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from typing import Optional, Set
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 支持的报告类型
+REPORT_TYPES = ("excel", "report")
+
+# 已结束的任务记录保留的时间（秒）
+JOB_RETENTION_SECONDS = 3600
+# 子进程写入进度的最小间隔（秒），避免每张图片都更新一次数据库
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+_executor: Optional[ProcessPoolExecutor] = None
+# 当前进程提交、尚未结束的任务（进程退出时标记为失败）
+_running: Set[str] = set()
+_lock = threading.Lock()
+
+def _update_job(job_id: str, **values):
+    """更新任务记录（使用独立的短会话，子进程和回调线程都可调用）"""
+    from backend.db.database import SessionLocal
+    from backend.models.models import ReportJob
+
+    db = SessionLocal()
+    try:
+        db.query(ReportJob).filter(ReportJob.id == job_id).update(values, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _init_worker():
+    """子进程初始化：丢弃从父进程继承的数据库连接，子进程使用自己的连接"""
+    from backend.db.database import engine
+    engine.dispose(close=False)
+
+def _run_job(job_id: str, job_type: str, case_id: str, created_by: str) -> dict:
+    """在子进程中执行的报告生成任务"""
+    from backend.db.database import SessionLocal
+    from backend.utils import reports
+
+    _update_job(job_id, status="running")
+    last_update = 0.0
+
+    def on_progress(processed: int, total: int):
+        nonlocal last_update
+        now = time.monotonic()
+        if processed < total and now - last_update < PROGRESS_INTERVAL_SECONDS:
+            return
+        last_update = now
+        _update_job(job_id, processed=processed, total=total)
+
+    db = SessionLocal()
+    try:
+        result = reports.build(case_id, job_type, db, on_progress, created_by)
+    finally:
+        db.close()
+    if not result:
+        raise LookupError("未找到相关案件信息")
+    return result
+
+def _get_executor() -> ProcessPoolExecutor:
+    """懒加载进程池，并发数由 REPORT_JOB_WORKERS 配置"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.REPORT_JOB_WORKERS,
+            initializer=_init_worker
+        )
+        logger.info(f"报告生成进程池已启动，并发数: {settings.REPORT_JOB_WORKERS}")
+    return _executor
+
+def _prune_jobs(db):
+    """删除过期的已结束任务记录"""
+    from backend.models.models import ReportJob, get_now_shanghai
+
+    cutoff = get_now_shanghai() - timedelta(seconds=JOB_RETENTION_SECONDS)
+    db.query(ReportJob).filter(ReportJob.finished_at < cutoff).delete(synchronize_session=False)
+
+def _on_job_done(job_id: str, future):
+    """任务结束回调，记录结果或错误信息"""
+    from backend.models.models import get_now_shanghai
+
+    with _lock:
+        _running.discard(job_id)
+    values = {"finished_at": get_now_shanghai()}
+    try:
+        result = future.result()
+        values.update(status="completed", filename=result["filename"], file_path=result["file_path"])
+        logger.info(f"报告任务 {job_id} 已完成: {result['filename']}")
+    except LookupError as e:
+        values.update(status="failed", error=str(e))
+    except Exception as e:
+        values.update(status="failed", error="报告生成失败")
+        logger.error(f"报告任务 {job_id} 失败: {str(e)}", exc_info=True)
+    try:
+        _update_job(job_id, **values)
+    except Exception as e:
+        logger.error(f"记录报告任务 {job_id} 的结果失败: {str(e)}", exc_info=True)
+
+def submit_job(job_type: str, case_id: str, created_by: str, cached_result: Optional[dict] = None) -> dict:
+    """提交报告生成任务，返回任务状态
+
+    传入cached_result（数据未变化时的已有文件）时直接记录为已完成，不占用进程池。
+    """
+    from backend.db.database import SessionLocal
+    from backend.models.models import ReportJob, get_now_shanghai
+
+    if job_type not in REPORT_TYPES:
+        raise ValueError(f"不支持的报告类型: {job_type}")
+
+    job = ReportJob(id=uuid.uuid4().hex, task_id=int(case_id), report_type=job_type, created_by=created_by)
+    if cached_result:
+        job.status = "completed"
+        job.filename = cached_result["filename"]
+        job.file_path = cached_result["file_path"]
+        job.finished_at = get_now_shanghai()
+    else:
+        job.status = "pending"
+
+    db = SessionLocal()
+    try:
+        _prune_jobs(db)
+        db.add(job)
+        db.commit()
+        snapshot = _snapshot(job)
+    finally:
+        db.close()
+    if cached_result:
+        return snapshot
+
+    with _lock:
+        _running.add(job.id)
+        future = _get_executor().submit(_run_job, job.id, job_type, str(case_id), created_by)
+    future.add_done_callback(lambda f: _on_job_done(job.id, f))
+    logger.info(f"已提交报告任务 {job.id}: 类型={job_type}, 案件ID={case_id}")
+    return snapshot
+
+def get_job(job_id: str) -> Optional[dict]:
+    """获取任务状态，任务不存在时返回None"""
+    from backend.db.database import SessionLocal
+    from backend.models.models import ReportJob
+
+    db = SessionLocal()
+    try:
+        job = db.query(ReportJob).filter(ReportJob.id == job_id).first()
+        return _snapshot(job) if job else None
+    finally:
+        db.close()
+
+def _snapshot(job) -> dict:
+    return {
+        "job_id": job.id,
+        "type": job.report_type,
+        "case_id": str(job.task_id),
+        "created_by": job.created_by,
+        "status": job.status,
+        "processed": job.processed or 0,
+        "total": job.total or 0,
+        "result": {"filename": job.filename, "file_path": job.file_path} if job.file_path else None,
+        "error": job.error
+    }
+
+def shutdown():
+    """关闭进程池（应用退出时调用），当前进程未完成的任务标记为失败"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    with _lock:
+        unfinished = list(_running)
+        _running.clear()
+    if unfinished:
+        from backend.db.database import SessionLocal
+        from backend.models.models import ReportJob, get_now_shanghai
+
+        db = SessionLocal()
+        try:
+            db.query(ReportJob).filter(ReportJob.id.in_(unfinished), ReportJob.finished_at.is_(None)).update(
+                {"status": "failed", "error": "服务已重启，请重新生成", "finished_at": get_now_shanghai()},
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            logger.warning(f"标记未完成的报告任务失败: {str(e)}")
+        finally:
+            db.close()
@@ -0,0 +1,319 @@
+"""
+轨迹表（Excel）和轨迹报告（Word）的生成逻辑
+既供 /api/trajectory 下的接口直接调用，也供后台报告任务（report_jobs）在子进程中调用，
+因此这里的函数不依赖请求上下文，也不抛出HTTPException
+"""
+
+import os
+import logging
+import unicodedata
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+
+import xlsxwriter
+from docx import Document
+from docx.shared import Inches
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.db.database import IS_PRODUCTION
+from backend.models.models import Task, Image, PersonInvolved
+from backend.utils import report_cache, image_derivatives, upload_index
+
+logger = logging.getLogger(__name__)
+
+# 进度回调：(已处理图片数, 图片总数)
+ProgressCallback = Callable[[int, int], None]
+
+# 报告模板版本，修改轨迹表/轨迹报告的版式后需要递增，使已缓存的文件失效
+REPORT_TEMPLATE_VERSION = "3"
+
+# 报告中图片的显示宽度（英寸）
+REPORT_IMAGE_WIDTH_INCHES = 6
+
+# 流式读取查询结果时每批获取的行数
+STREAM_BATCH_SIZE = 1000
+
+# 轨迹表的列（表头, 图片信息中的字段）
+EXCEL_COLUMNS = [
+    ('时间', 'time'),
+    ('地点', 'location'),
+    ('交通方式', 'transportation'),
+    ('事件描述', 'description'),
+    ('涉事人员', 'persons')
+]
+# 轨迹表列宽上限（字符），避免很长的事件描述把列撑得过宽
+EXCEL_MAX_COLUMN_WIDTH = 100
+# 工作表名称的长度上限和不允许出现的字符（Excel限制）
+EXCEL_SHEET_NAME_MAX_LENGTH = 31
+EXCEL_SHEET_NAME_INVALID_CHARS = '[]:*?/\\'
+
+def get_task_output_dir(task_id: str) -> str:
+    """获取任务输出目录，如果不存在则创建"""
+    task_dir = os.path.join('outputs', f'task_{task_id}')
+    os.makedirs(task_dir, exist_ok=True)
+    return task_dir
+
+def iter_images_info(case_id: str, db: Session) -> Iterator[dict]:
+    """按时间顺序逐张生成任务图片信息（含涉事人员）
+
+    一次查询获取任务下所有图片及其涉事人员（按task_id过滤的LEFT JOIN），
+    结果分批流式读取，内存占用与图片数量无关。
+    """
+    rows = db.query(
+        Image.id,
+        Image.time,
+        Image.location,
+        Image.transportation,
+        Image.description,
+        Image.file_path,
+        PersonInvolved.id.label('person_id'),
+        PersonInvolved.name,
+        PersonInvolved.id_number,
+        PersonInvolved.household_registration
+    ).outerjoin(
+        PersonInvolved, PersonInvolved.image_id == Image.id
+    ).filter(
+        Image.task_id == case_id
+    ).order_by(Image.time, Image.id, PersonInvolved.id).yield_per(STREAM_BATCH_SIZE)
+
+    # 同一张图片的行相邻，遇到下一张图片时输出上一张
+    image_info = None
+    current_image_id = None
+    for row in rows:
+        if row.id != current_image_id:
+            if image_info is not None:
+                yield image_info
+            current_image_id = row.id
+            image_info = {
+                'time': row.time.strftime('%Y-%m-%d %H:%M:%S') if row.time else '',
+                'location': row.location or '',
+                'transportation': row.transportation or '',
+                'description': row.description or '',
+                'persons': [],
+                'image_path': row.file_path if row.file_path else None
+            }
+
+        if row.person_id is not None:
+            image_info['persons'].append({
+                'name': row.name,
+                'id_number': row.id_number,
+                'hometown': row.household_registration
+            })
+
+    if image_info is not None:
+        yield image_info
+
+def get_case_info(case_id: str, db: Session) -> Optional[dict]:
+    """获取案件信息，包括图片和相关人员信息，任务不存在时返回None"""
+    # 获取任务信息
+    task = db.query(Task).filter(Task.id == case_id, Task.deleted_at.is_(None)).first()
+    if not task:
+        return None
+
+    # 单次遍历同时构建图片信息和去重后的涉事人员列表
+    images_info = []
+    involved_persons = []
+    seen_persons = set()
+    for image_info in iter_images_info(case_id, db):
+        images_info.append(image_info)
+        for person in image_info['persons']:
+            person_key = (person['name'], person['id_number'], person['hometown'])
+            if person_key not in seen_persons:
+                seen_persons.add(person_key)
+                involved_persons.append(person)
+
+    return {
+        'subject': task.title,  # 使用任务标题作为主题
+        'images_info': images_info,
+        'involved_persons': involved_persons
+    }
+
+def _format_persons(persons: list) -> str:
+    """将人员信息转换为字符串"""
+    return ', '.join([f"{p['name']}({p['id_number']})" for p in persons]) if persons else ''
+
+def _display_width(text: str) -> int:
+    """文本在Excel中的显示宽度（中文等全角字符按两个字符计算）"""
+    return sum(2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1 for char in text)
+
+def _sheet_name(title: str) -> str:
+    """去掉Excel不允许的字符并截断到31个字符"""
+    name = ''.join(char for char in title if char not in EXCEL_SHEET_NAME_INVALID_CHARS).strip("'")
+    return name[:EXCEL_SHEET_NAME_MAX_LENGTH] or '轨迹表'
+
+def generate_excel(case_id: str, db: Session, progress: Optional[ProgressCallback] = None) -> Optional[dict]:
+    """生成轨迹表Excel文件，返回文件名和相对outputs目录的路径，任务不存在时返回None
+
+    使用xlsxwriter的constant_memory模式逐行写入，数据直接来自流式读取的查询结果，
+    列宽在同一次遍历中累计，内存占用与图片数量无关。
+    """
+    task = db.query(Task.title).filter(Task.id == case_id, Task.deleted_at.is_(None)).first()
+    if not task:
+        return None
+    subject = task.title
+    total = db.query(func.count(Image.id)).filter(Image.task_id == case_id).scalar()
+
+    # 生成文件名
+    current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"关于{subject}的轨迹表_{current_time}.xlsx"
+
+    # 获取任务输出目录
+    task_dir = get_task_output_dir(case_id)
+    filepath = os.path.join(task_dir, filename)
+
+    workbook = xlsxwriter.Workbook(filepath, {'constant_memory': True})
+    try:
+        worksheet = workbook.add_worksheet(_sheet_name(f"关于{subject}的轨迹表"))
+        header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'vcenter'})
+
+        # 表头
+        widths = []
+        for col, (header, _) in enumerate(EXCEL_COLUMNS):
+            worksheet.write_string(0, col, header, header_format)
+            widths.append(_display_width(header))
+
+        # 数据行，同时累计每列的最大宽度
+        for index, img_info in enumerate(iter_images_info(case_id, db), start=1):
+            for col, (_, key) in enumerate(EXCEL_COLUMNS):
+                value = _format_persons(img_info['persons']) if key == 'persons' else img_info[key]
+                worksheet.write_string(index, col, value)
+                widths[col] = max(widths[col], _display_width(value))
+            if progress:
+                progress(index, total)
+
+        # 调整列宽（constant_memory模式下列信息在关闭时写入，可以在写完数据后设置）
+        for col, width in enumerate(widths):
+            worksheet.set_column(col, col, min(width + 2, EXCEL_MAX_COLUMN_WIDTH))
+    finally:
+        workbook.close()
+
+    logger.info(f"成功生成轨迹表: {filename}")
+    return {"filename": filename, "file_path": os.path.join(f'task_{case_id}', filename)}
+
+def generate_report(case_id: str, case_info: dict, db: Session, progress: Optional[ProgressCallback] = None) -> dict:
+    """根据案件信息生成轨迹报告Word文档，返回文件名和相对outputs目录的路径"""
+    total = len(case_info['images_info'])
+
+    # 一次性解析所有图片的实际路径（找不到的文件通过上传文件索引按文件名查找）
+    image_paths = upload_index.resolve_paths(
+        db, [img['image_path'] for img in case_info['images_info'] if img['image_path']]
+    )
+
+    # 创建Word文档
+    doc = Document()
+
+    # 添加标题
+    doc.add_heading(f"关于{case_info['subject']}的轨迹报告", 0)
+
+    # 添加涉事人员信息
+    doc.add_heading('涉事人员信息', level=1)
+    if case_info['involved_persons']:
+        for person in case_info['involved_persons']:
+            doc.add_paragraph(
+                f"姓名：{person['name']}\n"
+                f"身份证号：{person['id_number']}\n"
+                f"户籍地：{person['hometown']}\n"
+            )
+    else:
+        doc.add_paragraph('无涉事人员信息')
+
+    # 添加轨迹信息
+    doc.add_heading('轨迹信息', level=1)
+    for index, img_info in enumerate(case_info['images_info'], start=1):
+        # 添加时间和地点作为小标题
+        doc.add_heading(f"{img_info['time']} - {img_info['location']}", level=2)
+
+        # 添加详细信息
+        p = doc.add_paragraph()
+        p.add_run('交通方式：').bold = True
+        p.add_run(f"{img_info['transportation']}\n")
+        p.add_run('事件描述：').bold = True
+        p.add_run(f"{img_info['description']}\n")
+
+        # 添加涉事人员信息
+        if img_info['persons']:
+            p.add_run('涉事人员：').bold = True
+            p.add_run(f"{_format_persons(img_info['persons'])}\n")
+
+        # 添加图片
+        if img_info['image_path']:
+            try:
+                original_image_path = img_info['image_path']
+                full_path = image_paths.get(original_image_path)
+
+                if full_path:
+                    # 嵌入按报告尺寸缩放后的副本，生成失败时退回原图
+                    try:
+                        picture_path = image_derivatives.get_report_image(full_path, REPORT_IMAGE_WIDTH_INCHES)
+                    except Exception as e:
+                        logger.warning(f"生成报告用图片失败，使用原图: {full_path}, {str(e)}")
+                        picture_path = full_path
+                    doc.add_picture(picture_path, width=Inches(REPORT_IMAGE_WIDTH_INCHES))
+                else:
+                    logger.warning(f"找不到图片: {original_image_path}")
+                    p.add_run("\n[图片未找到]\n")
+            except Exception as e:
+                logger.error(f"添加图片失败: {str(e)}", exc_info=not IS_PRODUCTION)
+                p.add_run("\n[图片添加失败]\n")
+
+        # 添加分隔线
+        doc.add_paragraph('_' * 40)
+
+        if progress:
+            progress(index, total)
+
+    # 添加落款
+    doc.add_paragraph(f"\n\n{datetime.now().strftime('%Y年%m月%d日')}")
+
+    # 生成文件名和保存文件
+    current_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"关于{case_info['subject']}的轨迹报告_{current_time}.docx"
+
+    # 获取任务输出目录
+    task_dir = get_task_output_dir(case_id)
+    filepath = os.path.join(task_dir, filename)
+    doc.save(filepath)
+
+    logger.info(f"成功生成轨迹报告: {filename}")
+    return {"filename": filename, "file_path": os.path.join(f'task_{case_id}', filename)}
+
+def get_cached(case_id: str, report_type: str, db: Session) -> Optional[dict]:
+    """任务数据未变化时返回之前生成的文件，否则返回None"""
+    fingerprint = report_cache.get_task_fingerprint(case_id, db, report_type, REPORT_TEMPLATE_VERSION)
+    if not fingerprint:
+        return None
+    return report_cache.lookup(db, case_id, fingerprint)
+
+def build(
+    case_id: str,
+    report_type: str,
+    db: Session,
+    progress: Optional[ProgressCallback] = None,
+    created_by: Optional[str] = None
+) -> Optional[dict]:
+    """生成轨迹表（excel）或轨迹报告（report），任务数据未变化时直接返回缓存的文件
+
+    生成的文件登记到 report_artifacts 表；任务不存在时返回None。
+    """
+    fingerprint = report_cache.get_task_fingerprint(case_id, db, report_type, REPORT_TEMPLATE_VERSION)
+    if not fingerprint:
+        return None
+
+    cached = report_cache.lookup(db, case_id, fingerprint)
+    if cached:
+        logger.info(f"案件ID {case_id} 数据未变化，复用已生成的文件: {cached['filename']}")
+        return cached
+
+    if report_type == "excel":
+        result = generate_excel(case_id, db, progress)
+    else:
+        case_info = get_case_info(case_id, db)
+        result = generate_report(case_id, case_info, db, progress) if case_info else None
+    if not result:
+        return None
+
+    report_cache.register(db, case_id, report_type, result["file_path"], fingerprint, REPORT_TEMPLATE_VERSION, created_by)
+    db.commit()
+    report_cache.evict(db)
+    return result
@@ -0,0 +1,205 @@
+"""
+任务数据的ZIP打包导出
+边读边写生成ZIP64压缩包，通过StreamingResponse直接发送给客户端：不在磁盘或内存中生成完整压缩包，
+内存占用与任务大小无关。压缩包内容：
+- manifest.csv / manifest.json：图片和涉事人员清单；
+- uploads/task_<id>/...：上传的原始文件；
+- outputs/task_<id>/...：生成的轨迹表和轨迹报告。
+JPEG等本身已压缩的文件直接存储（不再压缩），其余文件使用deflate压缩。
+"""
+
+import codecs
+import csv
+import io
+import json
+import logging
+import os
+import zipfile
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from backend.models.models import Image, PersonInvolved
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ROOT = 'uploads'
+OUTPUT_ROOT = 'outputs'
+
+CHUNK_SIZE = 1024 * 1024
+# 查询图片清单时每批获取的行数
+BATCH_SIZE = 500
+
+# 本身已压缩的文件，存储时不再压缩
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif',
+    '.mp4', '.mov', '.zip', '.gz', '.7z', '.rar', '.xlsx', '.docx', '.pdf'
+}
+
+MANIFEST_FIELDS = [
+    'image_id', 'sequence_number', 'time', 'location', 'transportation', 'description',
+    'gps_latitude', 'gps_longitude', 'file', 'file_size', 'checksum', 'created_by', 'persons'
+]
+
+class _StreamBuffer:
+    """ZipFile的输出目标：只支持写入（不可seek），写入的数据由生成器取走后发送"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _zip_info(arcname: str, mtime: float, size: int = 0) -> zipfile.ZipInfo:
+    date_time = datetime.fromtimestamp(max(mtime, 315532800)).timetuple()[:6]  # ZIP格式不支持1980年以前的时间
+    info = zipfile.ZipInfo(arcname, date_time=date_time)
+    info.file_size = size  # 提前给出大小，超过4GB的文件会使用ZIP64本地文件头
+    extension = os.path.splitext(arcname)[1].lower()
+    info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    return info
+
+def _iter_files(root: str):
+    """递归列出目录下的文件（跳过隐藏文件和目录，如派生图缓存、未完成的上传临时文件）"""
+    if not os.path.isdir(root):
+        return
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith('.'))
+        for filename in sorted(filenames):
+            if not filename.startswith('.'):
+                yield os.path.join(directory, filename)
+
+def _iter_images(db: Session, task_id: int) -> Iterator[Tuple[Image, List[PersonInvolved]]]:
+    """按 (时间, ID) 键集分页逐批读取任务图片，每批的涉事人员通过一条IN查询获取
+
+    每批都是独立的完整查询，不使用服务端游标流式读取（流式读取未结束时在同一连接上执行
+    其他查询，pymysql会丢弃未读完的结果）。
+    """
+    last = None
+    while True:
+        query = db.query(Image).filter(Image.task_id == task_id)
+        if last is not None:
+            query = query.filter(or_(
+                Image.time > last.time,
+                and_(Image.time == last.time, Image.id > last.id)
+            ))
+        images = query.order_by(Image.time, Image.id).limit(BATCH_SIZE).all()
+        if not images:
+            return
+
+        persons = defaultdict(list)
+        for person in db.query(PersonInvolved).filter(
+            PersonInvolved.image_id.in_([image.id for image in images])
+        ).order_by(PersonInvolved.id):
+            persons[person.image_id].append(person)
+
+        for image in images:
+            yield image, persons[image.id]
+        last = images[-1]
+        # 已输出的对象不再需要，释放会话中的引用
+        db.expunge_all()
+
+def _image_record(image: Image, persons: List[PersonInvolved]) -> dict:
+    return {
+        'image_id': image.id,
+        'sequence_number': image.sequence_number,
+        'time': image.time.strftime('%Y-%m-%d %H:%M:%S') if image.time else '',
+        'location': image.location or '',
+        'transportation': image.transportation or '',
+        'description': image.description or '',
+        'gps_latitude': image.gps_latitude,
+        'gps_longitude': image.gps_longitude,
+        'file': f"{UPLOAD_ROOT}/{image.file_path}" if image.file_path else '',
+        'file_size': image.file_size,
+        'checksum': image.checksum or '',
+        'created_by': image.created_by or '',
+        'persons': [
+            {'name': person.name, 'id_number': person.id_number, 'household_registration': person.household_registration}
+            for person in persons
+        ]
+    }
+
+def _write_csv_manifest(dest, db: Session, task_id: int, buffer: _StreamBuffer) -> Iterator[bytes]:
+    # 带BOM的UTF-8，Excel直接打开时中文不会乱码
+    dest.write(codecs.BOM_UTF8)
+    line = io.StringIO()
+    writer = csv.DictWriter(line, fieldnames=MANIFEST_FIELDS)
+
+    def flush_line():
+        dest.write(line.getvalue().encode('utf-8'))
+        line.seek(0)
+        line.truncate()
+
+    writer.writeheader()
+    flush_line()
+    for image, persons in _iter_images(db, task_id):
+        record = _image_record(image, persons)
+        record['persons'] = '; '.join(
+            f"{person['name']}({person['id_number']}, {person['household_registration']})" for person in record['persons']
+        )
+        writer.writerow(record)
+        flush_line()
+        yield buffer.drain()
+
+def _write_json_manifest(dest, db: Session, task_id: int, buffer: _StreamBuffer) -> Iterator[bytes]:
+    dest.write(b'[')
+    for index, (image, persons) in enumerate(_iter_images(db, task_id)):
+        prefix = b',\n' if index else b'\n'
+        dest.write(prefix + json.dumps(_image_record(image, persons), ensure_ascii=False).encode('utf-8'))
+        yield buffer.drain()
+    dest.write(b'\n]\n')
+
+def iter_task_zip(task_id: int) -> Iterator[bytes]:
+    """逐块生成任务的ZIP压缩包内容（跳过空块）"""
+    for chunk in _generate_zip(task_id):
+        if chunk:
+            yield chunk
+
+def _generate_zip(task_id: int) -> Iterator[bytes]:
+    # 使用独立的数据库会话（请求的依赖会话在响应开始发送前就已关闭）
+    from backend.db.database import SessionLocal
+
+    buffer = _StreamBuffer()
+    now = datetime.now().timestamp()
+    with zipfile.ZipFile(buffer, mode='w', allowZip64=True) as archive:
+        db = SessionLocal()
+        try:
+            for name, write_manifest in (('manifest.csv', _write_csv_manifest), ('manifest.json', _write_json_manifest)):
+                with archive.open(_zip_info(name, now), mode='w', force_zip64=True) as dest:
+                    yield from write_manifest(dest, db, task_id, buffer)
+                yield buffer.drain()
+        finally:
+            db.close()
+
+        for root in (UPLOAD_ROOT, OUTPUT_ROOT):
+            for path in _iter_files(os.path.join(root, f'task_{task_id}')):
+                try:
+                    stat_result = os.stat(path)
+                    source = open(path, 'rb')
+                except OSError as e:
+                    # 打包过程中被删除的文件
+                    logger.warning(f"打包时无法读取文件，已跳过: {path}, {str(e)}")
+                    continue
+                arcname = path.replace('\\', '/')
+                with source, archive.open(_zip_info(arcname, stat_result.st_mtime, stat_result.st_size), mode='w') as dest:
+                    while True:
+                        chunk = source.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        yield buffer.drain()
+                yield buffer.drain()
+
+    # 中央目录
+    yield buffer.drain()
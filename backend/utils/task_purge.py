@@ -0,0 +1,247 @@
+"""
+已删除任务的后台清理
+删除任务时只标记 deleted_at（见 crud.soft_delete_task），任务立即对所有查询不可见，请求马上返回。
+这里在后台线程中完成实际清理：
+1. 分批删除图片、人员记录和导入的轨迹点（每批单独提交，不长时间持有表锁），再删除索引、报告登记和权限记录；
+2. 逐个删除 uploads/task_<id>/ 和 outputs/task_<id>/ 下的文件；
+3. 最后删除任务记录本身。
+每一步都可以重复执行，失败时按指数退避重试；任务记录在清理完成前一直保留，
+进程重启后由 resume_pending 继续未完成的清理。
+
+每个uvicorn worker启动时都会调用 resume_pending，开始清理前先通过 crud.claim_task_purge 认领任务
+（条件UPDATE设置 tasks.purge_started_at），只有认领成功的进程执行清理，其他进程跳过。
+清理最终失败或进程退出时释放认领；进程异常退出未释放的认领超过 TASK_PURGE_CLAIM_TIMEOUT_SECONDS 后可被重新认领。
+清理状态（等待/进行中/完成）由任务记录的 deleted_at、purge_started_at 和记录是否存在得出，任意worker都能查询（见 get_status）；
+已删除的图片数、文件数等进度详情只保存在执行清理的进程内存中。
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Optional
+
+from config import settings
+from backend.utils import image_derivatives
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ROOT = 'uploads'
+OUTPUT_ROOT = 'outputs'
+
+# 第一次重试前的等待时间（秒），之后每次翻倍
+RETRY_BASE_DELAY_SECONDS = 5
+# 已结束的清理任务在内存中保留的时间（秒）
+JOB_RETENTION_SECONDS = 3600
+
+# 执行清理的进程内存中可查询的进度字段
+PROGRESS_FIELDS = ("status", "phase", "images_deleted", "images_total", "files_deleted", "files_total", "attempts", "error")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_jobs: Dict[int, dict] = {}
+_lock = threading.Lock()
+# 应用退出时设置，正在等待重试的清理立即结束
+_stopping = threading.Event()
+
+def _get_executor() -> ThreadPoolExecutor:
+    """懒加载清理线程（单线程，依次清理，避免多个任务同时占用磁盘和数据库）"""
+    global _executor
+    if _executor is None:
+        _stopping.clear()
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-purge")
+    return _executor
+
+def _prune_jobs():
+    now = time.time()
+    expired = [
+        task_id for task_id, job in _jobs.items()
+        if job["finished_at"] and now - job["finished_at"] > JOB_RETENTION_SECONDS
+    ]
+    for task_id in expired:
+        del _jobs[task_id]
+
+def _update(task_id: int, **fields):
+    with _lock:
+        _jobs[task_id].update(fields)
+
+def _claim_stale_before():
+    """早于该时间的认领视为已失效"""
+    from backend.models.models import get_now_shanghai
+
+    return get_now_shanghai() - timedelta(seconds=settings.TASK_PURGE_CLAIM_TIMEOUT_SECONDS)
+
+def _release_claims(task_ids):
+    from backend.db import crud
+    from backend.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        crud.release_task_purge(db, task_ids)
+    except Exception as e:
+        logger.warning(f"释放任务 {task_ids} 的清理认领失败: {str(e)}")
+    finally:
+        db.close()
+
+def _remove_file(path: str) -> bool:
+    """删除文件，文件不存在时忽略"""
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def _purge_rows(db, task_id: int):
+    from backend.db import crud
+
+    _update(task_id, phase="rows", images_total=crud.count_task_images(db, task_id), images_deleted=0)
+    task_prefix = f"task_{task_id}/"
+    deleted = 0
+    for count, file_paths in crud.purge_task_rows(db, task_id, settings.TASK_PURGE_BATCH_SIZE):
+        # 任务目录之外的文件（例如被移动过的文件）在这里删除，任务目录整体在下一步删除
+        for file_path in file_paths:
+            if not file_path.replace('\\', '/').startswith(task_prefix):
+                full_path = os.path.join(UPLOAD_ROOT, file_path)
+                _remove_file(full_path)
+                image_derivatives.remove_derivatives(full_path)
+        deleted += count
+        _update(task_id, images_deleted=deleted)
+
+def _purge_files(task_id: int):
+    directories = [os.path.join(root, f"task_{task_id}") for root in (UPLOAD_ROOT, OUTPUT_ROOT)]
+    directories = [directory for directory in directories if os.path.isdir(directory)]
+
+    total = sum(len(files) for directory in directories for _, _, files in os.walk(directory))
+    _update(task_id, phase="files", files_total=total, files_deleted=0)
+
+    deleted = 0
+    for directory in directories:
+        for root, _, files in os.walk(directory, topdown=False):
+            for filename in files:
+                _remove_file(os.path.join(root, filename))
+                deleted += 1
+                _update(task_id, files_deleted=deleted)
+            os.rmdir(root)
+
+def _run(task_id: int):
+    """清理任务的数据库记录和文件，失败时按指数退避重试"""
+    from backend.db import crud
+    from backend.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        claimed = crud.claim_task_purge(db, task_id, _claim_stale_before())
+    finally:
+        db.close()
+    if not claimed:
+        _update(task_id, status="skipped", finished_at=time.time())
+        logger.info(f"任务 {task_id} 已由其他进程认领清理，跳过")
+        return
+    _update(task_id, claimed=True)
+
+    for attempt in range(settings.TASK_PURGE_MAX_RETRIES + 1):
+        _update(task_id, status="running", attempts=attempt + 1)
+        db = SessionLocal()
+        try:
+            _purge_rows(db, task_id)
+            _purge_files(task_id)
+            crud.remove_deleted_task(db, task_id)
+            _update(task_id, status="completed", phase="done", error=None, finished_at=time.time())
+            logger.info(f"已完成任务 {task_id} 的清理")
+            return
+        except Exception as e:
+            db.rollback()
+            error = f"{type(e).__name__}: {str(e)}"
+            if attempt >= settings.TASK_PURGE_MAX_RETRIES:
+                _update(task_id, status="failed", error=error, finished_at=time.time())
+                logger.error(f"任务 {task_id} 清理失败，已重试 {attempt} 次: {error}", exc_info=True)
+                _release_claims([task_id])
+                return
+            delay = RETRY_BASE_DELAY_SECONDS * 2 ** attempt
+            _update(task_id, status="retrying", error=error)
+            logger.warning(f"任务 {task_id} 清理失败，{delay} 秒后重试: {error}")
+        finally:
+            db.close()
+        if _stopping.wait(delay):
+            return
+
+def submit(task_id: int, deleted_by: Optional[str] = None) -> dict:
+    """提交已软删除任务的清理，已在清理中的任务不重复提交，返回清理状态"""
+    with _lock:
+        _prune_jobs()
+        job = _jobs.get(task_id)
+        if job and job["status"] in ("pending", "running", "retrying"):
+            return dict(job)
+        _jobs[task_id] = {
+            "task_id": task_id,
+            "deleted_by": deleted_by,
+            "status": "pending",
+            "phase": None,
+            "images_deleted": 0,
+            "images_total": 0,
+            "files_deleted": 0,
+            "files_total": 0,
+            "attempts": 0,
+            "claimed": False,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None
+        }
+        snapshot = dict(_jobs[task_id])
+    _get_executor().submit(_run, task_id)
+    logger.info(f"已提交任务 {task_id} 的后台清理")
+    return snapshot
+
+def get_job(task_id: int) -> Optional[dict]:
+    """获取清理状态的快照，没有记录时返回None"""
+    with _lock:
+        job = _jobs.get(task_id)
+        return dict(job) if job else None
+
+def get_status(db, task_id: int) -> Optional[dict]:
+    """获取已删除任务的清理状态，任务未删除时返回None
+
+    状态以数据库为准：任务记录已不存在表示清理完成，已认领表示正在清理，否则等待清理；
+    当前进程正在执行该任务的清理时，补充内存中的进度详情。返回的owner_id为None表示任务记录已删除。
+    """
+    from backend.db import crud
+
+    row = crud.get_task_purge_state(db, task_id)
+    if row is None:
+        return {"task_id": task_id, "owner_id": None, "status": "completed", "phase": "done"}
+    if row.deleted_at is None:
+        return None
+
+    status = {"task_id": task_id, "owner_id": row.owner_id,
+              "status": "running" if row.purge_started_at else "pending"}
+    job = get_job(task_id)
+    if job and job["claimed"]:
+        status.update({key: value for key, value in job.items() if key in PROGRESS_FIELDS})
+    return status
+
+def resume_pending() -> int:
+    """提交所有已软删除、尚未清理完成且未被其他进程认领的任务（应用启动时调用），返回提交的任务数"""
+    from backend.db import crud
+    from backend.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        task_ids = crud.get_deleted_task_ids(db, claim_stale_before=_claim_stale_before())
+    finally:
+        db.close()
+    for task_id in task_ids:
+        submit(task_id)
+    return len(task_ids)
+
+def shutdown():
+    """停止清理线程（应用退出时调用），释放未完成清理的认领，下次启动时继续"""
+    global _executor
+    _stopping.set()
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    with _lock:
+        unfinished = [task_id for task_id, job in _jobs.items() if job["claimed"] and not job["finished_at"]]
+    if unfinished:
+        _release_claims(unfinished)
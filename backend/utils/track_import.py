@@ -0,0 +1,197 @@
+"""
+GPS轨迹文件的导入
+解析用户上传的Excel/CSV轨迹文件（按列向量化处理：坐标转换和范围校验、时间解析都是整列计算，
+不逐行循环），按时间排序后在一个事务中批量写入 track_points 表，替换任务原有的导入轨迹。
+导入的轨迹只需解析一次，之后由轨迹接口（source=imported）直接从数据库读取、抽稀后返回。
+
+支持的列名（不区分大小写，只读取这些列）：
+- 纬度：latitude / lat / 纬度（必填）
+- 经度：longitude / lng / lon / 经度（必填）
+- 时间：time / datetime / timestamp / 时间
+- 地点：location / 地点；描述：description / 描述
+"""
+
+import io
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from backend.models.models import TrackPoint
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {'.csv', '.xlsx', '.xlsm'}
+
+COLUMN_ALIASES = {
+    'latitude': 'latitude', 'lat': 'latitude', '纬度': 'latitude',
+    'longitude': 'longitude', 'lng': 'longitude', 'lon': 'longitude', '经度': 'longitude',
+    'time': 'time', 'datetime': 'time', 'timestamp': 'time', '时间': 'time',
+    'location': 'location', '地点': 'location',
+    'description': 'description', '描述': 'description'
+}
+
+# 每条INSERT语句写入的行数
+INSERT_BATCH_SIZE = 5000
+# 导入结果中最多列出的无效行号数
+MAX_REPORTED_ROWS = 20
+LOCATION_MAX_LENGTH = 255
+
+# Excel日期序列号的起点
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+# 数值时间大于该值时视为Unix时间戳（秒），否则视为Excel日期序列号（天）
+UNIX_SECONDS_THRESHOLD = 1e8
+# 大于该值时视为毫秒时间戳
+UNIX_MILLISECONDS_THRESHOLD = 1e11
+
+def _canonical(column) -> Optional[str]:
+    return COLUMN_ALIASES.get(str(column).strip().lower())
+
+def read_track_file(content: bytes, filename: str) -> pd.DataFrame:
+    """读取轨迹文件中可识别的列，列名统一为英文；格式不支持或缺少坐标列时抛出ValueError"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise ValueError("不支持的文件格式，请上传.xlsx或.csv文件（.xls文件请另存为.xlsx）")
+
+    usecols = lambda column: _canonical(column) is not None
+    try:
+        if extension == '.csv':
+            try:
+                frame = pd.read_csv(io.BytesIO(content), usecols=usecols, encoding='utf-8-sig')
+            except UnicodeDecodeError:
+                # Excel另存的中文CSV通常是GBK编码
+                frame = pd.read_csv(io.BytesIO(content), usecols=usecols, encoding='gb18030')
+        else:
+            frame = pd.read_excel(io.BytesIO(content), usecols=usecols, engine='openpyxl')
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"无法读取文件: {str(e)}")
+
+    # 同一字段有多个别名列时使用第一列
+    frame.columns = [_canonical(column) for column in frame.columns]
+    frame = frame.loc[:, ~frame.columns.duplicated()]
+    if 'latitude' not in frame.columns or 'longitude' not in frame.columns:
+        raise ValueError('文件必须包含"纬度"和"经度"（或"latitude"和"longitude"）列')
+    return frame
+
+def _to_local(times: pd.Series) -> pd.Series:
+    """带时区的时间转换为东八区后去掉时区信息，与数据库中的其他时间一致"""
+    if isinstance(times.dtype, pd.DatetimeTZDtype):
+        return times.dt.tz_convert('Asia/Shanghai').dt.tz_localize(None)
+    return times
+
+def parse_times(values: pd.Series) -> pd.Series:
+    """把时间列解析为datetime64，无法解析的值为NaT
+
+    数值按Unix时间戳（秒/毫秒）或Excel日期序列号换算；字符串先按推断出的统一格式整列解析，
+    格式不一致的少数值再逐个解析。
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return _to_local(values)
+
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = values.astype(float)
+        is_unix = numbers >= UNIX_SECONDS_THRESHOLD
+        seconds = numbers.where(numbers < UNIX_MILLISECONDS_THRESHOLD, numbers / 1000)
+        unix_times = _to_local(pd.to_datetime(seconds.where(is_unix), unit='s', utc=True, errors='coerce'))
+        excel_times = pd.to_datetime(numbers.where(~is_unix), unit='D', origin=EXCEL_EPOCH, errors='coerce')
+        return unix_times.where(is_unix, excel_times)
+
+    text = values.astype('string').str.strip()
+    times = pd.to_datetime(text, errors='coerce', utc=True)
+    retry = times.isna() & text.notna() & (text != '')
+    if retry.any():
+        times[retry] = pd.to_datetime(text[retry], errors='coerce', utc=True, format='mixed')
+    # 不带时区的时间按原值保留：utc=True只用于统一带时区的值
+    naive = ~text.str.contains(r'(?:[+-]\d{2}:?\d{2}|Z)$', regex=True, na=False)
+    local = times.dt.tz_convert('Asia/Shanghai').dt.tz_localize(None)
+    return local.where(~naive, times.dt.tz_localize(None))
+
+def _text_column(frame: pd.DataFrame, name: str, max_length: Optional[int] = None) -> pd.Series:
+    if name not in frame.columns:
+        return pd.Series(pd.NA, index=frame.index, dtype='string')
+    text = frame[name].astype('string').str.strip()
+    if max_length:
+        text = text.str.slice(0, max_length)
+    return text.where(text != '')
+
+def parse_points(frame: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
+    """校验坐标并解析时间，返回 (有效轨迹点, 统计信息)
+
+    坐标无法转换为数字、超出范围（纬度-90~90，经度-180~180）的行被丢弃；
+    时间无法解析的行仍然保留（时间为空）。有效点按时间排序，时间为空的点排在最后，时间相同时保持文件顺序。
+    """
+    latitude = pd.to_numeric(frame['latitude'], errors='coerce')
+    longitude = pd.to_numeric(frame['longitude'], errors='coerce')
+    valid = latitude.between(-90, 90) & longitude.between(-180, 180)
+
+    points = pd.DataFrame({
+        'latitude': latitude,
+        'longitude': longitude,
+        'time': parse_times(frame['time']) if 'time' in frame.columns else pd.Series(pd.NaT, index=frame.index, dtype='datetime64[ns]'),
+        'location': _text_column(frame, 'location', LOCATION_MAX_LENGTH),
+        'description': _text_column(frame, 'description')
+    })[valid]
+    points = points.sort_values('time', kind='stable', na_position='last')
+
+    # 文件中的行号（第1行为表头）
+    rejected_rows = (np.flatnonzero(~valid.to_numpy()) + 2).tolist()
+    has_time_value = frame['time'].notna() if 'time' in frame.columns else pd.Series(False, index=frame.index)
+    stats = {
+        'total_rows': len(frame),
+        'rejected': len(rejected_rows),
+        'rejected_rows': rejected_rows[:MAX_REPORTED_ROWS],
+        'invalid_times': int((points['time'].isna() & has_time_value[valid]).sum())
+    }
+    return points, stats
+
+def _records(points: pd.DataFrame, task_id: int) -> List[dict]:
+    # 空值统一转换为None后写入NULL
+    columns = [
+        points[name].astype(object).where(points[name].notna(), None).tolist()
+        for name in ('time', 'location', 'description')
+    ]
+    return [
+        {
+            'task_id': task_id, 'latitude': latitude, 'longitude': longitude,
+            'time': time, 'location': location, 'description': description
+        }
+        for latitude, longitude, time, location, description in zip(
+            points['latitude'].tolist(), points['longitude'].tolist(), *columns
+        )
+    ]
+
+def save_points(db: Session, task_id: int, points: pd.DataFrame) -> int:
+    """在一个事务中删除任务原有的导入轨迹并批量写入新的轨迹点，返回删除的点数"""
+    records = _records(points, task_id)
+    try:
+        deleted = db.query(TrackPoint).filter(TrackPoint.task_id == task_id).delete(synchronize_session=False)
+        for start in range(0, len(records), INSERT_BATCH_SIZE):
+            db.execute(insert(TrackPoint), records[start:start + INSERT_BATCH_SIZE])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    logger.info(f"任务 {task_id} 导入了 {len(records)} 个轨迹点（替换 {deleted} 个）")
+    return deleted
+
+def get_track_stats(db: Session, task_id: int) -> Tuple[int, Optional[int]]:
+    """导入轨迹的 (点数, 最大ID)，用于计算轨迹接口的ETag（重新导入后ID递增，ETag随之变化）"""
+    return tuple(db.query(func.count(TrackPoint.id), func.max(TrackPoint.id)).filter(
+        TrackPoint.task_id == task_id
+    ).one())
+
+def load_points(db: Session, task_id: int) -> Tuple[np.ndarray, Optional[datetime], Optional[datetime]]:
+    """读取导入轨迹，返回 ([经度, 纬度] 数组, 开始时间, 结束时间)"""
+    rows = db.query(TrackPoint.longitude, TrackPoint.latitude, TrackPoint.time).filter(
+        TrackPoint.task_id == task_id
+    ).order_by(TrackPoint.id).all()
+    coords = np.array([(row[0], row[1]) for row in rows], dtype=float).reshape(-1, 2)
+    times = [row[2] for row in rows if row[2] is not None]
+    return coords, (times[0] if times else None), (times[-1] if times else None)
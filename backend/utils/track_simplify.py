@@ -0,0 +1,87 @@
+"""
+轨迹折线的抽稀和编码
+地图上显示轨迹时，缩放级别越小一个像素代表的距离越大，相距不到一个像素的点对显示没有意义。
+这里按缩放级别换算出容差，用Douglas-Peucker算法（每段的点到线距离用NumPy向量化计算）去掉多余的点，
+并提供Google Encoded Polyline编码，减小轨迹接口的响应体积。
+"""
+
+from typing import Optional
+
+import numpy as np
+
+# Web墨卡托下 zoom=0 时整个世界宽256像素
+TILE_SIZE = 256
+# 抽稀容差（像素）：相对首尾连线偏离小于该值的点会被去掉
+TOLERANCE_PIXELS = 1.0
+# 支持的缩放级别范围（与高德地图一致）
+MIN_ZOOM = 3
+MAX_ZOOM = 20
+
+def tolerance_for_zoom(zoom: Optional[float], pixels: float = TOLERANCE_PIXELS) -> float:
+    """缩放级别对应的抽稀容差（经纬度，度），zoom为空时返回0（不抽稀）"""
+    if zoom is None:
+        return 0.0
+    zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+    return pixels * 360.0 / (TILE_SIZE * 2 ** zoom)
+
+def _segment_distances(points: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """points中每个点到线段start-end的距离"""
+    segment = end - start
+    length_sq = float(segment @ segment)
+    offsets = points - start
+    if length_sq == 0.0:
+        return np.hypot(offsets[:, 0], offsets[:, 1])
+    t = np.clip(offsets @ segment / length_sq, 0.0, 1.0)
+    projection = offsets - np.outer(t, segment)
+    return np.hypot(projection[:, 0], projection[:, 1])
+
+def simplify(coords: np.ndarray, tolerance: float) -> np.ndarray:
+    """Douglas-Peucker抽稀，返回保留点的布尔掩码
+
+    coords 为 (N, 2) 的 [经度, 纬度] 数组，首尾点始终保留；tolerance<=0 时保留全部点。
+    经度按平均纬度的余弦缩放，使两个方向的距离可比。
+    """
+    count = len(coords)
+    keep = np.ones(count, dtype=bool)
+    if count < 3 or tolerance <= 0:
+        return keep
+
+    scaled = np.array(coords, dtype=float)
+    scaled[:, 0] *= np.cos(np.radians(scaled[:, 1].mean()))
+
+    keep[:] = False
+    keep[0] = keep[-1] = True
+    # 用栈代替递归，避免长轨迹超过递归深度
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = _segment_distances(scaled[first + 1:last], scaled[first], scaled[last])
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return keep
+
+def encode_polyline(coords: np.ndarray, precision: int = 5) -> str:
+    """Google Encoded Polyline编码
+
+    coords 为 (N, 2) 的 [经度, 纬度] 数组；按规范编码为 (纬度, 经度) 的差值序列。
+    """
+    if len(coords) == 0:
+        return ""
+    values = np.round(np.asarray(coords, dtype=float)[:, ::-1] * 10 ** precision).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    # 左移一位，负数取反
+    encoded_values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    chars = []
+    for value in encoded_values.tolist():
+        while value >= 0x20:
+            chars.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chars.append(chr(value + 63))
+    return "".join(chars)
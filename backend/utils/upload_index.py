@@ -0,0 +1,155 @@
+"""
+上传文件索引（文件名 -> 相对uploads目录的路径）
+图片记录中的file_path找不到文件时（例如文件被移动过），通过索引按文件名定位，
+不再对uploads目录做全量遍历。索引在上传/删除图片时维护，也可以通过命令行重建：
+
+    python backend/utils/upload_index.py rebuild   # 扫描uploads目录重建索引
+    python backend/utils/upload_index.py orphans   # 列出缺少文件的图片记录和没有记录的文件
+"""
+
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+# 作为脚本运行时，添加项目根目录到Python路径
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from backend.models.models import Image, UploadIndex
+from backend.utils.image_derivatives import DERIVATIVE_DIR_NAME
+
+UPLOAD_ROOT = 'uploads'
+
+def _normalize(relative_path: str) -> str:
+    return relative_path.replace('\\', '/').lstrip('/')
+
+def register(db: Session, relative_path: str):
+    """登记新上传的文件（不提交事务，由调用方提交）"""
+    relative_path = _normalize(relative_path)
+    if db.query(UploadIndex.id).filter(UploadIndex.path == relative_path).first():
+        return
+    db.add(UploadIndex(basename=os.path.basename(relative_path), path=relative_path))
+
+def register_many(db: Session, relative_paths: List[str]):
+    """批量登记新上传的文件（文件名由上传流程保证唯一，不检查重复；不提交事务）"""
+    paths = [_normalize(path) for path in relative_paths]
+    if paths:
+        db.execute(insert(UploadIndex), [
+            {"basename": os.path.basename(path), "path": path} for path in paths
+        ])
+
+def unregister(db: Session, relative_path: str):
+    """移除已删除文件的登记（不提交事务，由调用方提交）"""
+    db.query(UploadIndex).filter(UploadIndex.path == _normalize(relative_path)).delete(synchronize_session=False)
+
+def unregister_task(db: Session, task_id: int):
+    """移除任务目录下所有文件的登记（不提交事务，由调用方提交）"""
+    db.query(UploadIndex).filter(
+        UploadIndex.path.like(f"task_{task_id}/%")
+    ).delete(synchronize_session=False)
+
+def resolve_paths(db: Session, relative_paths: Iterable[str]) -> Dict[str, Optional[str]]:
+    """把图片记录中的相对路径解析为实际文件路径，找不到的文件对应None
+
+    依次尝试 uploads/<相对路径>、uploads/<文件名>，剩余未找到的文件一次性按文件名查询索引。
+    """
+    resolved: Dict[str, Optional[str]] = {}
+    missing: Dict[str, List[str]] = {}
+    for relative_path in relative_paths:
+        if relative_path in resolved:
+            continue
+        normalized = _normalize(relative_path)
+        basename = os.path.basename(normalized)
+        for candidate in (os.path.join(UPLOAD_ROOT, normalized), os.path.join(UPLOAD_ROOT, basename)):
+            if os.path.exists(candidate):
+                resolved[relative_path] = candidate
+                break
+        else:
+            resolved[relative_path] = None
+            missing.setdefault(basename, []).append(relative_path)
+
+    if missing:
+        rows = db.query(UploadIndex.basename, UploadIndex.path).filter(
+            UploadIndex.basename.in_(list(missing))
+        ).all()
+        for basename, path in rows:
+            full_path = os.path.join(UPLOAD_ROOT, path)
+            if not os.path.exists(full_path):
+                continue
+            for relative_path in missing.get(basename, []):
+                if resolved[relative_path] is None:
+                    resolved[relative_path] = full_path
+
+    return resolved
+
+def scan_upload_files() -> List[str]:
+    """扫描uploads目录，返回所有上传文件的相对路径（跳过派生图和隐藏文件）"""
+    paths = []
+    for root, dirs, files in os.walk(UPLOAD_ROOT):
+        dirs[:] = [d for d in dirs if d != DERIVATIVE_DIR_NAME and not d.startswith('.')]
+        for filename in files:
+            if filename.startswith('.'):
+                continue
+            full_path = os.path.join(root, filename)
+            paths.append(os.path.relpath(full_path, UPLOAD_ROOT).replace('\\', '/'))
+    return paths
+
+def rebuild(db: Session) -> int:
+    """清空并按uploads目录的实际内容重建索引，返回登记的文件数"""
+    paths = scan_upload_files()
+    db.query(UploadIndex).delete(synchronize_session=False)
+    db.bulk_insert_mappings(UploadIndex, [
+        {"basename": os.path.basename(path), "path": path} for path in paths
+    ])
+    db.commit()
+    return len(paths)
+
+def find_orphans(db: Session) -> dict:
+    """查找缺少文件的图片记录，以及uploads目录中没有图片记录引用的文件"""
+    images = db.query(Image.id, Image.task_id, Image.file_path).all()
+    resolved = resolve_paths(db, [img.file_path for img in images if img.file_path])
+
+    missing_files = [
+        {"image_id": img.id, "task_id": img.task_id, "file_path": img.file_path}
+        for img in images
+        if not img.file_path or resolved.get(img.file_path) is None
+    ]
+
+    referenced = {
+        os.path.relpath(path, UPLOAD_ROOT).replace('\\', '/')
+        for path in resolved.values() if path
+    }
+    orphan_files = [path for path in scan_upload_files() if path not in referenced]
+
+    return {"missing_files": missing_files, "orphan_files": orphan_files}
+
+if __name__ == "__main__":
+    import argparse
+    from backend.db.database import SessionLocal
+    from backend.utils.logger import setup_logger
+
+    logger = setup_logger("upload_index")
+
+    parser = argparse.ArgumentParser(description="上传文件索引维护工具")
+    parser.add_argument("command", choices=["rebuild", "orphans"], help="rebuild: 重建索引; orphans: 列出孤立的记录和文件")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            count = rebuild(db)
+            logger.info(f"索引重建完成，共登记 {count} 个文件")
+        else:
+            orphans = find_orphans(db)
+            logger.info(f"缺少文件的图片记录: {len(orphans['missing_files'])} 条")
+            for item in orphans["missing_files"]:
+                logger.info(f"  图片ID={item['image_id']} 任务ID={item['task_id']} 路径={item['file_path']}")
+            logger.info(f"没有图片记录的文件: {len(orphans['orphan_files'])} 个")
+            for path in orphans["orphan_files"]:
+                logger.info(f"  {path}")
+    finally:
+        db.close()
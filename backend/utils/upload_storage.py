@@ -0,0 +1,82 @@
+"""
+上传文件的落盘处理
+按块读取上传内容并在线程池中写入磁盘，不阻塞事件循环；写入过程中同时计算大小和SHA-256校验值，
+超过 UPLOAD_MAX_BYTES 时立即中止。内容先写入同目录下的临时文件，完成后原子重命名为目标文件，
+中途失败或进程崩溃不会留下不完整的目标文件。
+"""
+
+import hashlib
+import os
+import uuid
+from datetime import datetime
+from typing import Optional, Set, Tuple
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+
+CHUNK_SIZE = 1024 * 1024
+
+def make_file_name(directory: str, original_name: str, reserved: Optional[Set[str]] = None) -> str:
+    """生成 "时间戳_原文件名" 形式的存储文件名，与已有文件或reserved中的名称冲突时追加序号"""
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    stem, ext = os.path.splitext(os.path.basename(original_name))
+    file_name = f"{timestamp}_{stem}{ext}"
+    counter = 1
+    while (reserved and file_name in reserved) or os.path.exists(os.path.join(directory, file_name)):
+        file_name = f"{timestamp}_{stem}_{counter}{ext}"
+        counter += 1
+    if reserved is not None:
+        reserved.add(file_name)
+    return file_name
+
+def _write_chunk(out, digest, chunk: bytes):
+    """写入一块数据并更新校验值（hashlib处理大块数据时会释放GIL）"""
+    digest.update(chunk)
+    out.write(chunk)
+
+def _finish(out):
+    """刷新并关闭临时文件，确保内容落盘后再重命名"""
+    out.flush()
+    os.fsync(out.fileno())
+    out.close()
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+async def save_upload(file: UploadFile, dest_path: str) -> Tuple[int, str]:
+    """把上传文件保存到dest_path，返回 (文件大小, SHA-256十六进制校验值)"""
+    max_bytes = settings.UPLOAD_MAX_BYTES
+
+    # 已知大小时提前拒绝，不读取内容
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"文件大小超过限制（{max_bytes // (1024 * 1024)}MB）")
+
+    directory, filename = os.path.split(dest_path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{filename}.{uuid.uuid4().hex}.part")
+
+    size = 0
+    digest = hashlib.sha256()
+    out = await run_in_threadpool(open, tmp_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"文件大小超过限制（{max_bytes // (1024 * 1024)}MB）")
+            await run_in_threadpool(_write_chunk, out, digest, chunk)
+        await run_in_threadpool(_finish, out)
+        await run_in_threadpool(os.replace, tmp_path, dest_path)
+    except BaseException:
+        out.close()
+        await run_in_threadpool(_remove_quietly, tmp_path)
+        raise
+
+    return size, digest.hexdigest()
@@ -0,0 +1,58 @@
+"""
+已认证用户的进程内缓存（按token中的sub即用户名缓存）
+每个API请求都要根据token查询当前用户，这里缓存用户的字段快照，TTL内的请求不再查询数据库。
+管理员修改用户状态（审核、管理员权限、启用/禁用、删除）时主动失效当前进程的缓存；
+多个worker进程之间不共享缓存，其他进程最迟在 USER_CACHE_TTL_SECONDS 秒后生效。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+from backend.models.models import User
+
+# 缓存的字段（不缓存密码哈希）
+_FIELDS = [column.key for column in User.__table__.columns if column.key != "hashed_password"]
+
+_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_lock = threading.Lock()
+
+def get(username: str) -> Optional[User]:
+    """获取缓存的用户，未缓存或已过期时返回None
+
+    返回的是不属于任何会话的新User对象，只包含用户表字段，不能访问关联关系。
+    """
+    if settings.USER_CACHE_TTL_SECONDS <= 0:
+        return None
+    with _lock:
+        entry = _cache.get(username)
+        if entry is None:
+            return None
+        expires_at, fields = entry
+        if expires_at < time.monotonic():
+            del _cache[username]
+            return None
+        _cache.move_to_end(username)
+    return User(**fields)
+
+def put(user: User):
+    """缓存用户字段快照，超过 USER_CACHE_MAX_SIZE 时淘汰最久未使用的用户"""
+    if settings.USER_CACHE_TTL_SECONDS <= 0:
+        return
+    fields = {key: getattr(user, key) for key in _FIELDS}
+    with _lock:
+        _cache[user.username] = (time.monotonic() + settings.USER_CACHE_TTL_SECONDS, fields)
+        _cache.move_to_end(user.username)
+        while len(_cache) > settings.USER_CACHE_MAX_SIZE:
+            _cache.popitem(last=False)
+
+def invalidate(username: str):
+    """用户信息变更后移除缓存"""
+    with _lock:
+        _cache.pop(username, None)
+
+def clear():
+    with _lock:
+        _cache.clear()
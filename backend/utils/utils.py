@@ -1,21 +1,65 @@
 from passlib.context import CryptContext
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from fastapi import HTTPException
 from jose import JWTError, jwt
-from typing import Optional
-from sqlalchemy.orm import Session
+from typing import Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+import asyncio
+import threading
 
 # JWT配置
 SECRET_KEY = "your-secret-key-keep-it-secret"  # 在生产环境中应该使用环境变量
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 密码哈希使用 BCRYPT_ROUNDS 指定的成本；成本不同的已有哈希在登录成功时重新计算（见 verify_password_async）
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
+
+# bcrypt计算在独立的有界线程池中执行，不占用事件循环；
+# 排队和执行中的任务超过 PASSWORD_HASH_MAX_PENDING 时直接返回503，避免登录高峰时请求无限堆积
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_pending = 0
+_hash_lock = threading.Lock()
+
+def _release_hash_slot(_future):
+    global _hash_pending
+    with _hash_lock:
+        _hash_pending -= 1
+
+def _submit_hash_task(fn, *args) -> Future:
+    global _hash_pending
+    with _hash_lock:
+        if _hash_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            raise HTTPException(status_code=503, detail="当前请求过多，请稍后重试", headers={"Retry-After": "1"})
+        _hash_pending += 1
+    try:
+        future = _hash_executor.submit(fn, *args)
+    except Exception:
+        _release_hash_slot(None)
+        raise
+    future.add_done_callback(_release_hash_slot)
+    return future
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _submit_hash_task(pwd_context.verify, plain_password, hashed_password).result()
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return _submit_hash_task(pwd_context.hash, password).result()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """在线程池中验证密码，返回 (是否正确, 新哈希)
+
+    密码正确且原哈希的成本与 BCRYPT_ROUNDS 不一致时，新哈希为按当前成本重新计算的结果，否则为None。
+    """
+    return await asyncio.wrap_future(_submit_hash_task(pwd_context.verify_and_update, plain_password, hashed_password))
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -27,7 +71,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str, credentials_exception, db: Session):
+def decode_token_subject(token: str, credentials_exception) -> str:
+    """解码token并返回其中的用户名（sub），token无效时抛出credentials_exception"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -35,10 +80,25 @@ def verify_token(token: str, credentials_exception, db: Session):
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    return username
+
+async def verify_token_async(token: str, credentials_exception, db: AsyncSession):
+    """验证token并返回对应的已启用用户（使用AsyncSession查询用户）"""
+    username = decode_token_subject(token, credentials_exception)
     
     # 在函数内部导入以避免循环导入
-    from backend.db.crud import get_user_by_username
-    user = get_user_by_username(db, username=username)
+    from backend.db import async_crud
+    from backend.utils import user_cache
+    
+    # 优先使用缓存，未命中时查询数据库
+    user = user_cache.get(username)
     if user is None:
+        user = await async_crud.get_user_by_username(db, username=username)
+        if user is None:
+            raise credentials_exception
+        user_cache.put(user)
+    
+    # 已禁用的用户不能继续使用之前签发的token
+    if not user.is_active:
         raise credentials_exception
     return user
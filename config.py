@@ -1,6 +1,7 @@
 import os
 import re
 import secrets
+import time
 import logging
 from typing import Optional, List
 from pydantic_settings import BaseSettings
@@ -14,6 +15,32 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 开发环境未配置SECRET_KEY时使用的密钥文件，同一台服务器上的所有worker进程共用，重启后不变
+SECRET_KEY_FILE = ".secret_key"
+
+def _load_or_create_secret_key() -> str:
+    """读取密钥文件，不存在时生成（生产环境必须通过SECRET_KEY配置，返回空字符串由验证器报错）
+
+    多个worker同时启动时只有一个进程能创建文件，其他进程等待其写入后读取同一个密钥。
+    """
+    if os.getenv("ENVIRONMENT") == "production":
+        return ""
+    try:
+        fd = os.open(SECRET_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):
+            with open(SECRET_KEY_FILE, encoding="utf-8") as f:
+                key = f.read().strip()
+            if key:
+                return key
+            time.sleep(0.1)
+        raise RuntimeError(f"密钥文件 {SECRET_KEY_FILE} 为空，请删除后重新启动或配置SECRET_KEY")
+    key = secrets.token_urlsafe(32)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(key)
+    logger.info(f"未配置SECRET_KEY，已生成密钥文件: {SECRET_KEY_FILE}")
+    return key
+
 class Settings(BaseSettings):
     """应用配置类"""
     model_config = ConfigDict(
@@ -46,10 +73,24 @@ class Settings(BaseSettings):
     # 数据库URL
     DB_URL: str = Field(default="", env="DB_URL")
     
+    # 数据库连接池配置（每个worker进程）
+    DB_POOL_SIZE: int = Field(default=10, env="DB_POOL_SIZE")  # 连接池大小
+    DB_MAX_OVERFLOW: int = Field(default=20, env="DB_MAX_OVERFLOW")  # 超出连接池大小后允许额外创建的连接数
+    DB_POOL_TIMEOUT: int = Field(default=30, env="DB_POOL_TIMEOUT")  # 获取连接的等待超时时间（秒）
+    DB_POOL_RECYCLE: int = Field(default=3600, env="DB_POOL_RECYCLE")  # 连接回收时间（秒）
+    DB_TIMEZONE: str = Field(default="+08:00", env="DB_TIMEZONE")  # 数据库会话时区
+    
     # 安全设置
-    SECRET_KEY: str = Field(default_factory=lambda: secrets.token_urlsafe(32), env="SECRET_KEY")
+    SECRET_KEY: str = Field(default_factory=_load_or_create_secret_key, env="SECRET_KEY")  # 签名链接等使用的密钥，所有worker必须相同
     ALGORITHM: str = Field(default="HS256", env="ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(default=30, env="ACCESS_TOKEN_EXPIRE_MINUTES")
+    BCRYPT_ROUNDS: int = Field(default=12, env="BCRYPT_ROUNDS")  # 密码哈希成本，修改后已有用户在下次登录时自动迁移
+    PASSWORD_HASH_WORKERS: int = Field(default=4, env="PASSWORD_HASH_WORKERS")  # 密码哈希计算的线程数
+    PASSWORD_HASH_MAX_PENDING: int = Field(default=32, env="PASSWORD_HASH_MAX_PENDING")  # 排队中的密码哈希计算上限，超过时返回503
+    USER_CACHE_TTL_SECONDS: int = Field(default=10, env="USER_CACHE_TTL_SECONDS")  # 已认证用户的缓存时间，0表示不缓存
+    USER_CACHE_MAX_SIZE: int = Field(default=1024, env="USER_CACHE_MAX_SIZE")  # 缓存的最大用户数
+    ACL_CACHE_TTL_SECONDS: int = Field(default=5, env="ACL_CACHE_TTL_SECONDS")  # 任务访问权限的缓存时间，0表示不缓存
+    ACL_CACHE_MAX_SIZE: int = Field(default=4096, env="ACL_CACHE_MAX_SIZE")  # 缓存的最大（任务, 用户）组合数
     
     # CORS配置
     CORS_ORIGINS: List[str] = Field(default=["*"], env="CORS_ORIGINS")
@@ -59,6 +100,23 @@ class Settings(BaseSettings):
     OUTPUT_DIR: str = Field(default="outputs", env="OUTPUT_DIR")
     LOG_DIR: str = Field(default="logs", env="LOG_DIR")
     LOG_FILE: str = Field(default="logs/app.log", env="LOG_FILE")
+    UPLOAD_MAX_BYTES: int = Field(default=50 * 1024 * 1024, env="UPLOAD_MAX_BYTES")  # 单个上传文件的大小上限
+    DERIVATIVE_CACHE_MAX_BYTES: int = Field(default=2 * 1024 ** 3, env="DERIVATIVE_CACHE_MAX_BYTES")  # 缩略图/预览图等派生图的总大小上限
+    PREVIEW_IMAGE_QUALITY: int = Field(default=80, env="PREVIEW_IMAGE_QUALITY")  # 缩略图/预览图的压缩质量
+    FILE_SENDFILE_MODE: str = Field(default="", env="FILE_SENDFILE_MODE")  # 由Web服务器发送文件：空（不启用）、x-accel-redirect（nginx）、x-sendfile（Apache）
+    FILE_SENDFILE_PREFIX: str = Field(default="/protected/", env="FILE_SENDFILE_PREFIX")  # nginx内部location前缀
+    
+    # 后台报告生成配置
+    REPORT_JOB_WORKERS: int = Field(default=2, env="REPORT_JOB_WORKERS")  # 同时生成报告的进程数
+    REPORT_CACHE_MAX_AGE_DAYS: int = Field(default=30, env="REPORT_CACHE_MAX_AGE_DAYS")  # 生成文件的最长保留天数，0表示不按时间清理
+    REPORT_CACHE_MAX_BYTES: int = Field(default=5 * 1024 ** 3, env="REPORT_CACHE_MAX_BYTES")  # 生成文件的总大小上限
+    REPORT_IMAGE_DPI: int = Field(default=150, env="REPORT_IMAGE_DPI")  # 报告中图片的分辨率
+    REPORT_IMAGE_QUALITY: int = Field(default=85, env="REPORT_IMAGE_QUALITY")  # 报告中图片的JPEG质量
+    
+    # 已删除任务的后台清理配置
+    TASK_PURGE_BATCH_SIZE: int = Field(default=1000, env="TASK_PURGE_BATCH_SIZE")  # 每批删除的图片记录数
+    TASK_PURGE_MAX_RETRIES: int = Field(default=5, env="TASK_PURGE_MAX_RETRIES")  # 清理失败后的最大重试次数
+    TASK_PURGE_CLAIM_TIMEOUT_SECONDS: int = Field(default=3600, env="TASK_PURGE_CLAIM_TIMEOUT_SECONDS")  # 清理认领的过期时间（秒），认领的进程异常退出后超过该时间可被重新认领
     
     # 高德地图API配置
     AMAP_API_KEY: str = Field(default="", env="AMAP_API_KEY")
@@ -87,10 +145,54 @@ class Settings(BaseSettings):
     @field_validator("SECRET_KEY")
     @classmethod
     def validate_secret_key(cls, v):
+        if not v:
+            raise ValueError("SECRET_KEY must be set in production environment")
         if len(v) < 32:
             raise ValueError("SECRET_KEY must be at least 32 characters long")
         return v
     
+    @field_validator("REPORT_JOB_WORKERS")
+    @classmethod
+    def validate_report_job_workers(cls, v):
+        if v < 1:
+            raise ValueError("REPORT_JOB_WORKERS must be at least 1")
+        return v
+    
+    @field_validator("TASK_PURGE_BATCH_SIZE")
+    @classmethod
+    def validate_task_purge_batch_size(cls, v):
+        if v < 1:
+            raise ValueError("TASK_PURGE_BATCH_SIZE must be at least 1")
+        return v
+    
+    @field_validator("DB_TIMEZONE")
+    @classmethod
+    def validate_db_timezone(cls, v):
+        if not re.match(r"^[+-]\d{2}:\d{2}$", v):
+            raise ValueError("DB_TIMEZONE must be an offset like +08:00")
+        return v
+    
+    @field_validator("BCRYPT_ROUNDS")
+    @classmethod
+    def validate_bcrypt_rounds(cls, v):
+        if not 4 <= v <= 31:
+            raise ValueError("BCRYPT_ROUNDS must be between 4 and 31")
+        return v
+    
+    @field_validator("PASSWORD_HASH_WORKERS", "PASSWORD_HASH_MAX_PENDING")
+    @classmethod
+    def validate_password_hash_limits(cls, v, info):
+        if v < 1:
+            raise ValueError(f"{info.field_name} must be at least 1")
+        return v
+    
+    @field_validator("FILE_SENDFILE_MODE")
+    @classmethod
+    def validate_file_sendfile_mode(cls, v):
+        if v not in ("", "x-accel-redirect", "x-sendfile"):
+            raise ValueError("FILE_SENDFILE_MODE must be empty, x-accel-redirect or x-sendfile")
+        return v
+    
     @field_validator("ADMIN_PASSWORD")
     @classmethod
     def validate_admin_password(cls, v):
@@ -612,7 +612,7 @@ function loadImages(taskId) {
                 const imageItem = document.createElement('div');
                 imageItem.className = 'image-card';
                 imageItem.innerHTML = `
-                    <img src="/uploads/${currentTask.id}/${image.file_path}" alt="图片">
+                    <img src="/api/uploads/${image.file_path}?w=256" alt="图片" loading="lazy">
                     <p>序号: ${image.sequence_number}</p>
                     <p>时间: ${new Date(image.time).toLocaleString()}</p>
                     <p>地点: ${image.location}</p>
@@ -862,7 +862,7 @@ function showImageDetails(imageId) {
             <div class="modal-content">
                 <span class="close">&times;</span>
                 <h2>图片详情</h2>
-                <img src="/uploads/${currentTask.id}/${image.file_path}" alt="图片" style="max-width:100%;">
+                <img src="/api/uploads/${image.file_path}?w=1024" alt="图片" style="max-width:100%;">
                 <p>序号: ${image.sequence_number}</p>
                 <p>时间: ${new Date(image.time).toLocaleString()}</p>
                 <p>地点: ${image.location}</p>
@@ -13,6 +13,70 @@ let standardLayer = null; // 用于存储标准矢量图层
 let layerControl = null; // 用于存储图层控制面板
 let customLayerControl = null; // 自定义图层控制面板
 let gpsData = [];
+let trackSource = 'images'; // 当前显示的轨迹来源：images（图片GPS连线）或 imported（导入的轨迹文件）
+
+// 按 (时间, ID) 分页加载任务图片，filters 为服务端过滤条件（如 has_gps、start_time、bbox）
+// onPage 可选，每加载一页调用一次，便于边加载边显示
+async function fetchTaskImagePages(taskId, filters = {}, onPage = null) {
+    const pageSize = 500;
+    const images = [];
+    let cursor = null;
+    while (true) {
+        const params = new URLSearchParams({ limit: pageSize, ...filters });
+        if (cursor) {
+            params.set('after_time', cursor.time);
+            params.set('after_id', cursor.id);
+        }
+        const response = await window.authenticatedFetch(`/tasks/${taskId}/images?${params.toString()}`);
+        if (!response.ok) {
+            throw new Error('获取图片列表失败');
+        }
+        const page = await response.json();
+        images.push(...page);
+        if (onPage) {
+            onPage(page);
+        }
+        if (page.length < pageSize) {
+            break;
+        }
+        cursor = page[page.length - 1];
+    }
+    return images;
+}
+window.fetchTaskImagePages = fetchTaskImagePages;
+
+// 获取任务轨迹（服务端按缩放级别抽稀的GeoJSON，坐标为[lng, lat]，可直接作为高德地图Polyline的path）
+// source 为 'images'（图片GPS连线）或 'imported'（导入的轨迹文件）
+async function fetchTaskTrack(taskId, zoom, source = 'images') {
+    const params = new URLSearchParams({ format: 'geojson', source: source });
+    if (zoom !== undefined && zoom !== null) {
+        params.set('zoom', zoom);
+    }
+    const response = await window.authenticatedFetch(`/trajectory/track/${taskId}?${params.toString()}`);
+    if (!response.ok) {
+        throw new Error('获取轨迹失败');
+    }
+    const track = await response.json();
+    return track.geometry.coordinates;
+}
+window.fetchTaskTrack = fetchTaskTrack;
+
+// 缩放结束后按新的缩放级别重新获取抽稀轨迹（数据未变化时服务端返回304，由浏览器缓存提供）
+function refreshTrackOnZoom() {
+    const taskId = window.taskId || new URLSearchParams(window.location.search).get('id');
+    if (!pathLayer || !taskId) {
+        return;
+    }
+    const layer = pathLayer;
+    fetchTaskTrack(taskId, Math.round(map.getZoom()), trackSource)
+        .then(path => {
+            // 期间轨迹已被清除或重新绘制时忽略
+            if (pathLayer === layer) {
+                layer.setPath(path);
+            }
+        })
+        .catch(error => console.warn('刷新轨迹失败:', error));
+}
 
 // 监听高德地图API加载完成事件
 window.addEventListener('amap-loaded', function() {
@@ -145,11 +209,12 @@ function showGpsImportDialog() {
                 </div>
                 
                 <div id="excel-input-container" style="display: none;">
-                    <p>请上传Excel文件，文件须包含以下字段：<br>
-                    <span style="color: red;">纬度、经度</span>(必填)，时间、地点(可选)</p>
+                    <p>请上传Excel或CSV文件，文件须包含以下字段：<br>
+                    <span style="color: red;">纬度、经度</span>(必填)，时间、地点、描述(可选)<br>
+                    导入的轨迹保存在当前任务中，重新导入会替换原有轨迹</p>
                     
                     <div style="margin: 15px 0;">
-                        <input type="file" id="excel-file-input" accept=".xlsx, .xls" style="border: 1px solid #ddd; padding: 8px; width: 100%; border-radius: 4px;">
+                        <input type="file" id="excel-file-input" accept=".xlsx, .xlsm, .csv" style="border: 1px solid #ddd; padding: 8px; width: 100%; border-radius: 4px;">
                     </div>
                     
                     <div id="excel-preview" style="margin-top: 10px; max-height: 200px; overflow-y: auto; border: 1px solid #eee; padding: 10px; display: none;">
@@ -212,150 +277,121 @@ function showGpsImportDialog() {
     console.log('GPS导入对话框已显示');
 }
 
-// 处理Excel文件上传
-async function handleExcelUpload(event) {
+// 选择轨迹文件：文件由服务端解析和保存（见 importTrackFile），这里只检查格式并显示文件信息
+function handleExcelUpload(event) {
+    const file = event.target.files[0];
+    window.importedGpsFile = null;
+    if (!file) {
+        console.error('未选择文件');
+        return;
+    }
+
+    const extension = file.name.slice(file.name.lastIndexOf('.')).toLowerCase();
+    if (!['.xlsx', '.xlsm', '.csv'].includes(extension)) {
+        alert('请上传.xlsx或.csv文件（.xls文件请另存为.xlsx）');
+        event.target.value = '';
+        return;
+    }
+
+    window.importedGpsFile = file;
+
+    const previewContainer = document.getElementById('excel-data-preview');
+    const previewDiv = document.getElementById('excel-preview');
+    if (previewContainer && previewDiv) {
+        previewContainer.innerHTML = `
+            <p>文件：${file.name}</p>
+            <p>大小：${(file.size / 1024).toFixed(1)} KB</p>
+            <p style="color: #666;">点击"导入"后由服务器解析并保存轨迹，坐标无效的行会被跳过</p>
+        `;
+        previewDiv.style.display = 'block';
+    }
+}
+
+// 上传轨迹文件到服务器保存（替换任务原有的导入轨迹），然后显示服务端抽稀后的轨迹
+async function importTrackFile() {
+    const taskId = window.taskId || new URLSearchParams(window.location.search).get('id');
+    if (!taskId) {
+        alert('未找到任务ID');
+        return;
+    }
+    if (!window.importedGpsFile) {
+        alert('请先选择轨迹文件');
+        return;
+    }
+
+    const confirmButton = document.getElementById('confirm-import-btn');
+    if (confirmButton) {
+        confirmButton.disabled = true;
+        confirmButton.textContent = '导入中...';
+    }
+
     try {
-        const file = event.target.files[0];
-        if (!file) {
-            console.error('未选择文件');
-            return;
+        const formData = new FormData();
+        formData.append('file', window.importedGpsFile);
+        const response = await window.authenticatedFetch(`/trajectory/track/${taskId}/import`, {
+            method: 'POST',
+            body: formData
+        });
+        const result = await response.json();
+        if (!response.ok) {
+            throw new Error(result.detail || '导入失败');
         }
 
-        console.log('Excel文件上传事件触发');
-        console.log('选择的文件:', file.name);
-
-        // 检查XLSX库是否已加载
-        if (typeof XLSX === 'undefined') {
-            console.log('XLSX库未加载，等待加载完成');
-            // 等待XLSX库加载完成
-            await new Promise((resolve) => {
-                const checkXLSX = setInterval(() => {
-                    if (typeof XLSX !== 'undefined') {
-                        clearInterval(checkXLSX);
-                        resolve();
-                    }
-                }, 100);
+        // 清除旧的点和路径
+        if (markersLayer) {
+            markersLayer.forEach(marker => map.remove(marker));
+        }
+        markersLayer = [];
+        if (pathLayer) {
+            map.remove(pathLayer);
+            pathLayer = null;
+        }
+
+        // 轨迹点可能很多，只标记起点和终点，路径使用服务端按缩放级别抽稀后的轨迹
+        trackSource = 'imported';
+        const path = await fetchTaskTrack(taskId, Math.round(map.getZoom()), trackSource);
+        if (path.length > 0) {
+            [[path[0], '起'], [path[path.length - 1], '终']].forEach(([position, label]) => {
+                markersLayer.push(new AMap.Marker({
+                    position: position,
+                    map: map,
+                    content: `<div style="width: 32px; height: 32px; background-color: #3388ff; color: white; border-radius: 50%; display: flex; justify-content: center; align-items: center; font-weight: bold; font-size: 16px; border: 2px solid white; box-shadow: 0 2px 4px rgba(0,0,0,0.2);">${label}</div>`,
+                    offset: new AMap.Pixel(-16, -16)
+                }));
             });
-            console.log('XLSX库加载完成，重新处理文件');
-            // 重新触发文件处理
-            handleExcelUpload(event);
-            return;
         }
+        pathLayer = new AMap.Polyline({
+            path: path,
+            strokeColor: '#e74c3c',
+            strokeWeight: 4,
+            strokeOpacity: 0.7,
+            strokeStyle: 'dashed',
+            lineJoin: 'round'
+        });
+        map.add(pathLayer);
+        map.setFitView([...markersLayer, pathLayer]);
 
-        console.log('开始读取文件...');
-        const reader = new FileReader();
-        
-        reader.onload = function(e) {
-            try {
-                const data = new Uint8Array(e.target.result);
-                const workbook = XLSX.read(data, { type: 'array' });
-                const firstSheetName = workbook.SheetNames[0];
-                const worksheet = workbook.Sheets[firstSheetName];
-                const jsonData = XLSX.utils.sheet_to_json(worksheet);
-                
-                console.log('Excel数据读取成功:', jsonData);
-                
-                // 验证数据格式
-                if (!jsonData.length) {
-                    alert('Excel文件中没有数据');
-                    return;
-                }
-                
-                // 检查必要的字段
-                const firstRow = jsonData[0];
-                const hasLatitude = 'latitude' in firstRow || '纬度' in firstRow;
-                const hasLongitude = 'longitude' in firstRow || '经度' in firstRow;
-                
-                if (!hasLatitude || !hasLongitude) {
-                    alert('Excel文件必须包含"latitude"和"longitude"（或"纬度"和"经度"）列');
-                    return;
-                }
-                
-                // 处理数据
-                const validData = [];
-                const invalidRows = [];
-                
-                jsonData.forEach((row, index) => {
-                    const latitude = parseFloat(row.latitude || row.纬度);
-                    const longitude = parseFloat(row.longitude || row.经度);
-                    
-                    // 验证坐标值
-                    if (isNaN(latitude) || isNaN(longitude) || 
-                        latitude < -90 || latitude > 90 || 
-                        longitude < -180 || longitude > 180) {
-                        invalidRows.push({
-                            row: index + 1,
-                            reason: '无效的GPS坐标',
-                            value: `纬度: ${row.latitude || row.纬度}, 经度: ${row.longitude || row.经度}`
-                        });
-                        return;
-                    }
-                    
-                    validData.push({
-                        latitude: latitude,
-                        longitude: longitude,
-                        time: row.time || row.时间,
-                        location: row.location || row.地点,
-                        description: row.description || row.描述
-                    });
-                });
-                
-                if (invalidRows.length > 0) {
-                    const errorMessage = `发现${invalidRows.length}行无效数据：\n` +
-                        invalidRows.map(row => `第${row.row}行: ${row.reason} (${row.value})`).join('\n') +
-                        '\n\n请检查数据格式是否正确。\n' +
-                        '有效的字段名：latitude/longitude 或 纬度/经度\n' +
-                        '坐标范围：纬度(-90到90)，经度(-180到180)';
-                    
-                    alert(errorMessage);
-                    return;
-                }
-                
-                // 存储有效数据
-                window.importedGpsData = validData;
-                
-                // 显示预览
-                const previewContainer = document.getElementById('gps-preview');
-                if (previewContainer) {
-                    previewContainer.innerHTML = `
-                        <h4>数据预览 (${validData.length}条记录)</h4>
-                        <div class="preview-content">
-                            ${validData.slice(0, 5).map((item, index) => `
-                                <div class="preview-item">
-                                    <p>记录 ${index + 1}:</p>
-                                    <p>纬度: ${item.latitude}</p>
-                                    <p>经度: ${item.longitude}</p>
-                                    <p>时间: ${item.time || '未设置'}</p>
-                                    <p>地点: ${item.location || '未设置'}</p>
-                                </div>
-                            `).join('')}
-                            ${validData.length > 5 ? `<p>... 还有 ${validData.length - 5} 条记录</p>` : ''}
-                        </div>
-                    `;
-                }
-                
-                // 启用导入按钮
-                const importButton = document.getElementById('import-gps-confirm');
-                if (importButton) {
-                    importButton.disabled = false;
-                }
-                
-            } catch (error) {
-                console.error('处理Excel文件时出错:', error);
-                alert('处理Excel文件时出错: ' + error.message);
-            }
-        };
-        
-        reader.onerror = function(error) {
-            console.error('读取文件时出错:', error);
-            alert('读取文件时出错');
-        };
-        
-        reader.readAsArrayBuffer(file);
-        
+        const modal = document.getElementById('import-gps-modal');
+        if (modal) {
+            modal.remove();
+        }
+
+        let message = `成功导入了 ${result.imported} 个GPS点位`;
+        if (result.rejected > 0) {
+            message += `\n跳过 ${result.rejected} 行无效坐标（第 ${result.rejected_rows.join('、')} 行${result.rejected > result.rejected_rows.length ? ' 等' : ''}）`;
+        }
+        if (result.invalid_times > 0) {
+            message += `\n${result.invalid_times} 行时间无法识别，已按无时间保存`;
+        }
+        alert(message);
     } catch (error) {
-        console.error('处理文件上传时出错:', error);
-        alert('处理文件上传时出错: ' + error.message);
+        console.error('导入轨迹文件失败:', error);
+        alert('导入轨迹文件失败: ' + error.message);
+    } finally {
+        if (confirmButton) {
+            confirmButton.disabled = false;
+            confirmButton.textContent = '导入';
+        }
     }
 }
 
@@ -493,29 +529,9 @@ function processImportedGps() {
             const isExcelActive = document.getElementById('excel-tab').classList.contains('active');
             
             if (isExcelActive) {
-                // 处理Excel导入的数据
-                if (!window.importedGpsData || window.importedGpsData.length === 0) {
-                    alert('请先上传并解析Excel文件');
-                    return;
-                }
-                
-                // 解析Excel数据
-                window.importedGpsData.forEach((row, index) => {
-                    // 获取纬度和经度
-                    let lat = row.latitude;
-                    let lng = row.longitude;
-                    
-                    // 添加到数组
-                    points.push([lng, lat]); // 高德地图使用[lng, lat]顺序
-                    pointsInfo.push({
-                        lat: lat,
-                        lng: lng,
-                        time: row.time,
-                        location: row.location,
-                        description: row.description,
-                        index: index + 1
-                    });
-                });
+                // 文件导入由服务端解析并保存
+                importTrackFile();
+                return;
             } else {
                 // 获取文本框中的数据
                 const importText = document.getElementById('gps-import-data').value.trim();
@@ -770,21 +786,10 @@ async function plotImagesOnMap() {
                 // 创建新的标记数组
                 markersLayer = [];
                 
-                // 获取任务下的所有图片
-                const response = await window.authenticatedFetch(`/tasks/${taskId}/images`);
-                if (!response.ok) {
-                    throw new Error('获取图片列表失败');
-                }
-                
-                const images = await response.json();
-                console.log(`获取到${images.length}张图片`);
+                // 分页获取任务下有GPS信息的图片（服务端按时间排序和过滤）
+                const gpsImages = await fetchTaskImagePages(taskId, { has_gps: true });
                 
-                // 筛选出有GPS信息的图片，并按时间排序
-                const gpsImages = images
-                    .filter(img => img.gps_latitude && img.gps_longitude)
-                    .sort((a, b) => new Date(a.time) - new Date(b.time));
-                
-                console.log(`其中有${gpsImages.length}张图片包含GPS信息`);
+                console.log(`获取到${gpsImages.length}张包含GPS信息的图片`);
                 
                 if (gpsImages.length === 0) {
                     console.warn('没有找到包含GPS信息的图片');
@@ -828,9 +833,16 @@ async function plotImagesOnMap() {
                     markersLayer.push(marker);
                 });
                 
-                // 创建路径线
+                // 创建路径线：使用服务端按当前缩放级别抽稀后的轨迹，获取失败时直接连接所有点
+                let trackPath = points;
+                trackSource = 'images';
+                try {
+                    trackPath = await fetchTaskTrack(taskId, Math.round(map.getZoom()), trackSource);
+                } catch (error) {
+                    console.warn('获取抽稀轨迹失败，使用全部点连线:', error);
+                }
                 pathLayer = new AMap.Polyline({
-                    path: points,
+                    path: trackPath,
                     strokeColor: '#3388ff',
                     strokeWeight: 4,
                     strokeOpacity: 0.7,
@@ -978,6 +990,7 @@ window.mapUtils = {
     plotImagesOnMap: plotImagesOnMap,
     showGpsImportDialog: showGpsImportDialog,
     handleExcelUpload: handleExcelUpload,
+    importTrackFile: importTrackFile,
     showExcelPreview: showExcelPreview,
     processImportedGps: processImportedGps,
     toggleMapContainer: toggleMapContainer,
@@ -1389,6 +1402,9 @@ async function initMap() {
         ]
     });
 
+    // 缩放后重新获取对应精度的轨迹
+    map.on('zoomend', refreshTrackOnZoom);
+
     // 添加地图控件
     map.addControl(new AMap.Scale({
         position: 'LB',
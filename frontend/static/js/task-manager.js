@@ -76,27 +76,51 @@ function apiUrl(url) {
 function loadTasks() {
     console.log('开始加载任务列表...');
     const token = localStorage.getItem('token');
-    
-    fetch(apiUrl('/tasks/'), {
-        method: 'GET',
-        headers: {
-            'Authorization': `Bearer ${token}`
+    const pageSize = 100;
+    const allTasks = [];
+    
+    // 按任务ID倒序逐页加载任务摘要，直到最后一页
+    function loadPage(beforeId) {
+        let url = apiUrl(`/tasks/?limit=${pageSize}`);
+        if (beforeId) {
+            url += `&before_id=${beforeId}`;
         }
-    })
-    .then(response => {
-        if (!response.ok) {
-            if (response.status === 401) {
-                console.error('授权失败，重定向到登录页面');
-                localStorage.removeItem('token');
-                localStorage.removeItem('username');
-                window.location.href = '/login';
-                return;
+        return fetch(url, {
+            method: 'GET',
+            headers: {
+                'Authorization': `Bearer ${token}`
             }
-            throw new Error('加载任务失败');
-        }
-        return response.json();
-    })
+        })
+        .then(response => {
+            if (!response.ok) {
+                if (response.status === 401) {
+                    console.error('授权失败，重定向到登录页面');
+                    localStorage.removeItem('token');
+                    localStorage.removeItem('username');
+                    window.location.href = '/login';
+                    return null;
+                }
+                throw new Error('加载任务失败');
+            }
+            return response.json();
+        })
+        .then(page => {
+            if (!page) {
+                return null;
+            }
+            allTasks.push(...page);
+            if (page.length === pageSize) {
+                return loadPage(page[page.length - 1].id);
+            }
+            return allTasks;
+        });
+    }
+    
+    loadPage(null)
     .then(data => {
+        if (!data) {
+            return;
+        }
         console.log('成功获取任务数据:', data);
         renderTasksList(data);
     })
@@ -141,7 +165,7 @@ function renderTasksList(tasks) {
             <td>${task.id}</td>
             <td>${task.title}</td>
             <td>${task.description || '无描述'}</td>
-            <td>${task.owner ? task.owner.username : '未知'}</td>
+            <td>${task.owner_username || '未知'}</td>
             <td>${createdAt}</td>
             <td class="actions">
                 <span class="loading-permissions">加载权限中...</span>
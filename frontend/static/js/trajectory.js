@@ -38,6 +38,40 @@ window.showMessage = function(message, type = 'info') {
     }, 8000);
 };
 
+// 提交后台报告生成任务并轮询进度，完成后返回生成结果 {filename, file_path}
+window.runReportJob = async function(taskId, type) {
+    const response = await authenticatedFetch('/api/trajectory/jobs', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({ case_id: parseInt(taskId), type: type })
+    });
+    if (!response.ok) {
+        const errorText = await response.text();
+        console.error(`提交报告任务失败: ${response.status} ${errorText}`);
+        throw new Error('提交报告任务失败');
+    }
+    
+    let job = await response.json();
+    while (job.status === 'pending' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const statusResponse = await authenticatedFetch(`/api/trajectory/jobs/${job.job_id}`);
+        if (!statusResponse.ok) {
+            throw new Error('获取报告任务状态失败');
+        }
+        job = await statusResponse.json();
+        if (job.status === 'running' && job.total > 0) {
+            console.log(`报告生成进度: ${job.processed}/${job.total}`);
+        }
+    }
+    
+    if (job.status !== 'completed') {
+        throw new Error(job.error || '报告生成失败');
+    }
+    return job.result;
+};
+
 // 生成轨迹Excel文件
 window.generateTrack = async function() {
     try {
@@ -50,18 +84,7 @@ window.generateTrack = async function() {
         }
         
         console.log(`正在为任务ID ${taskId} 生成轨迹表`);
-        const response = await authenticatedFetch(`/api/trajectory/excel/${taskId}`, {
-            method: 'GET'
-        });
-
-        if (!response.ok) {
-            console.error(`生成轨迹表接口返回错误: ${response.status}`);
-            const errorText = await response.text();
-            console.error(`错误详情: ${errorText}`);
-            throw new Error('生成轨迹表失败');
-        }
-
-        const result = await response.json();
+        const result = await window.runReportJob(taskId, 'excel');
         console.log('生成轨迹表结果:', result);
         
         if (result.filename) {
@@ -69,9 +92,10 @@ window.generateTrack = async function() {
             const filename = result.filename;
             console.log(`生成的文件名: ${filename}`);
             
-            // 构建正确的预览和下载URL
-            const previewUrl = `/api/trajectory/preview/${encodeURIComponent(filename)}`;
-            const downloadUrl = `/api/trajectory/download-file/${encodeURIComponent(filename)}`;
+            // 构建正确的预览和下载URL（文件按相对outputs目录的路径登记）
+            const filePath = result.file_path || filename;
+            const previewUrl = `/api/trajectory/preview/${encodeURIComponent(filePath)}`;
+            const downloadUrl = `/api/trajectory/download-file/${encodeURIComponent(filePath)}`;
             
             console.log(`预览URL: ${previewUrl}`);
             console.log(`下载URL: ${downloadUrl}`);
@@ -104,18 +128,7 @@ window.generateReport = async function() {
         }
         
         console.log(`正在为任务ID ${taskId} 生成轨迹报告`);
-        const response = await authenticatedFetch(`/api/trajectory/report/${taskId}`, {
-            method: 'GET'
-        });
-
-        if (!response.ok) {
-            console.error(`生成轨迹报告接口返回错误: ${response.status}`);
-            const errorText = await response.text();
-            console.error(`错误详情: ${errorText}`);
-            throw new Error('生成轨迹报告失败');
-        }
-
-        const result = await response.json();
+        const result = await window.runReportJob(taskId, 'report');
         console.log('生成轨迹报告结果:', result);
         
         if (result.filename) {
@@ -123,9 +136,10 @@ window.generateReport = async function() {
             const filename = result.filename;
             console.log(`生成的文件名: ${filename}`);
             
-            // 构建正确的预览和下载URL
-            const previewUrl = `/api/trajectory/preview/${encodeURIComponent(filename)}`;
-            const downloadUrl = `/api/trajectory/download-file/${encodeURIComponent(filename)}`;
+            // 构建正确的预览和下载URL（文件按相对outputs目录的路径登记）
+            const filePath = result.file_path || filename;
+            const previewUrl = `/api/trajectory/preview/${encodeURIComponent(filePath)}`;
+            const downloadUrl = `/api/trajectory/download-file/${encodeURIComponent(filePath)}`;
             
             console.log(`预览URL: ${previewUrl}`);
             console.log(`下载URL: ${downloadUrl}`);
@@ -274,31 +288,8 @@ function addFileLink(filename, previewUrl, downloadUrl, type) {
     // 使用点击事件来控制预览
     link.onclick = function(e) {
         e.preventDefault(); // 阻止默认行为
-        // 在新标签页中打开预览链接
-        const previewWin = window.open(previewUrl, '_blank');
-        
-        // 检查是否成功打开了窗口
-        if (!previewWin || previewWin.closed || typeof previewWin.closed == 'undefined') {
-            console.error('预览窗口被浏览器拦截或无法打开');
-            window.showMessage('预览窗口被浏览器拦截，请允许弹出窗口或直接下载文件查看', 'error');
-            
-            // 作为备选方案，可以尝试通过临时的iframe预览
-            try {
-                const iframe = document.createElement('iframe');
-                iframe.style.display = 'none';
-                iframe.src = previewUrl;
-                document.body.appendChild(iframe);
-                
-                // 稍后移除iframe
-                setTimeout(() => {
-                    document.body.removeChild(iframe);
-                }, 5000);
-            } catch(err) {
-                console.error('通过iframe预览也失败了:', err);
-            }
-        } else {
-            console.log(`正在打开预览链接: ${previewUrl}`);
-        }
+        console.log(`正在打开预览链接: ${previewUrl}`);
+        window.openReportFile(previewUrl);
     };
     
     // 创建下载按钮
@@ -317,28 +308,8 @@ function addFileLink(filename, previewUrl, downloadUrl, type) {
         e.preventDefault(); // 防止点击事件冒泡
         console.log(`开始下载文件: ${downloadUrl}`);
         
-        // 使用a标签触发下载
-        try {
-            const a = document.createElement('a');
-            a.href = downloadUrl;
-            a.download = filename; // 设置下载文件名
-            a.style.display = 'none';
-            document.body.appendChild(a);
-            a.click();
-            
-            // 延迟后移除a标签
-            setTimeout(() => {
-                document.body.removeChild(a);
-            }, 1000);
-            
-            window.showMessage('开始下载文件...', 'info');
-        } catch (error) {
-            console.error('下载文件时出错:', error);
-            window.showMessage('下载失败，请重试或联系管理员', 'error');
-            
-            // 作为备选方案，尝试直接在新窗口打开下载链接
-            window.open(downloadUrl, '_blank');
-        }
+        window.showMessage('开始下载文件...', 'info');
+        window.openReportFile(downloadUrl, { download: true, filename: filename });
     };
     
     // 创建移除按钮
@@ -404,35 +375,67 @@ function apiUrl(url) {
     return url.startsWith('/api') ? url : `/api${url}`;
 }
 
-window.downloadFile = async function(filename) {
+// 打开生成的报告文件：文件接口需要登录，带上登录凭据获取内容后在新标签页预览或保存到本地
+// options.download 为true时下载，options.filename 为保存的文件名（默认取URL最后一段）
+window.openReportFile = async function(url, options = {}) {
+    // 预览窗口需要在点击事件中同步打开，否则会被浏览器拦截
+    const previewWin = options.download ? null : window.open('', '_blank');
+    if (!options.download && !previewWin) {
+        window.showMessage('预览窗口被浏览器拦截，请允许弹出窗口或直接下载文件查看', 'error');
+        return;
+    }
+    
     try {
-        const response = await fetch(apiUrl(`/download/${filename}`), {
-            headers: {
-                'Authorization': `Bearer ${localStorage.getItem('token')}`
-            }
-        });
+        const response = await authenticatedFetch(url);
         if (!response.ok) {
-            throw new Error('下载文件失败');
+            throw new Error(response.status === 403 ? '没有权限访问此文件' : '获取文件失败');
         }
         
-        // 创建一个临时链接来下载文件
         const blob = await response.blob();
-        const url = window.URL.createObjectURL(blob);
-        const a = document.createElement('a');
-        a.href = url;
-        a.download = filename;
-        document.body.appendChild(a);
-        a.click();
-        window.URL.revokeObjectURL(url);
-        document.body.removeChild(a);
+        const blobUrl = window.URL.createObjectURL(blob);
+        if (options.download) {
+            // 创建一个临时链接来下载文件
+            const a = document.createElement('a');
+            a.href = blobUrl;
+            a.download = options.filename || decodeURIComponent(url.split('/').pop()).split('/').pop();
+            document.body.appendChild(a);
+            a.click();
+            document.body.removeChild(a);
+        } else {
+            previewWin.location.href = blobUrl;
+        }
+        // 等待新标签页或下载读取完成后释放
+        setTimeout(() => window.URL.revokeObjectURL(blobUrl), 60000);
     } catch (error) {
-        window.showMessage('下载文件失败：' + error.message, 'error');
+        if (previewWin) {
+            previewWin.close();
+        }
+        console.error('打开文件失败:', error);
+        window.showMessage('打开文件失败：' + error.message, 'error');
+    }
+};
+
+// 页面中直接写成链接的预览/下载地址（如文件列表）同样通过 openReportFile 打开
+document.addEventListener('click', function(e) {
+    const link = e.target.closest('a[href^="/api/trajectory/preview/"], a[href^="/api/trajectory/download"]');
+    if (!link) {
+        return;
+    }
+    e.preventDefault();
+    const href = link.getAttribute('href');
+    if (href.startsWith('/api/trajectory/preview/')) {
+        window.openReportFile(href);
+    } else {
+        window.openReportFile(href, { download: true, filename: link.getAttribute('download') });
     }
+});
+
+window.downloadFile = function(filename) {
+    return window.openReportFile(`/api/trajectory/download-file/${encodeURIComponent(filename)}`, { download: true });
 };
 
 window.previewFile = function(filename) {
-    // 在新窗口中打开文件
-    window.open(apiUrl(`/download/${filename}`), '_blank');
+    return window.openReportFile(`/api/trajectory/preview/${encodeURIComponent(filename)}`);
 };
 
 function showError(message) {
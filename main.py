@@ -14,7 +14,7 @@ logger = setup_logger("app")
 try:
     # 导入数据库模型
     from backend.models.models import Base
-    from backend.db.database import engine, IS_PRODUCTION
+    from backend.db.database import engine, async_engine, IS_PRODUCTION
     from backend.db.initialize_db import initialize_base_data
 
     # 导入路由
@@ -24,6 +24,7 @@ try:
     from backend.routers.images import router as images_router
     from backend.routers.trajectory import router as trajectory_router
     from backend.routers.map import router as map_router
+    from backend.utils import report_jobs, task_purge
 
     # 创建数据库表
     Base.metadata.create_all(bind=engine)
@@ -71,8 +72,29 @@ app.include_router(map_router)  # 添加地图路由
 # 配置静态文件路由
 app.mount("/static", StaticFiles(directory="frontend/static"), name="static")
 app.mount("/api/uploads", StaticFiles(directory="uploads"), name="uploads")
-app.mount("/outputs", StaticFiles(directory="outputs"), name="outputs")
 app.mount("/frontend", StaticFiles(directory="frontend"), name="frontend")
+# 生成的报告文件不挂载为静态目录，只通过 /api/trajectory 下检查任务权限的接口访问
+
+# 启动时继续未完成的已删除任务清理
+@app.on_event("startup")
+def resume_task_purge():
+    # 继续上次退出前未完成的已删除任务清理
+    count = task_purge.resume_pending()
+    if count:
+        logger.info(f"继续清理 {count} 个已删除的任务")
+
+# 应用退出时关闭报告生成进程池和清理线程
+@app.on_event("shutdown")
+def shutdown_report_jobs():
+    report_jobs.shutdown()
+
+@app.on_event("shutdown")
+def shutdown_task_purge():
+    task_purge.shutdown()
+
+@app.on_event("shutdown")
+async def shutdown_async_engine():
+    await async_engine.dispose()
 
 # 从环境变量获取高德地图API密钥
 AMAP_API_KEY = os.getenv("AMAP_API_KEY", "your_amap_api_key")
@@ -0,0 +1,93 @@
+"""
+测试公共夹具：使用内存SQLite数据库代替MySQL，路由挂载方式与 main.py 一致（不含静态目录和启动事件）。
+从项目根目录运行：python -m pytest
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import backend.db.database as database
+from backend.api import get_current_user
+from backend.db import get_db
+from backend.models.models import Base, Task, User
+from backend.utils import acl_cache, user_cache
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """每个测试使用独立的内存数据库，工作目录切换到临时目录（uploads/outputs写在其中）"""
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    # 后台任务和流式响应在函数内部导入SessionLocal
+    monkeypatch.setattr(database, "SessionLocal", factory)
+    acl_cache.clear()
+    user_cache.clear()
+    yield factory
+    engine.dispose()
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+@pytest.fixture
+def make_user(db):
+    def make(username: str, is_admin: bool = False) -> User:
+        user = User(username=username, company="c", phone=f"phone-{username}", is_approved=True, is_admin=is_admin)
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+@pytest.fixture
+def make_task(db):
+    def make(owner: User, title: str = "task") -> Task:
+        task = Task(title=title, description="d", owner_id=owner.id)
+        db.add(task)
+        db.commit()
+        return task
+    return make
+
+@pytest.fixture
+def client(session_factory):
+    """测试客户端，client.login(user) 切换当前登录用户"""
+    from backend.routers import images, tasks, trajectory, users
+
+    app = FastAPI()
+    app.include_router(users.router, prefix="/api")
+    app.include_router(tasks.router, prefix="/api")
+    app.include_router(images.router, prefix="/api")
+    app.include_router(trajectory.router, prefix="/api/trajectory")
+
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    state = {}
+
+    def override_current_user():
+        session = session_factory()
+        try:
+            user = session.get(User, state["user_id"])
+            session.expunge(user)
+            return user
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = override_current_user
+
+    test_client = TestClient(app)
+    test_client.login = lambda user: state.update(user_id=user.id)
+    return test_client
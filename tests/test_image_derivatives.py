@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from backend.utils import image_derivatives
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    """临时uploads目录，派生图索引重置为未扫描状态"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(image_derivatives, "_cache_entries", None)
+    monkeypatch.setattr(image_derivatives, "_cache_bytes", 0)
+    directory = tmp_path / "uploads" / "task_1"
+    directory.mkdir(parents=True)
+    return directory
+
+def _make_source(directory, name: str) -> str:
+    path = str(directory / name)
+    Image.new("RGB", (800, 600), (200, 100, 50)).save(path, "JPEG")
+    return os.path.join("uploads", "task_1", name)
+
+def test_concurrent_threads_generate_same_derivative(uploads):
+    source = _make_source(uploads, "a.jpg")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        paths = list(executor.map(lambda _: image_derivatives.get_derivative(source, 256), range(16)))
+
+    assert set(paths) == {image_derivatives.derivative_path(source, 256)}
+    with Image.open(paths[0]) as img:
+        assert img.width == 256
+    # 没有遗留的临时文件
+    assert os.listdir(os.path.dirname(paths[0])) == ["a.jpg.w256.jpg"]
+
+def test_eviction_uses_index_without_rescanning(uploads, monkeypatch):
+    sources = [_make_source(uploads, f"{index}.jpg") for index in range(3)]
+    first = image_derivatives.get_derivative(sources[0], 256)
+    size = os.path.getsize(first)
+
+    # 建立索引后不再扫描uploads目录
+    def fail_scan(root):
+        raise AssertionError("uploads目录被重新扫描")
+    monkeypatch.setattr(image_derivatives, "_scan_derivatives", fail_scan)
+    monkeypatch.setattr(image_derivatives.settings, "DERIVATIVE_CACHE_MAX_BYTES", int(size * 2.5))
+
+    second = image_derivatives.get_derivative(sources[1], 256)
+    third = image_derivatives.get_derivative(sources[2], 256)
+
+    assert not os.path.exists(first)
+    assert os.path.exists(second) and os.path.exists(third)
+    assert image_derivatives.evict() == os.path.getsize(second) + os.path.getsize(third)
+
+def test_remove_derivatives_updates_index(uploads):
+    source = _make_source(uploads, "a.jpg")
+    image_derivatives.get_derivative(source, 256)
+    image_derivatives.get_derivative(source, 1024, fmt="WEBP")
+
+    image_derivatives.remove_derivatives(source)
+    assert image_derivatives.evict() == 0
+    assert os.listdir(uploads / ".derivatives") == []
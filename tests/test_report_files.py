@@ -0,0 +1,73 @@
+import os
+import re
+import urllib.parse
+
+import pytest
+from pydantic import ValidationError
+
+from config import Settings
+
+from backend.utils import file_serving, report_cache
+
+@pytest.fixture
+def report_file(db, make_user, make_task):
+    """任务创建者名下一个已登记的轨迹表文件，返回 (创建者, 相对outputs目录的路径)"""
+    owner = make_user("owner")
+    task = make_task(owner)
+    file_path = f"task_{task.id}/轨迹表.xlsx"
+    os.makedirs(os.path.join("outputs", f"task_{task.id}"))
+    with open(os.path.join("outputs", file_path), "wb") as f:
+        f.write(b"xlsx-content")
+    report_cache.register(db, str(task.id), "excel", file_path, "fingerprint", "1", owner.username)
+    db.commit()
+    return owner, file_path
+
+ROUTES = ["download", "download-file", "preview"]
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_user_without_permission_cannot_read_report_file(client, make_user, report_file, route):
+    _, file_path = report_file
+    client.login(make_user("stranger"))
+    response = client.get(f"/api/trajectory/{route}/{urllib.parse.quote(file_path)}")
+    assert response.status_code == 403
+
+@pytest.mark.parametrize("route", ["download", "download-file"])
+def test_owner_can_download_report_file(client, report_file, route):
+    owner, file_path = report_file
+    client.login(owner)
+    response = client.get(f"/api/trajectory/{route}/{urllib.parse.quote(file_path)}")
+    assert response.status_code == 200
+    assert response.content == b"xlsx-content"
+
+def test_preview_links_online_viewers_to_signed_url(client, report_file):
+    owner, file_path = report_file
+    client.login(owner)
+    page = client.get(f"/api/trajectory/preview/{urllib.parse.quote(file_path)}").text
+    signed_url = re.search(r'href="(http://testserver/api/trajectory/signed/[^"]+)"', page).group(1)
+
+    assert client.get(signed_url).content == b"xlsx-content"
+    assert client.get(signed_url.replace("signature=", "signature=0")).status_code == 403
+
+def test_expired_signed_url_is_rejected(client, report_file):
+    _, file_path = report_file
+    query = file_serving.sign_path(file_path, lifetime=-1)
+    response = client.get(f"/api/trajectory/signed/{urllib.parse.quote(file_path)}?{query}")
+    assert response.status_code == 403
+
+def test_signed_url_verifies_with_settings_of_another_worker(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("SECRET_KEY", raising=False)
+    monkeypatch.delenv("ENVIRONMENT", raising=False)
+    monkeypatch.setattr(file_serving, "settings", Settings())
+    query = urllib.parse.parse_qs(file_serving.sign_path("task_1/轨迹表.xlsx"))
+
+    # 另一个worker进程（或重启后）重新加载的配置
+    monkeypatch.setattr(file_serving, "settings", Settings())
+    assert file_serving.verify_signature("task_1/轨迹表.xlsx", int(query["expires"][0]), query["signature"][0])
+
+def test_production_requires_secret_key(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("SECRET_KEY", raising=False)
+    monkeypatch.setenv("ENVIRONMENT", "production")
+    with pytest.raises(ValidationError, match="SECRET_KEY must be set"):
+        Settings()
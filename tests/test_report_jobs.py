@@ -0,0 +1,97 @@
+from concurrent.futures import Future
+
+import pytest
+
+from backend.models.models import ReportJob, TaskPermission
+from backend.utils import report_jobs, reports
+
+CACHED_RESULT = {"filename": "轨迹表.xlsx", "file_path": "task_1/轨迹表.xlsx"}
+
+@pytest.fixture(autouse=True)
+def cached_report(monkeypatch):
+    # 使用已生成文件的路径，提交的任务直接完成，不启动进程池
+    monkeypatch.setattr(reports, "get_cached", lambda case_id, report_type, db: CACHED_RESULT)
+
+def test_user_without_permission_cannot_submit_job(client, make_user, make_task):
+    task = make_task(make_user("owner"))
+    client.login(make_user("stranger"))
+
+    response = client.post("/api/trajectory/jobs", json={"case_id": task.id, "type": "excel"})
+    assert response.status_code == 403
+    assert client.post("/api/trajectory/jobs", json={"case_id": task.id + 100, "type": "excel"}).status_code == 404
+
+def test_user_without_permission_cannot_generate_report_directly(client, make_user, make_task):
+    task = make_task(make_user("owner"))
+    client.login(make_user("stranger"))
+
+    assert client.get(f"/api/trajectory/excel/{task.id}").status_code == 403
+    assert client.get(f"/api/trajectory/report/{task.id}").status_code == 403
+
+def test_job_status_visible_only_to_submitter(client, db, make_user, make_task):
+    owner = make_user("owner")
+    viewer = make_user("viewer")
+    task = make_task(owner)
+    db.add(TaskPermission(task_id=task.id, user_id=viewer.id, permission_type="view",
+                          can_upload=False, can_edit=False, can_manage=False))
+    db.commit()
+
+    client.login(viewer)
+    response = client.post("/api/trajectory/jobs", json={"case_id": task.id, "type": "excel"})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "completed"
+    assert job["download_url"]
+    assert client.get(f"/api/trajectory/jobs/{job['job_id']}").status_code == 200
+
+    client.login(make_user("stranger"))
+    assert client.get(f"/api/trajectory/jobs/{job['job_id']}").status_code == 404
+
+def test_job_status_is_shared_between_workers(client, db, make_user, make_task):
+    owner = make_user("owner")
+    task = make_task(owner)
+    # 其他worker提交、正在生成的任务（当前进程中没有任何记录）
+    db.add(ReportJob(id="a" * 32, task_id=task.id, report_type="report", status="running",
+                     processed=3, total=10, created_by=owner.username))
+    db.commit()
+    assert not report_jobs._running
+
+    client.login(owner)
+    job = client.get(f"/api/trajectory/jobs/{'a' * 32}").json()
+    assert (job["status"], job["processed"], job["total"]) == ("running", 3, 10)
+
+    db.query(ReportJob).update({"status": "completed", "filename": "轨迹报告.docx",
+                                "file_path": f"task_{task.id}/轨迹报告.docx"})
+    db.commit()
+    job = client.get(f"/api/trajectory/jobs/{'a' * 32}").json()
+    assert job["status"] == "completed"
+    assert job["download_url"].endswith("%E8%BD%A8%E8%BF%B9%E6%8A%A5%E5%91%8A.docx")
+
+class _InlineExecutor:
+    """在当前进程中直接执行提交的任务"""
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+def test_generated_job_records_progress_and_result(client, make_user, make_task, monkeypatch):
+    owner = make_user("owner")
+    task = make_task(owner)
+    monkeypatch.setattr(reports, "get_cached", lambda case_id, report_type, db: None)
+    monkeypatch.setattr(report_jobs, "_get_executor", lambda: _InlineExecutor())
+
+    def build(case_id, job_type, db, progress, created_by):
+        progress(5, 5)
+        return {"filename": "轨迹表.xlsx", "file_path": f"task_{case_id}/轨迹表.xlsx"}
+    monkeypatch.setattr(reports, "build", build)
+
+    client.login(owner)
+    job = client.post("/api/trajectory/jobs", json={"case_id": task.id, "type": "excel"}).json()
+    assert job["status"] == "pending"
+
+    job = client.get(f"/api/trajectory/jobs/{job['job_id']}").json()
+    assert (job["status"], job["processed"], job["total"]) == ("completed", 5, 5)
+    assert job["result"]["file_path"] == f"task_{task.id}/轨迹表.xlsx"
+    assert not report_jobs._running
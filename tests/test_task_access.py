@@ -0,0 +1,23 @@
+from backend.db import crud
+from backend.utils import acl_cache
+
+def test_cached_access_to_task_deleted_by_other_worker_returns_404(client, db, make_user, make_task):
+    owner = make_user("owner")
+    task = make_task(owner)
+    client.login(owner)
+    assert client.get(f"/api/tasks/{task.id}").status_code == 200
+    cached = acl_cache.get(task.id, owner.id)
+    assert cached is not None
+
+    # 其他worker删除任务，当前进程的权限缓存没有失效
+    assert crud.soft_delete_task(db, task.id)
+
+    requests = [
+        lambda: client.get(f"/api/tasks/{task.id}"),
+        lambda: client.get(f"/api/tasks/{task.id}/images"),
+        lambda: client.post(f"/api/images/{task.id}/batch", data={"metadata": "[]"}),
+    ]
+    for request in requests:
+        acl_cache.put(task.id, owner.id, *cached)
+        assert request().status_code == 404
+        assert acl_cache.get(task.id, owner.id) is None
@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+import zipfile
+from datetime import datetime, timedelta
+
+from backend.models.models import Image, PersonInvolved
+from backend.utils import task_export
+
+def _read_zip(task_id: int) -> zipfile.ZipFile:
+    return zipfile.ZipFile(io.BytesIO(b"".join(task_export.iter_task_zip(task_id))))
+
+def test_manifest_contains_every_image_across_batches(db, make_user, make_task):
+    owner = make_user("owner")
+    task = make_task(owner)
+    count = task_export.BATCH_SIZE * 2 + 17
+    start = datetime(2024, 1, 1)
+    # 每3张图片时间相同，分页边界落在相同时间的图片之间
+    images = [
+        Image(task_id=task.id, time=start + timedelta(minutes=index // 3), location=f"地点{index}",
+              transportation="步行", sequence_number=index + 1)
+        for index in range(count)
+    ]
+    db.add_all(images)
+    db.flush()
+    db.add_all(
+        PersonInvolved(image_id=image.id, name=f"人员{image.id}", id_number="1", household_registration="户籍")
+        for image in images[::50]
+    )
+    db.commit()
+
+    archive = _read_zip(task.id)
+    assert archive.testzip() is None
+
+    rows = list(csv.DictReader(io.StringIO(archive.read("manifest.csv").decode("utf-8-sig"))))
+    assert len(rows) == count
+    assert [int(row["image_id"]) for row in rows] == [image.id for image in images]
+    assert sum(1 for row in rows if row["persons"]) == len(images[::50])
+
+    records = json.loads(archive.read("manifest.json"))
+    assert len(records) == count
+    assert len({record["image_id"] for record in records}) == count
+    assert records[50]["persons"][0]["name"] == f"人员{images[50].id}"
+
+def test_manifest_for_task_without_images(db, make_user, make_task):
+    task = make_task(make_user("owner"))
+    archive = _read_zip(task.id)
+    assert len(archive.read("manifest.csv").decode("utf-8-sig").splitlines()) == 1
+    assert json.loads(archive.read("manifest.json")) == []
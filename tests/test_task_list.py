@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from backend.models.models import Image, PersonInvolved, Task, TaskPermission
+
+@contextmanager
+def count_statements(session_factory):
+    statements = []
+    engine = session_factory.kw["bind"]
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+def _add_tasks(db, owner, count: int):
+    tasks = [Task(title=f"任务{index}", owner_id=owner.id) for index in range(count)]
+    db.add_all(tasks)
+    db.flush()
+    start = datetime(2024, 1, 1)
+    images = [
+        Image(task_id=task.id, time=start + timedelta(minutes=offset), location="地点", transportation="步行",
+              file_path=f"task_{task.id}/{offset}.jpg")
+        for task in tasks for offset in range(2)
+    ]
+    db.add_all(images)
+    db.flush()
+    db.add_all(PersonInvolved(image_id=image.id, name="人员") for image in images[::3])
+    db.commit()
+    return tasks
+
+def test_task_list_statement_count_does_not_grow_with_tasks(client, db, session_factory, make_user):
+    small = make_user("small")
+    _add_tasks(db, small, 1)
+    large = make_user("large")
+    _add_tasks(db, large, 190)
+    # 另有10个分享给该用户的任务
+    for task in _add_tasks(db, make_user("other"), 10):
+        db.add(TaskPermission(task_id=task.id, user_id=large.id, permission_type="view"))
+    db.commit()
+
+    client.login(small)
+    with count_statements(session_factory) as small_statements:
+        response = client.get("/api/tasks/?limit=500")
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+    client.login(large)
+    with count_statements(session_factory) as large_statements:
+        response = client.get("/api/tasks/?limit=500")
+    assert response.status_code == 200
+    tasks = response.json()
+    assert len(tasks) == 200
+    assert all(task["image_count"] == 2 for task in tasks)
+
+    # 加载当前用户 + 一条任务摘要查询
+    assert len(large_statements) == len(small_statements) <= 2
+
+def test_task_summary_image_stats_are_per_task(client, db, make_user, make_task):
+    owner = make_user("owner")
+    empty = make_task(owner, "空任务")
+    first, second = _add_tasks(db, owner, 2)
+    db.add(Image(task_id=second.id, time=datetime(2023, 12, 31), location="地点", transportation="步行",
+                 file_path=f"task_{second.id}/earliest.jpg"))
+    db.commit()
+
+    client.login(owner)
+    summaries = {task["id"]: task for task in client.get("/api/tasks/").json()}
+
+    assert summaries[empty.id]["image_count"] == 0
+    assert summaries[empty.id]["first_image_time"] is None
+    assert summaries[empty.id]["thumbnail_path"] is None
+    assert summaries[first.id]["image_count"] == 2
+    assert summaries[first.id]["last_image_time"] == "2024-01-01T00:01:00"
+    assert summaries[second.id]["image_count"] == 3
+    assert summaries[second.id]["first_image_time"] == "2023-12-31T00:00:00"
+    assert summaries[second.id]["thumbnail_path"] == f"task_{second.id}/earliest.jpg"
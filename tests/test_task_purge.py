@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.db import crud
+from backend.models.models import Image, Task, get_now_shanghai
+from backend.utils import task_purge
+
+class _InlineExecutor:
+    """在当前线程中直接执行提交的清理"""
+    def submit(self, fn, *args):
+        fn(*args)
+
+@pytest.fixture(autouse=True)
+def inline_purge(session_factory, monkeypatch):
+    monkeypatch.setattr(task_purge, "_jobs", {})
+    monkeypatch.setattr(task_purge, "_get_executor", lambda: _InlineExecutor())
+
+@pytest.fixture
+def deleted_task(db, make_user, make_task):
+    task = make_task(make_user("owner"))
+    db.add(Image(task_id=task.id, time=datetime(2024, 1, 1), location="地点", transportation="步行",
+                 file_path=f"task_{task.id}/a.jpg"))
+    db.commit()
+    assert crud.soft_delete_task(db, task.id)
+    return task.id
+
+def _set_claim(db, task_id, started_at):
+    db.query(Task).filter(Task.id == task_id).update({"purge_started_at": started_at})
+    db.commit()
+
+def test_only_one_worker_claims_task(db, deleted_task):
+    stale_before = get_now_shanghai() - timedelta(hours=1)
+    assert crud.claim_task_purge(db, deleted_task, stale_before)
+    assert not crud.claim_task_purge(db, deleted_task, stale_before)
+
+def test_task_claimed_by_other_worker_is_skipped(db, deleted_task):
+    _set_claim(db, deleted_task, get_now_shanghai())
+
+    assert task_purge.resume_pending() == 0
+    assert task_purge.submit(deleted_task)["status"] == "pending"
+    assert task_purge.get_job(deleted_task)["status"] == "skipped"
+    db.expire_all()
+    assert db.get(Task, deleted_task) is not None
+    assert db.query(Image).filter(Image.task_id == deleted_task).count() == 1
+
+def test_stale_claim_is_taken_over(db, deleted_task):
+    timeout = task_purge.settings.TASK_PURGE_CLAIM_TIMEOUT_SECONDS
+    _set_claim(db, deleted_task, get_now_shanghai() - timedelta(seconds=timeout + 60))
+
+    assert task_purge.resume_pending() == 1
+    assert task_purge.get_job(deleted_task)["status"] == "completed"
+    db.expire_all()
+    assert db.get(Task, deleted_task) is None
+    assert db.query(Image).filter(Image.task_id == deleted_task).count() == 0
+
+def test_failed_purge_releases_claim(db, deleted_task, monkeypatch):
+    monkeypatch.setattr(task_purge.settings, "TASK_PURGE_MAX_RETRIES", 0)
+    def fail(db, task_id):
+        raise OSError("磁盘错误")
+    monkeypatch.setattr(task_purge, "_purge_rows", fail)
+
+    task_purge.submit(deleted_task)
+    assert task_purge.get_job(deleted_task)["status"] == "failed"
+    db.expire_all()
+    assert db.get(Task, deleted_task).purge_started_at is None
+
+def test_purge_status_comes_from_database(client, db, make_user, deleted_task):
+    owner = db.get(Task, deleted_task).owner
+    client.login(owner)
+    # 当前进程没有该任务的清理记录（由其他worker删除）
+    assert client.get(f"/api/tasks/{deleted_task}/purge").json()["status"] == "pending"
+
+    _set_claim(db, deleted_task, get_now_shanghai())
+    assert client.get(f"/api/tasks/{deleted_task}/purge").json()["status"] == "running"
+
+    client.login(make_user("stranger"))
+    assert client.get(f"/api/tasks/{deleted_task}/purge").status_code == 404
+
+    db.query(Image).filter(Image.task_id == deleted_task).delete()
+    db.query(Task).filter(Task.id == deleted_task).delete()
+    db.commit()
+    client.login(owner)
+    assert client.get(f"/api/tasks/{deleted_task}/purge").json()["status"] == "completed"
+
+def test_purge_status_of_live_task_is_not_found(client, make_user, make_task):
+    owner = make_user("owner")
+    task = make_task(owner)
+    client.login(owner)
+    assert client.get(f"/api/tasks/{task.id}/purge").status_code == 404